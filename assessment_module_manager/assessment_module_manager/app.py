@@ -1,8 +1,13 @@
+import asyncio
+
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
+from assessment_module_manager import env
+from assessment_module_manager.config_registry import install_reload_signal_handler, watch_config_files
 from assessment_module_manager.logger import logger
+from assessment_module_manager.module import open_module_clients, close_module_clients, health_monitor
 
 description = """
 This is the Athena API. You are interacting with the Assessment Module Manager, 
@@ -20,6 +25,42 @@ app = FastAPI(
     version="0.1.0"
 )
 
+
+@app.on_event("startup")
+async def open_clients():
+    """Open the shared, connection-pooled clients for the requests to the modules."""
+    await open_module_clients()
+
+
+@app.on_event("startup")
+async def watch_config():
+    """Reload modules.ini and deployments.ini when they change or on SIGHUP."""
+    install_reload_signal_handler()
+    app.state.config_watcher = asyncio.create_task(watch_config_files(env.CONFIG_RELOAD_INTERVAL))
+
+
+@app.on_event("shutdown")
+async def stop_watching_config():
+    app.state.config_watcher.cancel()
+
+
+@app.on_event("startup")
+async def start_health_monitor():
+    """Check the health of the modules in the background."""
+    app.state.health_monitor = asyncio.create_task(health_monitor.run(env.HEALTH_CHECK_INTERVAL))
+
+
+@app.on_event("shutdown")
+async def stop_health_monitor():
+    app.state.health_monitor.cancel()
+
+
+@app.on_event("shutdown")
+async def close_clients():
+    """Close the clients for the requests to the modules."""
+    await close_module_clients()
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     logger.error("Validation error: %s \n Errors: %s\n Request body: %s", exc, exc.errors(), exc.body)
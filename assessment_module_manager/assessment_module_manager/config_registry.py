@@ -0,0 +1,100 @@
+"""
+In-memory registries for the ini config files (modules.ini, deployments.ini).
+
+The files are parsed once into a dict indexed by section name, so lookups on the request path do not touch the disk.
+They are reloaded when the file changes (checked periodically by `watch_config_files`) or when the process gets SIGHUP.
+"""
+import asyncio
+import configparser
+import os
+import signal
+from pathlib import Path
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
+
+from assessment_module_manager.logger import logger
+
+T = TypeVar("T")
+
+
+class ConfigRegistry(Generic[T]):
+    """Parsed content of an ini file, indexed by section name."""
+
+    def __init__(self, path: Path, parse_section: Callable[[str, configparser.SectionProxy], T]):
+        self.path = path
+        self.parse_section = parse_section
+        self._entries: Dict[str, T] = {}
+        self._mtime: Optional[float] = None
+        self._reload_listeners: List[Callable[[Dict[str, T]], None]] = []
+        self.reload()
+
+    def _get_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def reload(self):
+        """Parse the file again and notify the listeners."""
+        mtime = self._get_mtime()
+        config = configparser.ConfigParser()
+        config.read(self.path)
+        entries = {name: self.parse_section(name, config[name]) for name in config.sections()}
+        # Swap the whole dict, so that concurrent readers never see a partially loaded registry
+        self._entries = entries
+        self._mtime = mtime
+        for listener in self._reload_listeners:
+            listener(entries)
+
+    def reload_if_changed(self) -> bool:
+        """Reload the file if it was modified since it was loaded last. Returns whether it was reloaded."""
+        if self._get_mtime() == self._mtime:
+            return False
+        logger.info("%s changed, reloading", self.path.name)
+        self.reload()
+        return True
+
+    def add_reload_listener(self, listener: Callable[[Dict[str, T]], None]):
+        """Call the listener with all entries whenever the file is reloaded."""
+        self._reload_listeners.append(listener)
+
+    def get(self, name: str) -> Optional[T]:
+        return self._entries.get(name)
+
+    def list(self) -> List[T]:
+        return list(self._entries.values())
+
+
+_registries: List[ConfigRegistry] = []
+
+
+def register_config_registry(registry: ConfigRegistry):
+    """Watch the file of the registry for changes."""
+    _registries.append(registry)
+
+
+def reload_all_config_registries():
+    for registry in _registries:
+        try:
+            registry.reload()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Could not reload %s", registry.path)
+    logger.info("Reloaded %s", ", ".join(registry.path.name for registry in _registries))
+
+
+def install_reload_signal_handler():
+    """Reload all config files on SIGHUP."""
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_all_config_registries)
+    except (NotImplementedError, AttributeError):
+        logger.warning("Reloading the config files on SIGHUP is not supported on this platform")
+
+
+async def watch_config_files(interval: float):
+    """Periodically reload the config files that changed."""
+    while True:
+        await asyncio.sleep(interval)
+        for registry in _registries:
+            try:
+                registry.reload_if_changed()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Could not reload %s", registry.path)
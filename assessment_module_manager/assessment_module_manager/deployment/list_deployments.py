@@ -3,17 +3,23 @@ import configparser
 from typing import List
 from pathlib import Path
 
+from assessment_module_manager.config_registry import ConfigRegistry, register_config_registry
 from .deployment import Deployment
 
 
+def _parse_deployment(deployment: str, deployment_config: configparser.SectionProxy) -> Deployment:
+    return Deployment(
+        name=deployment,
+        url=deployment_config["url"]
+    )
+
+
+# deployments.ini is only read on startup and when it changes
+deployment_registry: ConfigRegistry[Deployment] = ConfigRegistry(
+    Path(__file__).parent.parent.parent / "deployments.ini", _parse_deployment)
+register_config_registry(deployment_registry)
+
+
 def list_deployments() -> List[Deployment]:
     """Get a list of all LMS instances that Athena should support."""
-    deployments_config = configparser.ConfigParser()
-    deployments_config.read(Path(__file__).parent.parent.parent / "deployments.ini")
-    return [
-        Deployment(
-            name=deployment,
-            url=deployments_config[deployment]["url"]
-        )
-        for deployment in deployments_config.sections()
-    ]
+    return deployment_registry.list()
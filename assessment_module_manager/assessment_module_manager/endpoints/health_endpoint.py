@@ -1,26 +1,10 @@
-import httpx
+import asyncio
+
 from pydantic import BaseModel, Field
 
 from .modules_endpoint import get_modules
 from assessment_module_manager.app import app
-from assessment_module_manager.logger import logger
-from assessment_module_manager.module import Module
-
-
-async def is_healthy(module: Module) -> bool:
-    try:
-        async with httpx.AsyncClient(base_url=module.url) as client:
-            response = await client.get('/')
-        return response.status_code == 200 and response.json()["status"] == "ok"
-    except httpx.ConnectError:
-        logger.error("Server is not reachable: %s", module)
-        return False
-    except KeyError:
-        logger.error("Response does not contain a 'status' key: %s", module)
-        return False
-    except TypeError:
-        logger.error("Response is not JSON: %s", module)
-        return False
+from assessment_module_manager.module import health_monitor
 
 
 class HealthResponse(BaseModel):
@@ -37,6 +21,15 @@ class HealthResponse(BaseModel):
                     "url": "http://localhost:5001",
                     "type": "programming",
                     "healthy": True,
+                    "probeLatencyMs": 12.3,
+                    "lastChecked": "2024-01-01T12:00:00+00:00",
+                    "replicas": {
+                        "http://localhost:5001": {
+                            "healthy": True,
+                            "probeLatencyMs": 12.3,
+                            "lastChecked": "2024-01-01T12:00:00+00:00"
+                        }
+                    },
                     "supportsEvaluation": True,
                     "supportsNonGradedFeedbackRequests": True,
                     "supportsGradedFeedbackRequests": True
@@ -51,19 +44,32 @@ async def get_health() -> HealthResponse:
     """
     Health endpoint to find out whether the Assessment Module Manager is healthy,
     and whether all the modules are healthy (i.e. reachable).
+    The health of the modules is checked in the background, so this returns the result of the last check.
 
     This endpoint is not authenticated.
     """
+    modules = get_modules()
+    module_healths = await asyncio.gather(*(health_monitor.get_health(module) for module in modules))
     return HealthResponse(
         modules={
             module.name: {
                 "url": module.url,
                 "type": module.type,
-                "healthy": await is_healthy(module),
+                "healthy": module_health.healthy,
+                "probeLatencyMs": module_health.latency_ms,
+                "lastChecked": module_health.checked_at,
+                "replicas": {
+                    url: {
+                        "healthy": replica_health.healthy,
+                        "probeLatencyMs": replica_health.latency_ms,
+                        "lastChecked": replica_health.checked_at,
+                    }
+                    for url, replica_health in module_health.replicas.items()
+                },
                 "supportsEvaluation": module.supports_evaluation,
                 "supportsNonGradedFeedbackRequests": module.supports_non_graded_feedback_requests,
                 "supportsGradedFeedbackRequests": module.supports_graded_feedback_requests
             }
-            for module in get_modules()
+            for module, module_health in zip(modules, module_healths)
         }
     )
@@ -1,11 +1,11 @@
 from typing import Dict, Any, Optional
 from fastapi import Body, HTTPException, Request
-from starlette.responses import JSONResponse
+from starlette.responses import StreamingResponse
 
 from assessment_module_manager.authenticate import authenticated
 from athena.schemas import ExerciseType
 from assessment_module_manager.app import app
-from assessment_module_manager.module import ModuleResponse, find_module_by_name, request_to_module
+from assessment_module_manager.module import ModuleResponse, find_module_by_name, stream_from_module
 
 
 @app.api_route(
@@ -22,8 +22,11 @@ from assessment_module_manager.module import ModuleResponse, find_module_by_name
         404: {
             "description": "Module is not found (not listed in modules.ini)",
         },
+        429: {
+            "description": "Too many requests are waiting for the module, retry after the time in the Retry-After header",
+        },
         503: {
-            "description": "Module is not available",
+            "description": "Module is not available or overloaded (see the Retry-After header)",
         },
     },
     response_model=ModuleResponse[Any, Any],
@@ -31,7 +34,7 @@ from assessment_module_manager.module import ModuleResponse, find_module_by_name
 @authenticated
 async def proxy_to_module(
     module_type: ExerciseType, module_name: str, path: str, request: Request, data: Optional[Dict[Any, Any]] = Body(None),
-) -> JSONResponse:
+) -> StreamingResponse:
     """
     This endpoint is called by the LMS to proxy requests to modules.
     See the module documentation for the possible choices for paths.
@@ -68,15 +71,22 @@ async def proxy_to_module(
     if lms_server_url:
         headers['X-Server-URL'] = lms_server_url
 
-    resp = await request_to_module(
+    # Streams of results (e.g. of /feedback_suggestions/stream) are NDJSON unless server-sent events are accepted
+    accept = request.headers.get('Accept')
+    if accept and 'text/event-stream' in accept:
+        headers['Accept'] = accept
+
+    # Used to pin the requests for an exercise to one replica of the module (if configured)
+    exercise = data.get("exercise") if data is not None else None
+    exercise_id = exercise.get("id") if isinstance(exercise, dict) else None
+
+    # The response of the module is streamed through, wrapped as ModuleResponse
+    return await stream_from_module(
         module,
         headers,
         '/' + path,
         lms_server_url,
         data,
         method=request.method,
-    )
-    return JSONResponse(
-        status_code=resp.status,
-        content=resp.dict(),
+        exercise_id=exercise_id,
     )
@@ -1,28 +1,67 @@
 """Common place for environment variables with sensible defaults for local development."""
 import os
+from typing import Dict, Iterable, Optional
 
-from assessment_module_manager.deployment import list_deployments
-from assessment_module_manager.module.list_modules import list_modules
+from assessment_module_manager.deployment import Deployment
+from assessment_module_manager.deployment.list_deployments import deployment_registry, list_deployments
+from assessment_module_manager.module.module import Module
+from assessment_module_manager.module.list_modules import module_registry, list_modules
 from assessment_module_manager.logger import logger
 
 PRODUCTION = os.environ.get("PRODUCTION", "0") == "1"
 
-MODULE_SECRETS = {}
-for module in list_modules():
-    secret = os.environ.get(f"{module.name.upper()}_SECRET")
-    if secret is None and PRODUCTION:
-        raise ValueError(f"Missing secret for module {module.name}. "
-                         f"Set the {module.name.upper()}_SECRET environment variable.")
-    MODULE_SECRETS[module.name] = secret
-
-DEPLOYMENT_SECRETS = {}
-for deployment in list_deployments():
-    secret = os.environ.get(f"LMS_{deployment.name.upper()}_SECRET")
-    if secret is None and PRODUCTION:
-        logger.warning("Missing secret for LMS deployment %s. "
-                       "Set the LMS_%s_SECRET environment variable to secure the communication "
-                       "between the LMS and the assessment module manager.",
-                       deployment.name, deployment.name.upper())
-    if secret is None and not PRODUCTION:
-        secret = "abcdef12345"  # noqa: This secret is only used for development setups for simplicity
-    DEPLOYMENT_SECRETS[deployment.url] = secret
+# shared HTTP clients for the requests to the modules (one per module)
+MODULE_REQUEST_TIMEOUT = float(os.environ.get("MODULE_REQUEST_TIMEOUT", "600"))
+MODULE_CONNECT_TIMEOUT = float(os.environ.get("MODULE_CONNECT_TIMEOUT", "5"))
+MODULE_MAX_CONNECTIONS = int(os.environ.get("MODULE_MAX_CONNECTIONS", "100"))
+MODULE_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("MODULE_MAX_KEEPALIVE_CONNECTIONS", "20"))
+MODULE_HTTP2 = os.environ.get("MODULE_HTTP2", "0") == "1"  # only for https module URLs
+# how many replicas of a module a request is tried on (only connection errors and idempotent GET requests are retried)
+MODULE_MAX_ATTEMPTS = int(os.environ.get("MODULE_MAX_ATTEMPTS", "2"))
+
+# admission control: default limits for the modules, overridable per module (and endpoint) in modules.ini
+MODULE_MAX_CONCURRENT_REQUESTS = int(os.environ.get("MODULE_MAX_CONCURRENT_REQUESTS", "0"))  # 0 = no limit
+MODULE_MAX_QUEUED_REQUESTS = int(os.environ.get("MODULE_MAX_QUEUED_REQUESTS", "100"))
+MODULE_QUEUE_TIMEOUT = float(os.environ.get("MODULE_QUEUE_TIMEOUT", "30"))
+
+# background health checks of the modules
+HEALTH_CHECK_INTERVAL = float(os.environ.get("HEALTH_CHECK_INTERVAL", "10"))
+HEALTH_PROBE_TIMEOUT = float(os.environ.get("HEALTH_PROBE_TIMEOUT", "2"))
+
+MODULE_SECRETS: Dict[str, Optional[str]] = {}
+DEPLOYMENT_SECRETS: Dict[str, str] = {}
+
+
+def _load_module_secrets(modules: Iterable[Module], is_reload: bool = False):
+    for module in modules:
+        secret = os.environ.get(f"{module.name.upper()}_SECRET")
+        if secret is None and PRODUCTION:
+            message = (f"Missing secret for module {module.name}. "
+                       f"Set the {module.name.upper()}_SECRET environment variable.")
+            if not is_reload:
+                raise ValueError(message)
+            logger.error(message)
+        MODULE_SECRETS[module.name] = secret
+
+
+def _load_deployment_secrets(deployments: Iterable[Deployment]):
+    for deployment in deployments:
+        secret = os.environ.get(f"LMS_{deployment.name.upper()}_SECRET")
+        if secret is None and PRODUCTION:
+            logger.warning("Missing secret for LMS deployment %s. "
+                           "Set the LMS_%s_SECRET environment variable to secure the communication "
+                           "between the LMS and the assessment module manager.",
+                           deployment.name, deployment.name.upper())
+        if secret is None and not PRODUCTION:
+            secret = "abcdef12345"  # noqa: This secret is only used for development setups for simplicity
+        DEPLOYMENT_SECRETS[deployment.url] = secret
+
+
+_load_module_secrets(list_modules())
+_load_deployment_secrets(list_deployments())
+# modules and deployments that are added to the config files later need their secrets as well
+module_registry.add_reload_listener(lambda modules: _load_module_secrets(modules.values(), is_reload=True))
+deployment_registry.add_reload_listener(lambda deployments: _load_deployment_secrets(deployments.values()))
+
+# reload modules.ini and deployments.ini when they change
+CONFIG_RELOAD_INTERVAL = float(os.environ.get("CONFIG_RELOAD_INTERVAL", "10"))
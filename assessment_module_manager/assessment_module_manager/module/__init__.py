@@ -1,11 +1,26 @@
 from .list_modules import list_modules
-from .module import Module
-from .request_to_module import ModuleResponse, find_module_by_name, request_to_module
+from .module import LoadBalancingStrategy, Module
+from .module_client import get_module_client, open_module_clients, close_module_clients
+from .health_monitor import ModuleHealth, ReplicaHealth, health_monitor
+from .load_balancer import order_replicas
+from .admission_control import AdmissionInfo, admit_request
+from .request_to_module import ModuleResponse, find_module_by_name, request_to_module, stream_from_module
 
 __all__ = [
     "Module",
+    "LoadBalancingStrategy",
     "list_modules",
     "ModuleResponse",
     "find_module_by_name",
     "request_to_module",
+    "stream_from_module",
+    "get_module_client",
+    "open_module_clients",
+    "close_module_clients",
+    "ModuleHealth",
+    "ReplicaHealth",
+    "order_replicas",
+    "AdmissionInfo",
+    "admit_request",
+    "health_monitor",
 ]
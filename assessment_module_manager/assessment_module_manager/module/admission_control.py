@@ -0,0 +1,145 @@
+"""
+Admission control for the requests to the modules.
+
+Every module (and optionally every endpoint of a module) has a cap on the number of concurrent requests.
+Requests over the cap wait in a bounded queue. If the queue is full, the request is rejected right away with 429,
+if it waited for longer than MODULE_QUEUE_TIMEOUT, it is rejected with 503. Both come with a Retry-After header,
+so that the LMS backs off instead of piling up more requests on an overloaded module.
+"""
+import asyncio
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+
+from assessment_module_manager import env
+from .module import Module
+
+
+class AdmissionInfo(BaseModel):
+    """How long a request waited before it was forwarded to the module."""
+    queue_depth: int = Field(description="Number of requests waiting before this one when it arrived", example=3)
+    queue_wait_ms: float = Field(description="Time spent waiting in the queue", example=1520.0)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class ConcurrencyLimiter:
+    """Limits the number of concurrent requests, with a bounded FIFO queue for the requests over the limit."""
+
+    def __init__(self, max_concurrent: int, max_queued: int):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        # moving average of the request duration, to estimate Retry-After
+        self._average_duration: Optional[float] = None
+
+    def retry_after(self) -> int:
+        """Estimated seconds until the queue has room again."""
+        average_duration = self._average_duration or 1.0
+        return max(1, math.ceil(average_duration * (self.waiting + 1) / self.max_concurrent))
+
+    async def acquire(self, timeout: float) -> int:
+        """Wait for a free slot. Returns the queue depth on arrival."""
+        queue_depth = self.waiting
+        if self.active >= self.max_concurrent and queue_depth >= self.max_queued:
+            raise QueueFullError()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=timeout)
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return queue_depth
+
+    def release(self, duration: Optional[float] = None):
+        """Free a slot, duration is the time the request held it (None if it was never used)."""
+        self.active -= 1
+        self._semaphore.release()
+        if duration is None:
+            return
+        if self._average_duration is None:
+            self._average_duration = duration
+        else:
+            self._average_duration = 0.8 * self._average_duration + 0.2 * duration
+
+
+_limiters: Dict[Tuple[str, str], ConcurrencyLimiter] = {}
+
+
+def _get_limiter(key: Tuple[str, str], max_concurrent: int, max_queued: int) -> ConcurrencyLimiter:
+    limiter = _limiters.get(key)
+    if limiter is None or limiter.max_concurrent != max_concurrent or limiter.max_queued != max_queued:
+        # Limits changed in modules.ini, requests holding the old limiter finish on it
+        limiter = ConcurrencyLimiter(max_concurrent, max_queued)
+        _limiters[key] = limiter
+    return limiter
+
+
+def get_limiters(module: Module, path: str) -> List[ConcurrencyLimiter]:
+    """The limiters that apply to a request to the given path of the module, endpoint limit first."""
+    max_queued = module.max_queued_requests if module.max_queued_requests is not None else env.MODULE_MAX_QUEUED_REQUESTS
+    limiters = []
+    # Only exact paths are limited, so that e.g. polling GET /feedback_suggestions/{job_id} does not queue behind
+    # the POST /feedback_suggestions requests
+    endpoint = path.strip("/")
+    endpoint_limit = module.endpoint_concurrency_limits.get(endpoint)
+    if endpoint_limit:
+        limiters.append(_get_limiter((module.name, endpoint), endpoint_limit, max_queued))
+    module_limit = module.max_concurrent_requests if module.max_concurrent_requests is not None \
+        else env.MODULE_MAX_CONCURRENT_REQUESTS
+    if module_limit:
+        limiters.append(_get_limiter((module.name, ""), module_limit, max_queued))
+    return limiters
+
+
+class Admission:
+    """A request admitted to a module. It holds its slots until released."""
+
+    def __init__(self, limiters: List[ConcurrencyLimiter], info: AdmissionInfo):
+        self._limiters = limiters
+        self._admitted_at = time.perf_counter()
+        self.info = info
+
+    def release(self):
+        """Free the slots of the request. Only the first call has an effect."""
+        duration = time.perf_counter() - self._admitted_at
+        for limiter in self._limiters:
+            limiter.release(duration)
+        self._limiters = []
+
+
+async def admit_request(module: Module, path: str) -> Admission:
+    """
+    Wait until the request to the path of the module is admitted.
+    Raises an HTTPException with Retry-After if the module is overloaded.
+    The returned admission has to be released when the response of the module is done.
+    """
+    start = time.perf_counter()
+    acquired: List[ConcurrencyLimiter] = []
+    queue_depth = 0
+    try:
+        for limiter in get_limiters(module, path):
+            remaining_timeout = max(env.MODULE_QUEUE_TIMEOUT - (time.perf_counter() - start), 0)
+            try:
+                queue_depth += await limiter.acquire(remaining_timeout)
+            except QueueFullError as exc:
+                raise HTTPException(status_code=429, detail=f"Too many requests to module {module.name}",
+                                    headers={"Retry-After": str(limiter.retry_after())}) from exc
+            except asyncio.TimeoutError as exc:
+                raise HTTPException(status_code=503, detail=f"Module {module.name} is overloaded",
+                                    headers={"Retry-After": str(limiter.retry_after())}) from exc
+            acquired.append(limiter)
+    except BaseException:
+        for limiter in acquired:
+            limiter.release()
+        raise
+
+    queue_wait_ms = (time.perf_counter() - start) * 1000
+    return Admission(acquired, AdmissionInfo(queue_depth=queue_depth, queue_wait_ms=queue_wait_ms))
@@ -0,0 +1,114 @@
+"""
+Background health monitor for the modules.
+
+All replicas of all modules are probed concurrently (with a timeout per probe) on a fixed interval,
+so the health endpoint can answer instantly from the last results.
+Unhealthy replicas are ejected from load balancing until a later probe succeeds.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from pydantic import BaseModel, Field
+
+from assessment_module_manager import env
+from assessment_module_manager.logger import logger
+from .module import Module
+from .list_modules import list_modules
+from .module_client import get_replica_client, get_replica_urls
+
+
+class ReplicaHealth(BaseModel):
+    """Result of the last health probe of a module replica."""
+    healthy: bool = Field(example=True)
+    latency_ms: Optional[float] = Field(description="Duration of the probe, None if it failed", example=12.3)
+    checked_at: datetime = Field(description="When the probe finished (UTC)")
+
+
+class ModuleHealth(ReplicaHealth):
+    """Health of a module: It is healthy if at least one of its replicas is healthy."""
+    replicas: Dict[str, ReplicaHealth] = Field(description="Health of each replica by URL")
+
+
+async def probe_replica(module: Module, url: str) -> ReplicaHealth:
+    """Check whether the health endpoint of the replica reports status ok within HEALTH_PROBE_TIMEOUT."""
+    start = time.perf_counter()
+    latency_ms: Optional[float] = None
+    healthy = False
+    try:
+        response = await get_replica_client(url).get('/', timeout=env.HEALTH_PROBE_TIMEOUT)
+        latency_ms = (time.perf_counter() - start) * 1000
+        healthy = response.status_code == 200 and response.json()["status"] == "ok"
+    except httpx.TimeoutException:
+        logger.debug("Server did not respond within %.1fs: %s (%s)", env.HEALTH_PROBE_TIMEOUT, module.name, url)
+    except httpx.TransportError:
+        logger.debug("Server is not reachable: %s (%s)", module.name, url)
+    except KeyError:
+        logger.debug("Response does not contain a 'status' key: %s (%s)", module.name, url)
+    except (TypeError, ValueError):
+        logger.debug("Response is not JSON: %s (%s)", module.name, url)
+    return ReplicaHealth(healthy=healthy, latency_ms=latency_ms, checked_at=datetime.now(timezone.utc))
+
+
+class HealthMonitor:
+    """Keeps the latest health of every module replica, refreshed in the background."""
+
+    def __init__(self):
+        self._health: Dict[str, ReplicaHealth] = {}
+
+    def _set_health(self, module: Module, url: str, health: ReplicaHealth):
+        previous_health = self._health.get(url)
+        if not health.healthy and (previous_health is None or previous_health.healthy):
+            logger.error("Module %s is unhealthy: %s", module.name, url)
+        elif health.healthy and previous_health is not None and not previous_health.healthy:
+            logger.info("Module %s is healthy again: %s", module.name, url)
+        self._health[url] = health
+
+    async def refresh(self, modules: Optional[List[Module]] = None):
+        """Probe all replicas of the given modules (default: all) concurrently."""
+        if modules is None:
+            modules = list_modules()
+        replicas: List[Tuple[Module, str]] = [(module, url) for module in modules for url in get_replica_urls(module)]
+        results = await asyncio.gather(*(probe_replica(module, url) for module, url in replicas))
+        for (module, url), health in zip(replicas, results):
+            self._set_health(module, url, health)
+
+    async def run(self, interval: float):
+        """Refresh the health of all modules every interval seconds."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Health check failed")
+            await asyncio.sleep(interval)
+
+    def is_replica_healthy(self, url: str) -> Optional[bool]:
+        """Whether the replica was healthy on the last probe, None if it was not probed yet."""
+        health = self._health.get(url)
+        return health.healthy if health is not None else None
+
+    def mark_unhealthy(self, module: Module, url: str):
+        """Eject a replica that failed a request until the next successful probe."""
+        self._set_health(module, url, ReplicaHealth(healthy=False, latency_ms=None,
+                                                    checked_at=datetime.now(timezone.utc)))
+
+    async def get_health(self, module: Module) -> ModuleHealth:
+        """Get the last known health of the module, probing it right away if it was never probed."""
+        urls = get_replica_urls(module)
+        if any(url not in self._health for url in urls):
+            await self.refresh([module])
+        replicas = {url: self._health[url] for url in urls}
+        healthy_latencies = [
+            health.latency_ms for health in replicas.values() if health.healthy and health.latency_ms is not None
+        ]
+        return ModuleHealth(
+            healthy=any(health.healthy for health in replicas.values()),
+            latency_ms=min(healthy_latencies) if healthy_latencies else None,
+            checked_at=max(health.checked_at for health in replicas.values()),
+            replicas=replicas,
+        )
+
+
+health_monitor = HealthMonitor()
@@ -8,21 +8,45 @@ from pydantic import AnyHttpUrl
 
 from athena import ExerciseType
 
-from .module import Module
+from assessment_module_manager.config_registry import ConfigRegistry, register_config_registry
+from .module import LoadBalancingStrategy, Module
+
+
+# Concurrency limit for a single endpoint, e.g. max_concurrent_requests.feedback_suggestions = 4
+ENDPOINT_CONCURRENCY_LIMIT_PREFIX = "max_concurrent_requests."
+
+
+def _parse_module(module: str, module_config: configparser.SectionProxy) -> Module:
+    # Multiple replicas of a module are given as a comma-separated list of URLs
+    urls = [
+        cast(AnyHttpUrl, url.strip())
+        for url in os.environ.get(f"{module.upper()}_URL", module_config["url"]).split(",")
+        if url.strip()
+    ]
+    return Module(
+        name=module,
+        url=urls[0],
+        urls=urls,
+        load_balancing=LoadBalancingStrategy(module_config.get("load_balancing", LoadBalancingStrategy.least_outstanding)),
+        max_concurrent_requests=module_config.getint("max_concurrent_requests"),
+        max_queued_requests=module_config.getint("max_queued_requests"),
+        endpoint_concurrency_limits={
+            key[len(ENDPOINT_CONCURRENCY_LIMIT_PREFIX):]: module_config.getint(key)
+            for key in module_config if key.startswith(ENDPOINT_CONCURRENCY_LIMIT_PREFIX)
+        },
+        type=ExerciseType(module_config["type"]),
+        supports_evaluation=module_config.getboolean("supports_evaluation"),
+        supports_non_graded_feedback_requests=module_config.getboolean("supports_non_graded_feedback_requests"),
+        supports_graded_feedback_requests=module_config.getboolean("supports_graded_feedback_requests")
+    )
+
+
+# modules.ini is only read on startup and when it changes
+module_registry: ConfigRegistry[Module] = ConfigRegistry(Path(__file__).parent.parent.parent / "modules.ini",
+                                                         _parse_module)
+register_config_registry(module_registry)
 
 
 def list_modules() -> List[Module]:
     """Get a list of all Athena modules that are available."""
-    modules_config = configparser.ConfigParser()
-    modules_config.read(Path(__file__).parent.parent.parent / "modules.ini")
-    return [
-        Module(
-            name=module,
-            url=cast(AnyHttpUrl, os.environ.get(f"{module.upper()}_URL", modules_config[module]["url"])),
-            type=ExerciseType(modules_config[module]["type"]),
-            supports_evaluation=modules_config[module].getboolean("supports_evaluation"),
-            supports_non_graded_feedback_requests=modules_config[module].getboolean("supports_non_graded_feedback_requests"),
-            supports_graded_feedback_requests=modules_config[module].getboolean("supports_graded_feedback_requests")
-        )
-        for module in modules_config.sections()
-    ]
+    return module_registry.list()
@@ -0,0 +1,57 @@
+"""
+Distributes the requests to a module across its replicas.
+
+Replicas are ordered by preference for every request: Healthy replicas come first, then replicas that were not probed
+yet, and ejected (unhealthy) replicas last, so they are only used if nothing else is left.
+Within these groups, the module's load balancing strategy decides:
+- least_outstanding: the replica with the fewest requests in flight from this manager
+- exercise_hash: rendezvous hashing on the exercise ID, so that the requests for one exercise hit the same replica
+  (and its caches), and only the exercises of a removed replica move elsewhere
+"""
+import hashlib
+import random
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from .module import LoadBalancingStrategy, Module
+from .module_client import get_replica_urls
+from .health_monitor import health_monitor
+
+_outstanding_requests: Dict[str, int] = defaultdict(int)
+
+
+def _rendezvous_score(url: str, exercise_id: int) -> int:
+    return int.from_bytes(hashlib.sha256(f"{exercise_id}:{url}".encode("utf-8")).digest()[:8], "big")
+
+
+def _health_rank(url: str) -> int:
+    healthy = health_monitor.is_replica_healthy(url)
+    if healthy is None:
+        return 1
+    return 0 if healthy else 2
+
+
+def order_replicas(module: Module, exercise_id: Optional[int] = None) -> List[str]:
+    """Return the replica URLs of the module, most preferred first."""
+    urls = get_replica_urls(module)
+    if module.load_balancing == LoadBalancingStrategy.exercise_hash and exercise_id is not None:
+        urls.sort(key=lambda url: _rendezvous_score(url, exercise_id), reverse=True)
+    else:
+        random.shuffle(urls)  # break ties randomly
+        urls.sort(key=lambda url: _outstanding_requests[url])
+    urls.sort(key=_health_rank)  # stable, keeps the order within the same health
+    return urls
+
+
+def acquire_replica(url: str):
+    """Count a request to the replica as outstanding."""
+    _outstanding_requests[url] += 1
+
+
+def release_replica(url: str):
+    """Count a request to the replica as done."""
+    _outstanding_requests[url] -= 1
+
+
+def get_outstanding_requests(url: str) -> int:
+    return _outstanding_requests[url]
@@ -1,12 +1,34 @@
+from enum import Enum
+from typing import Dict, List, Optional
+
 from pydantic import BaseModel, Field, AnyHttpUrl
 
 from athena import ExerciseType
 
 
+class LoadBalancingStrategy(str, Enum):
+    """How requests are distributed across the replicas of a module."""
+    least_outstanding = "least_outstanding"  # replica with the fewest requests in flight
+    exercise_hash = "exercise_hash"  # same exercise always goes to the same replica (as long as it is healthy)
+
+
 class Module(BaseModel):
     """An Athena module, with the URL to the API as well as the type of module."""
     name: str = Field(example="module_example")
     url: AnyHttpUrl = Field(example="http://localhost:5001")
+    urls: List[AnyHttpUrl] = Field([], description="URLs of all replicas of the module, the first one is `url`",
+                                   example=["http://localhost:5001", "http://localhost:5011"])
+    load_balancing: LoadBalancingStrategy = Field(LoadBalancingStrategy.least_outstanding,
+                                                  description="How requests are distributed across the replicas",
+                                                  example=LoadBalancingStrategy.least_outstanding)
+    max_concurrent_requests: Optional[int] = Field(None, description="Maximum number of concurrent requests to the module, "
+                                                                     "0 for no limit, None for the default",
+                                                   example=8)
+    max_queued_requests: Optional[int] = Field(None, description="Maximum number of requests waiting for the concurrency limit, "
+                                                                 "None for the default",
+                                               example=100)
+    endpoint_concurrency_limits: Dict[str, int] = Field({}, description="Maximum number of concurrent requests per endpoint",
+                                                        example={"feedback_suggestions": 4})
     type: ExerciseType = Field(example=ExerciseType.text)
     supports_evaluation: bool = Field(description="Whether the module supports evaluation", example=True)
     supports_non_graded_feedback_requests: bool = Field(description="Whether the module supports non-graded feedback requests", example=True)
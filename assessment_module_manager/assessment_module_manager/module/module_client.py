@@ -0,0 +1,92 @@
+"""
+One long-lived, connection-pooled HTTP client per module replica.
+
+The clients are created at startup of the assessment module manager and closed at shutdown,
+so that proxied requests and health checks reuse the keep-alive connections to the modules.
+"""
+import asyncio
+from typing import Dict, List
+
+import httpx
+
+from assessment_module_manager import env
+from assessment_module_manager.logger import logger
+from .module import Module
+from .list_modules import list_modules, module_registry
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _is_http2_available() -> bool:
+    if not env.MODULE_HTTP2:
+        return False
+    try:
+        import h2  # type: ignore # pylint: disable=import-outside-toplevel,unused-import
+    except ImportError:
+        logger.warning("MODULE_HTTP2 is set, but the h2 package is not installed. Falling back to HTTP/1.1.")
+        return False
+    return True
+
+
+def _create_client(url: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=url,
+        timeout=httpx.Timeout(env.MODULE_REQUEST_TIMEOUT, connect=env.MODULE_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=env.MODULE_MAX_CONNECTIONS,
+                            max_keepalive_connections=env.MODULE_MAX_KEEPALIVE_CONNECTIONS),
+        http2=_is_http2_available(),
+    )
+
+
+def get_replica_urls(module: Module) -> List[str]:
+    """URLs of all replicas of the module."""
+    return [str(url) for url in module.urls] or [str(module.url)]
+
+
+def get_replica_client(url: str) -> httpx.AsyncClient:
+    """Get the shared client for the module replica with the given URL."""
+    client = _clients.get(url)
+    if client is None or client.is_closed:
+        client = _create_client(url)
+        _clients[url] = client
+    return client
+
+
+def get_module_client(module: Module) -> httpx.AsyncClient:
+    """Get the shared client for the (first replica of the) given module."""
+    return get_replica_client(str(module.url))
+
+
+def _on_modules_reloaded(modules: Dict[str, Module]):
+    """Drop the clients of replicas that were removed or whose URL changed."""
+    urls = {url for module in modules.values() for url in get_replica_urls(module)}
+    for url, client in list(_clients.items()):
+        if url not in urls:
+            del _clients[url]
+            try:
+                # Requests that are still running keep using the old client, so it is closed after the request timeout
+                asyncio.get_running_loop().create_task(_close_later(client))
+            except RuntimeError:
+                pass  # no event loop (yet), nothing can be using the client
+
+
+async def _close_later(client: httpx.AsyncClient):
+    await asyncio.sleep(env.MODULE_REQUEST_TIMEOUT)
+    await client.aclose()
+
+
+module_registry.add_reload_listener(_on_modules_reloaded)
+
+
+async def open_module_clients():
+    """Create the clients for all replicas of all modules."""
+    for module in list_modules():
+        for url in get_replica_urls(module):
+            get_replica_client(url)
+
+
+async def close_module_clients():
+    """Close the clients of all modules."""
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
@@ -1,12 +1,18 @@
 import json
-from typing import TypeVar, Generic, Optional
+from typing import AsyncIterator, TypeVar, Generic, Optional, Tuple
 
 import httpx
 from fastapi import HTTPException
 from pydantic.generics import GenericModel
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
 
 from .module import Module
-from .list_modules import list_modules
+from .list_modules import module_registry
+from .module_client import get_replica_client
+from .health_monitor import health_monitor
+from .load_balancer import order_replicas, acquire_replica, release_replica
+from .admission_control import AdmissionInfo, admit_request
 from athena import ExerciseType
 from assessment_module_manager import env
 from assessment_module_manager.logger import logger
@@ -23,21 +29,43 @@ class ModuleResponse(GenericModel, Generic[D, M]):
     meta: M
 
 
+# Responses of endpoints decorated with @with_meta in the modules start like this
+ENVELOPE_START = b'{"data":'
+
+# Responses with these media types are streamed through without wrapping them
+STREAMING_MEDIA_TYPES = ("application/x-ndjson", "text/event-stream")
+
+# Bytes at the end of a streamed envelope that are held back to add the admission info to its meta
+ENVELOPE_TAIL_SIZE = 64
+
+# Responses that mean that the replica could not handle the request, so another replica might
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+
 async def find_module_by_name(module_name: str) -> Optional[Module]:
     """
     Helper function to find a module by name.
     """
-    for module in list_modules():
-        if module.name == module_name:
-            return module
-    return None
+    return module_registry.get(module_name)
 
 
-async def request_to_module(module: Module, headers: dict, path: str, lms_url: str, data: Optional[dict], method: str) -> ModuleResponse:
+def _add_to_envelope_meta(tail: bytes, key: str, value: dict) -> bytes:
     """
-    Helper function to send a request to a module.
-    It raises appropriate FastAPI HTTPException if the request fails.
+    Add a key to the meta of an envelope, given the end of the serialized envelope: `...,"meta":{...}}`.
+    Returns the tail unchanged if it does not end with an object in an object.
     """
+    stripped = tail.rstrip()
+    if not stripped.endswith(b"}"):
+        return tail
+    stripped = stripped[:-1].rstrip()
+    if not stripped.endswith(b"}"):
+        return tail
+    stripped = stripped[:-1].rstrip()
+    separator = b"" if stripped.endswith(b"{") else b","
+    return stripped + separator + json.dumps(key).encode("utf-8") + b":" + json.dumps(value).encode("utf-8") + b"}}"
+
+
+def _prepare_headers(module: Module, headers: dict, lms_url: str) -> dict:
     module_secret = env.MODULE_SECRETS[module.name]
     if module_secret:
         headers['Authorization'] = module_secret  # for inter-Athena communication
@@ -49,25 +77,174 @@ async def request_to_module(module: Module, headers: dict, path: str, lms_url: s
         headers['X-Repository-Authorization-Secret'] = env.DEPLOYMENT_SECRETS.get(lms_url, "")
         # for repository access
         # should be the same as the LMS key
+    return headers
 
+
+async def _send(module: Module, headers: dict, path: str, data: Optional[dict], method: str,
+                stream: bool, exercise_id: Optional[int] = None) -> Tuple[httpx.Response, str]:
+    """
+    Send the request to a replica of the module, failing over to the next replica if it cannot be reached.
+    Other failures are only retried for GET requests, because POST requests are not idempotent.
+    Returns the response and the URL of the replica, which has to be released with release_replica when done.
+    """
+    if method not in ("POST", "GET"):
+        raise NotImplementedError(f"Method {method} is not implemented")
+
+    urls = order_replicas(module, exercise_id)[:max(env.MODULE_MAX_ATTEMPTS, 1)]
+    for attempt, url in enumerate(urls, start=1):
+        is_last_attempt = attempt == len(urls)
+        client = get_replica_client(url)
+        request = client.build_request(method, path, json=data if method == "POST" else None, headers=headers)
+        acquire_replica(url)
+        try:
+            response = await client.send(request, stream=stream)
+        except httpx.ConnectError as exc:
+            # The request never reached the module, so it is safe to try another replica
+            release_replica(url)
+            health_monitor.mark_unhealthy(module, url)
+            if is_last_attempt:
+                raise HTTPException(status_code=503, detail=f"Module {module.name} is not available") from exc
+            logger.warning("Module %s is not reachable at %s, trying another replica", module.name, url)
+            continue
+        except httpx.TransportError:
+            release_replica(url)
+            if method != "GET" or is_last_attempt:
+                raise
+            logger.warning("Request to module %s at %s failed, trying another replica", module.name, url)
+            continue
+        except BaseException:
+            release_replica(url)
+            raise
+
+        if method == "GET" and response.status_code in RETRYABLE_STATUS_CODES and not is_last_attempt:
+            await response.aclose()
+            release_replica(url)
+            logger.warning("Module %s at %s responded with %d, trying another replica",
+                           module.name, url, response.status_code)
+            continue
+        return response, url
+    raise HTTPException(status_code=503, detail=f"Module {module.name} is not available")
+
+
+def _to_module_response(module: Module, status_code: int, content: bytes,
+                        admission_info: Optional[AdmissionInfo] = None) -> ModuleResponse:
     try:
-        async with httpx.AsyncClient(base_url=module.url, timeout=600) as client:
-            if method == "POST":
-                response = await client.post(path, json=data, headers=headers)
-            elif method == "GET":
-                response = await client.get(path, headers=headers)
-            else:
-                raise NotImplementedError(f"Method {method} is not implemented")
-    except httpx.ConnectError as exc:
-        raise HTTPException(status_code=503, detail=f"Module {module.name} is not available") from exc
-    
-    try:
-        response_data = response.json()
+        response_data = json.loads(content)
         meta = response_data.get('meta', {})
         response_data = response_data.get('data', response_data)
-    except json.JSONDecodeError:
-        response_data = response.text
+    except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+        response_data = content.decode("utf-8", errors="replace")
         meta = None
-        logger.warning("Module %s returned non-JSON response: %s", module.name, response.text)
+        logger.warning("Module %s returned non-JSON response: %s", module.name, response_data)
+
+    if admission_info is not None and (meta is None or isinstance(meta, dict)):
+        meta = {**(meta or {}), "admission": admission_info.dict()}
+
+    return ModuleResponse(module_name=module.name, status=status_code, data=response_data, meta=meta)
+
+
+async def request_to_module(module: Module, headers: dict, path: str, lms_url: str, data: Optional[dict], method: str,
+                            exercise_id: Optional[int] = None) -> ModuleResponse:
+    """
+    Helper function to send a request to a module.
+    It raises appropriate FastAPI HTTPException if the request fails.
+    If the module has multiple replicas, exercise_id is used to route requests for the same exercise to the same replica.
+    """
+    headers = _prepare_headers(module, headers, lms_url)
+    admission = await admit_request(module, path)
+    try:
+        response, url = await _send(module, headers, path, data, method, stream=False, exercise_id=exercise_id)
+        release_replica(url)
+    finally:
+        admission.release()
+    return _to_module_response(module, response.status_code, response.content, admission.info)
+
+
+async def stream_from_module(module: Module, headers: dict, path: str, lms_url: str, data: Optional[dict], method: str,
+                             exercise_id: Optional[int] = None) -> StreamingResponse:
+    """
+    Like request_to_module, but streams the response of the module back to the client.
+
+    Responses in the data/meta envelope of the modules are re-wrapped on the fly by prepending the module name and status
+    instead of parsing and serializing the whole payload again. Streams of results (NDJSON or server-sent events) are
+    passed through unchanged. Other responses are wrapped as in request_to_module.
+    The request holds its admission slot until the response is streamed completely.
+    """
+    headers = _prepare_headers(module, headers, lms_url)
+    admission = await admit_request(module, path)
+    response: Optional[httpx.Response] = None
+    url: Optional[str] = None
+    is_closed = False
+
+    async def close_response():
+        # Called from every path that ends the request, only the first call has an effect
+        nonlocal is_closed
+        if is_closed:
+            return
+        is_closed = True
+        try:
+            if response is not None:
+                await response.aclose()
+        finally:
+            if url is not None:
+                release_replica(url)
+            admission.release()
+
+    async def closing(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        # Also releases everything if the client disconnects, when the background task of the response does not run
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await close_response()
+
+    try:
+        response, url = await _send(module, headers, path, data, method, stream=True, exercise_id=exercise_id)
+
+        if response.headers.get("content-type", "").startswith(STREAMING_MEDIA_TYPES):
+            # Streams of results (e.g. NDJSON of /feedback_suggestions/batch) are passed through as they are,
+            # every chunk is forwarded as soon as it arrives (and proxies in front are asked not to buffer it either)
+            return StreamingResponse(closing(response.aiter_bytes()), status_code=response.status_code,
+                                     media_type=response.headers["content-type"],
+                                     headers={"X-Module-Name": module.name,
+                                              "X-Queue-Depth": str(admission.info.queue_depth),
+                                              "X-Queue-Wait-Ms": f"{admission.info.queue_wait_ms:.0f}",
+                                              "Cache-Control": "no-cache",
+                                              "X-Accel-Buffering": "no"},
+                                     background=BackgroundTask(close_response))
+
+        # Peek at the start of the body to decide whether it is an envelope
+        chunks = response.aiter_bytes()
+        head = b""
+        async for chunk in chunks:
+            head += chunk
+            if len(head.lstrip()) >= len(ENVELOPE_START):
+                break
+
+        if not head.lstrip().startswith(ENVELOPE_START):
+            # Not an envelope, fall back to wrapping the whole response
+            body = head + b"".join([chunk async for chunk in chunks])
+            await close_response()
+            module_response = _to_module_response(module, response.status_code, body, admission.info)
+            return StreamingResponse(iter([module_response.json().encode("utf-8")]),
+                                     status_code=response.status_code, media_type="application/json")
+
+        status_code = response.status_code
+
+        async def body_iterator() -> AsyncIterator[bytes]:
+            # {"data": ..., "meta": ...} -> {"module_name": ..., "status": ..., "data": ..., "meta": ...}
+            yield json.dumps({"module_name": module.name, "status": status_code})[:-1].encode("utf-8") + b","
+            # The end of the envelope is held back to add the admission info to the meta
+            buffer = head.lstrip()[1:]
+            async for chunk in chunks:
+                buffer += chunk
+                if len(buffer) > ENVELOPE_TAIL_SIZE:
+                    yield buffer[:-ENVELOPE_TAIL_SIZE]
+                    buffer = buffer[-ENVELOPE_TAIL_SIZE:]
+            yield _add_to_envelope_meta(buffer, "admission", admission.info.dict())
 
-    return ModuleResponse(module_name=module.name, status=response.status_code, data=response_data, meta=meta)
\ No newline at end of file
+        return StreamingResponse(closing(body_iterator()), status_code=status_code, media_type="application/json",
+                                 background=BackgroundTask(close_response))
+    except BaseException:
+        await close_response()
+        raise
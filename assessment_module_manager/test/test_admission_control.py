@@ -0,0 +1,145 @@
+import asyncio
+import importlib
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from athena import ExerciseType
+from assessment_module_manager import env
+from assessment_module_manager.module import Module, admit_request, request_to_module, stream_from_module
+from assessment_module_manager.module import admission_control
+from assessment_module_manager.module.load_balancer import acquire_replica, get_outstanding_requests
+
+# The package exports the function of the same name
+proxy = importlib.import_module("assessment_module_manager.module.request_to_module")
+
+PATH = "/feedback_suggestions"
+REPLICA_URL = "http://localhost:5999"
+
+module = Module(
+    name="module_test",
+    url=REPLICA_URL,
+    urls=[REPLICA_URL],
+    max_concurrent_requests=1,
+    max_queued_requests=1,
+    type=ExerciseType.text,
+    supports_evaluation=False,
+    supports_non_graded_feedback_requests=True,
+    supports_graded_feedback_requests=True,
+)
+
+
+@pytest.fixture(name="fresh_limiters", autouse=True)
+def fixture_fresh_limiters(monkeypatch):
+    monkeypatch.setattr(admission_control, "_limiters", {})
+    monkeypatch.setitem(env.MODULE_SECRETS, module.name, None)
+
+
+def get_limiter() -> admission_control.ConcurrencyLimiter:
+    return admission_control.get_limiters(module, PATH)[0]
+
+
+def test_rejected_with_429_if_the_queue_is_full():
+    async def scenario():
+        first = await admit_request(module, PATH)
+        queued = asyncio.ensure_future(admit_request(module, PATH))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as exc_info:
+            await admit_request(module, PATH)
+        first.release()
+        (await queued).release()
+        return exc_info.value
+
+    error = asyncio.run(scenario())
+
+    assert error.status_code == 429
+    assert error.headers == {"Retry-After": "2"}  # 1 second per request by default, one request is waiting
+    assert get_limiter().active == 0
+    assert get_limiter().waiting == 0
+
+
+def test_rejected_with_503_after_the_queue_timeout(monkeypatch):
+    monkeypatch.setattr(env, "MODULE_QUEUE_TIMEOUT", 0.01)
+
+    async def scenario():
+        first = await admit_request(module, PATH)
+        with pytest.raises(HTTPException) as exc_info:
+            await admit_request(module, PATH)
+        assert get_limiter().waiting == 0
+        first.release()
+        # The slot is free for the next request right away
+        (await asyncio.wait_for(admit_request(module, PATH), timeout=1)).release()
+        return exc_info.value
+
+    error = asyncio.run(scenario())
+
+    assert error.status_code == 503
+    assert int(error.headers["Retry-After"]) >= 1
+    assert get_limiter().active == 0
+
+
+def test_endpoint_slot_released_if_the_module_limit_times_out(monkeypatch):
+    monkeypatch.setattr(env, "MODULE_QUEUE_TIMEOUT", 0.01)
+    limited_module = module.copy(update={"endpoint_concurrency_limits": {"feedback_suggestions": 2}})
+
+    async def scenario():
+        first = await admit_request(limited_module, PATH)
+        with pytest.raises(HTTPException):
+            await admit_request(limited_module, PATH)
+        first.release()
+
+    asyncio.run(scenario())
+
+    endpoint_limiter, module_limiter = admission_control.get_limiters(limited_module, PATH)
+    assert endpoint_limiter.active == 0
+    assert module_limiter.active == 0
+
+
+def test_admission_released_only_once():
+    async def scenario():
+        admission = await admit_request(module, PATH)
+        admission.release()
+        admission.release()
+
+    asyncio.run(scenario())
+
+    assert get_limiter().active == 0
+
+
+@pytest.mark.parametrize("send_to_module", [request_to_module, stream_from_module])
+def test_slot_released_if_the_module_request_fails(monkeypatch, send_to_module):
+    async def failing_send(*args, **kwargs):
+        raise httpx.ReadTimeout("The module did not respond")
+
+    monkeypatch.setattr(proxy, "_send", failing_send)
+
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(send_to_module(module, {}, PATH, "http://lms", {}, "POST"))
+
+    assert get_limiter().active == 0
+
+
+def test_slot_released_if_the_client_disconnects(monkeypatch):
+    async def ndjson_lines():
+        for index in range(3):
+            yield f'{{"index":{index}}}\n'.encode("utf-8")
+
+    async def streaming_send(*args, **kwargs):
+        acquire_replica(REPLICA_URL)
+        return httpx.Response(200, headers={"content-type": "application/x-ndjson"},
+                              content=ndjson_lines()), REPLICA_URL
+
+    monkeypatch.setattr(proxy, "_send", streaming_send)
+
+    async def scenario():
+        response = await stream_from_module(module, {}, PATH, "http://lms", {}, "POST")
+        assert get_limiter().active == 1
+        first_line = await response.body_iterator.__anext__()
+        # The client went away, so the response is closed after the first line (without the background task)
+        await response.body_iterator.aclose()
+        return first_line
+
+    assert asyncio.run(scenario()) == b'{"index":0}\n'
+    assert get_limiter().active == 0
+    assert get_outstanding_requests(REPLICA_URL) == 0
@@ -3,6 +3,8 @@ The main app instance for your module. Try not to use the FastAPI functionality
 Instead, use the decorators in the `athena` package.
 The only exception is the `start` method, which is used to start the module.
 """
+import sys
+
 import uvicorn
 from uvicorn.config import LOGGING_CONFIG
 from fastapi import FastAPI, Request
@@ -10,12 +12,13 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
 from . import env
-from .database import create_tables
+from .database import create_tables, dispose_async_engine
 from .logger import logger
 from .module_config import get_module_config
 from .metadata import MetaDataMiddleware
 from .experiment import ExperimentMiddleware
 from .helpers.programming.repository_authorization_middleware import init_repo_auth_middleware
+from .helpers.programming.code_repository import close_async_client
 
 
 class FastAPIWithStart(FastAPI):
@@ -63,6 +66,27 @@ app: FastAPIWithStart = FastAPIWithStart()
 init_repo_auth_middleware(app)
 
 
+@app.on_event("shutdown")
+async def close_repository_download_client():
+    """Close the pooled connections used for async repository downloads."""
+    await close_async_client()
+
+
+@app.on_event("shutdown")
+async def close_llm_http_clients():
+    """Close the pooled connections to the LLM providers, if the module uses llm_core."""
+    # athena does not depend on llm_core, and if the module did not load the providers, there is nothing to close
+    llm_providers = sys.modules.get("llm_core.models.openai")
+    if llm_providers is not None:
+        await llm_providers.close_http_clients()
+
+
+@app.on_event("shutdown")
+async def close_async_database_connections():
+    """Close the pooled connections of the async database engine."""
+    await dispose_async_engine()
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     logger.error("Validation error: %s \n Errors: %s\n Request body: %s", exc, exc.errors(), exc.body)
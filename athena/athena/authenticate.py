@@ -6,7 +6,12 @@ from fastapi import HTTPException, Depends
 from fastapi.security import APIKeyHeader
 
 from athena import env
-from athena.contextvars import set_lms_url_context_var
+from athena.contextvars import (
+    get_repository_authorization_secret_context_var,
+    remember_repository_authorization_secret,
+    repository_authorization_secret_context_var_empty,
+    set_lms_url_context_var,
+)
 from athena.logger import logger
 
 api_key_auth_header = APIKeyHeader(name='Authorization', auto_error=False)
@@ -37,6 +42,9 @@ def authenticated(func: Callable) -> Callable:
                       **kwargs):
         verify_inter_module_secret_key(secret)  # this happens after the ASM Module reissued the request
         set_lms_url_context_var(lms_url)
+        if lms_url and not repository_authorization_secret_context_var_empty():
+            # only trusted after the request is authenticated, jobs of the LMS use it later
+            remember_repository_authorization_secret(lms_url, get_repository_authorization_secret_context_var())
         if inspect.iscoroutinefunction(func):
             return await func(*args, **kwargs)
         return func(*args, **kwargs)
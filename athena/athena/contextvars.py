@@ -1,8 +1,13 @@
 import contextvars
+from typing import Dict, Optional
 
 lms_url_context_var: contextvars.ContextVar = contextvars.ContextVar('lms_url')
 repository_authorization_secret_context_var: contextvars.ContextVar = contextvars.ContextVar(
     'repository_authorization_secret')
+# what the current request is for, used to prioritize LLM calls (e.g. in llm_core)
+is_graded_context_var: contextvars.ContextVar = contextvars.ContextVar('is_graded', default=None)
+is_background_context_var: contextvars.ContextVar = contextvars.ContextVar('is_background', default=False)
+is_streaming_context_var: contextvars.ContextVar = contextvars.ContextVar('is_streaming', default=False)
 
 
 def set_lms_url_context_var(lms_url: str):
@@ -23,3 +28,44 @@ def get_repository_authorization_secret_context_var():
 
 def repository_authorization_secret_context_var_empty():
     return repository_authorization_secret_context_var.get(None) is None
+
+
+# repository authorization secrets of the LMSs that sent authenticated requests, by LMS URL, for background jobs that
+# were enqueued without the secret
+_repository_authorization_secrets: Dict[str, str] = {}
+
+
+def remember_repository_authorization_secret(lms_url: str, repository_authorization_secret: str):
+    _repository_authorization_secrets[lms_url] = repository_authorization_secret
+
+
+def get_remembered_repository_authorization_secret(lms_url: str) -> Optional[str]:
+    """Secret that the assessment module manager last sent for the LMS, None if there was no request since the start."""
+    return _repository_authorization_secrets.get(lms_url)
+
+
+def set_is_graded_context_var(is_graded: Optional[bool]):
+    is_graded_context_var.set(is_graded)
+
+
+def get_is_graded() -> Optional[bool]:
+    """Whether the feedback suggestions of the current request are graded, None if unknown."""
+    return is_graded_context_var.get()
+
+
+def set_is_background_context_var(is_background: bool):
+    is_background_context_var.set(is_background)
+
+
+def get_is_background() -> bool:
+    """Whether the current work runs in the background (jobs, batches) instead of for a waiting user."""
+    return is_background_context_var.get()
+
+
+def set_is_streaming_context_var(is_streaming: bool):
+    is_streaming_context_var.set(is_streaming)
+
+
+def get_is_streaming() -> bool:
+    """Whether the client streams the results of the current request (e.g. POST /feedback_suggestions/stream)."""
+    return is_streaming_context_var.get()
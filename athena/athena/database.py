@@ -1,8 +1,11 @@
 import importlib
 import os
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Optional
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from athena import env
@@ -18,13 +21,32 @@ if is_sqlite:
 else:
     connect_args = {}
 
+pool_args: Dict[str, Any] = {
+    "pool_pre_ping": env.DATABASE_POOL_PRE_PING,
+    "pool_recycle": env.DATABASE_POOL_RECYCLE,
+}
+if not is_sqlite:
+    pool_args.update(pool_size=env.DATABASE_POOL_SIZE, max_overflow=env.DATABASE_MAX_OVERFLOW)
+
 engine = create_engine(
-    env.DATABASE_URL, connect_args=connect_args
+    env.DATABASE_URL, connect_args=connect_args, **pool_args
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async drivers for the sync drivers of DATABASE_URL
+async_drivers = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+# The async engine is optional and only created on first use, it needs asyncpg (PostgreSQL) or aiosqlite (SQLite)
+# from the "async" extra of athena
+_async_engine: Optional[AsyncEngine] = None
+_AsyncSessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+
 def create_tables(exercise_type: str):
     """
     Create all tables for models in athena.models, whose name starts with "DB"+exercise_type.name.title().
@@ -46,3 +68,39 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_async_database_url() -> str:
+    """Returns ASYNC_DATABASE_URL or DATABASE_URL with the corresponding async driver."""
+    if env.ASYNC_DATABASE_URL:
+        return env.ASYNC_DATABASE_URL
+    url = make_url(env.DATABASE_URL)
+    if url.drivername not in async_drivers:
+        raise ValueError(f"No async driver known for {url.drivername}, please set ASYNC_DATABASE_URL")
+    return url.set(drivername=async_drivers[url.drivername]).render_as_string(hide_password=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    """Returns the async engine, creating it on first use."""
+    global _async_engine, _AsyncSessionLocal  # pylint: disable=global-statement
+    if _async_engine is None:
+        _async_engine = create_async_engine(get_async_database_url(), connect_args=connect_args, **pool_args)
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+async def dispose_async_engine():
+    """Closes all connections of the async engine (if it was created)."""
+    global _async_engine, _AsyncSessionLocal  # pylint: disable=global-statement
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
+
+
+@asynccontextmanager
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    get_async_engine()
+    assert _AsyncSessionLocal is not None
+    async with _AsyncSessionLocal() as db:
+        yield db
@@ -1,18 +1,31 @@
 # type: ignore # too much weird behavior of mypy with decorators
+import asyncio
 import inspect
-from fastapi import Depends, BackgroundTasks, Body
-from pydantic import BaseModel, ValidationError
-from typing import TypeVar, Callable, List, Union, Any, Coroutine, Type
-
+import json
+import httpx
+from fastapi import Depends, Body, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import AnyHttpUrl, BaseModel, ValidationError
+from typing import TypeVar, Callable, List, Union, Any, AsyncIterator, Coroutine, Type, Optional
+
+from athena import env
 from athena.app import app
 from athena.authenticate import authenticated
-from athena.metadata import with_meta
-from athena.module_config import get_dynamic_module_config_factory
+from athena.contextvars import lms_url_context_var, set_is_background_context_var, set_is_graded_context_var, \
+    set_is_streaming_context_var
+from athena.jobs import enqueue_job, register_job_handler, get_job_queue, get_current_job_id
+from athena.metadata import with_meta, emit_meta, get_meta, metadata_context
+from athena.module_config import get_dynamic_module_config_factory, get_module_config
 from athena.logger import logger
-from athena.schemas import Exercise, Submission, Feedback
+from athena.schemas import Exercise, Submission, Feedback, FeedbackSuggestionsJob, JobStatus
 from athena.schemas.schema import to_camel
+from athena.single_flight import SingleFlight, request_key
 from athena.storage import get_stored_submission_meta, get_stored_exercise_meta, get_stored_feedback_meta, \
-    store_exercise, store_feedback, store_feedback_suggestions, store_submissions, get_stored_submissions
+    store_exercise, store_feedback_suggestions, store_submissions, get_stored_submissions, aget_stored_submissions, \
+    merge_stored_meta_and_store, amerge_stored_meta_and_store, merge_stored_meta_and_store_submissions, \
+    amerge_stored_meta_and_store_submissions, astore_feedback_suggestions, get_cached_feedback_suggestions, \
+    aget_cached_feedback_suggestions, store_cached_feedback_suggestions, astore_cached_feedback_suggestions, \
+    invalidate_cached_feedback_suggestions, ainvalidate_cached_feedback_suggestions
 
 E = TypeVar('E', bound=Exercise)
 S = TypeVar('S', bound=Submission)
@@ -22,6 +35,19 @@ G = TypeVar('G', bound=bool)
 # Config type
 C = TypeVar("C", bound=BaseModel)
 
+
+def _to_payload(model: Optional[BaseModel]) -> Optional[dict]:
+    """Convert a pydantic model to a JSON serializable dict for job payloads."""
+    return json.loads(model.json()) if model is not None else None
+
+
+def _format_event(event: str, data: dict, sse: bool) -> bytes:
+    """One event of a stream of results, as server-sent event or NDJSON line."""
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+    return (json.dumps({"type": event, **data}) + "\n").encode("utf-8")
+
+
 module_responses = {
     403: {
         "description": "API secret is invalid - set the environment variable SECRET and the Authorization header "
@@ -67,11 +93,28 @@ def submissions_consumer(func: Union[
     submission_type = inspect.signature(func).parameters["submissions"].annotation.__args__[0]
     module_config_type = inspect.signature(func).parameters["module_config"].annotation if "module_config" in inspect.signature(func).parameters else None
 
+    job_type = "submissions_consumer"
+
+    async def run_job(payload: dict):
+        exercise = exercise_type.parse_obj(payload["exercise"])
+        submissions = [submission_type.parse_obj(submission) for submission in payload["submissions"]]
+
+        kwargs = {}
+        if "module_config" in inspect.signature(func).parameters:
+            kwargs["module_config"] = (module_config_type.parse_obj(payload["module_config"])
+                                       if payload["module_config"] is not None else None)
+
+        if inspect.iscoroutinefunction(func):
+            await func(exercise, submissions, **kwargs)
+        else:
+            await asyncio.to_thread(func, exercise, submissions, **kwargs)
+
+    register_job_handler(job_type, run_job)
+
     @app.post("/submissions", responses=module_responses)
     @authenticated
     @with_meta
     async def wrapper(
-            background_tasks: BackgroundTasks,
             exercise: exercise_type,
             submissions: List[submission_type],
             module_config: module_config_type = Depends(get_dynamic_module_config_factory(module_config_type))):
@@ -90,20 +133,17 @@ def submissions_consumer(func: Union[
                     submission_meta.update(stored_submission.meta)
                     submissions_dict[stored_submission.id].meta = submission_meta
 
-        kwargs = {}
-        if "module_config" in inspect.signature(func).parameters:
-            kwargs["module_config"] = module_config
-
         store_exercise(exercise)
         submissions = list(submissions_dict.values())
         store_submissions(submissions)
 
-        kwargs = {}
-        if "module_config" in inspect.signature(func).parameters:
-            kwargs["module_config"] = module_config
-
-        # Call the actual consumer asynchronously
-        background_tasks.add_task(func, exercise, submissions, **kwargs)
+        # Call the actual consumer in a durable background job
+        job = await enqueue_job(job_type, {
+            "exercise": _to_payload(exercise),
+            "submissions": [_to_payload(submission) for submission in submissions],
+            "module_config": _to_payload(module_config),
+        })
+        emit_meta("job_id", job.id)
 
         return None
     return wrapper
@@ -235,43 +275,68 @@ def feedback_consumer(func: Union[
     feedback_type = inspect.signature(func).parameters["feedbacks"].annotation.__args__[0]
     module_config_type = inspect.signature(func).parameters["module_config"].annotation if "module_config" in inspect.signature(func).parameters else None
 
+    job_type = "feedback_consumer"
+
+    async def run_job(payload: dict):
+        exercise = exercise_type.parse_obj(payload["exercise"])
+        submission = submission_type.parse_obj(payload["submission"])
+        feedbacks = [feedback_type.parse_obj(feedback) for feedback in payload["feedbacks"]]
+
+        kwargs = {}
+        if "module_config" in inspect.signature(func).parameters:
+            kwargs["module_config"] = (module_config_type.parse_obj(payload["module_config"])
+                                       if payload["module_config"] is not None else None)
+
+        if inspect.iscoroutinefunction(func):
+            await func(exercise, submission, feedbacks, **kwargs)
+        else:
+            await asyncio.to_thread(func, exercise, submission, feedbacks, **kwargs)
+
+    register_job_handler(job_type, run_job)
+
     @app.post("/feedbacks", responses=module_responses)
     @authenticated
     @with_meta
     async def wrapper(
-            background_tasks: BackgroundTasks,
             exercise: exercise_type,
             submission: submission_type,
             feedbacks: List[feedback_type],
             module_config: module_config_type = Depends(get_dynamic_module_config_factory(module_config_type))):
 
-        # Retrieve existing metadata for the exercise, submission and feedback
-        exercise.meta.update(get_stored_exercise_meta(exercise) or {})
-        store_exercise(exercise)
-        submission.meta.update(get_stored_submission_meta(submission) or {})
-        store_submissions([submission])
-        for feedback in feedbacks:
-            feedback.meta.update(get_stored_feedback_meta(feedback) or {})
-            # Change the ID of the LMS to an internal ID
-            feedback.id = store_feedback(feedback, is_lms_id=True).id
-
-        kwargs = {}
-        if "module_config" in inspect.signature(func).parameters:
-            kwargs["module_config"] = module_config
+        # Retrieve existing metadata for the exercise, submission and feedback and store them (in one transaction),
+        # the IDs of the feedbacks are changed from LMS IDs to internal IDs
+        if env.USE_ASYNC_DATABASE:
+            await amerge_stored_meta_and_store(exercise, submission, feedbacks)
+        else:
+            merge_stored_meta_and_store(exercise, submission, feedbacks)
 
-        # Call the actual consumer asynchronously
-        background_tasks.add_task(func, exercise, submission, feedbacks, **kwargs)
+        # Call the actual consumer in a durable background job
+        job = await enqueue_job(job_type, {
+            "exercise": _to_payload(exercise),
+            "submission": _to_payload(submission),
+            "feedbacks": [_to_payload(feedback) for feedback in feedbacks],
+            "module_config": _to_payload(module_config),
+        })
+        emit_meta("job_id", job.id)
 
         return None
     return wrapper
 
 
+# Shared by the identical concurrent requests to the feedback provider
+feedback_suggestions_single_flight: SingleFlight[List[Feedback]] = SingleFlight(
+    cache_ttl=env.FEEDBACK_SUGGESTIONS_CACHE_TTL,
+    cache_max_size=env.FEEDBACK_SUGGESTIONS_CACHE_MAX_SIZE,
+)
+
+
 def feedback_provider(func: Union[
     Callable[[E, S], List[F]],
     Callable[[E, S], Coroutine[Any, Any, List[F]]],
     Callable[[E, S, C], List[F]],
     Callable[[E, S, C], Coroutine[Any, Any, List[F]]],
     Callable[[E, S, G, C], List[F]],
+    Callable[[E, S, G, C], AsyncIterator[F]],
 ]):
     """
     Provide feedback to the Assessment Module Manager.
@@ -299,44 +364,371 @@ def feedback_provider(func: Union[
         >>> @feedback_provider
         ... async def async_suggest_feedback_with_config(exercise: Exercise, submission: Submission, module_config: Optional[dict]):
         ...     # suggest feedback here using module_config and return it as a list
+
+        As an async generator, yielding the feedback one by one (streamed to the client by POST /feedback_suggestions/stream):
+        >>> @feedback_provider
+        ... async def streaming_suggest_feedback(exercise: Exercise, submission: Submission):
+        ...     # suggest feedback here and yield each feedback as soon as it is ready
+        ...     # (`athena.contextvars.get_is_streaming()` tells whether the client actually streams)
     """
     exercise_type = inspect.signature(func).parameters["exercise"].annotation
     submission_type = inspect.signature(func).parameters["submission"].annotation
     module_config_type = inspect.signature(func).parameters["module_config"].annotation if "module_config" in inspect.signature(func).parameters else None
     is_graded_type = inspect.signature(func).parameters["is_graded"].annotation if "is_graded" in inspect.signature(func).parameters else None
 
+    job_type = "feedback_provider"
+    # Read once, the cache keys of the suggestions are scoped to the module
+    module_name = get_module_config().name
+
+    def get_kwargs(is_graded: Optional[bool], module_config: Optional[C]) -> dict:
+        kwargs = {}
+        if "module_config" in inspect.signature(func).parameters:
+            kwargs["module_config"] = module_config
+
+        if "is_graded" in inspect.signature(func).parameters:
+            kwargs["is_graded"] = is_graded
+        return kwargs
+
+    async def get_cached_suggestions(cache_key: str) -> Optional[List[F]]:
+        """The suggestions of an earlier identical request (if the result cache is enabled)."""
+        if not env.FEEDBACK_SUGGESTIONS_RESULT_CACHE:
+            return None
+        if env.USE_ASYNC_DATABASE:
+            return await aget_cached_feedback_suggestions(cache_key)  # type: ignore
+        return get_cached_feedback_suggestions(cache_key)  # type: ignore
+
+    async def store_suggestions(cache_key: str, exercise: E, submission: S, feedbacks: List[F]):
+        if not env.FEEDBACK_SUGGESTIONS_RESULT_CACHE:
+            return
+        ttl = env.FEEDBACK_SUGGESTIONS_RESULT_CACHE_TTL
+        if env.USE_ASYNC_DATABASE:
+            await astore_cached_feedback_suggestions(cache_key, exercise.id, submission.id, feedbacks, ttl)
+        else:
+            store_cached_feedback_suggestions(cache_key, exercise.id, submission.id, feedbacks, ttl)
+
+    async def provide_feedback(exercise: E, submission: S, is_graded: Optional[bool], module_config: Optional[C],
+                               key: str) -> List[F]:
+        set_is_graded_context_var(is_graded)
+        kwargs = get_kwargs(is_graded, module_config)
+
+        async def suggest_feedback() -> List[F]:
+            # Return the suggestions of an earlier identical request right away (if enabled)
+            cache_key = request_key(module_name, key)
+            cached_feedbacks = await get_cached_suggestions(cache_key)
+            if cached_feedbacks is not None:
+                emit_meta("cached_result", True)
+                return cached_feedbacks
+
+            # Call the actual provider
+            if inspect.isasyncgenfunction(func):
+                feedbacks = [feedback async for feedback in func(exercise, submission, **kwargs)]
+            elif inspect.iscoroutinefunction(func):
+                feedbacks = await func(exercise, submission, **kwargs)
+            else:
+                feedbacks = func(exercise, submission, **kwargs)
+
+            # Store feedback suggestions and assign internal IDs
+            if env.USE_ASYNC_DATABASE:
+                feedbacks = await astore_feedback_suggestions(feedbacks)
+            else:
+                feedbacks = store_feedback_suggestions(feedbacks)
+
+            await store_suggestions(cache_key, exercise, submission, feedbacks)
+            return feedbacks
+
+        if not env.FEEDBACK_SUGGESTIONS_SINGLE_FLIGHT:
+            return await suggest_feedback()
+
+        # Labeled like the entries of the result cache, so that they are invalidated together
+        labels = {"lms_url": lms_url_context_var.get(None), "exercise_id": exercise.id, "submission_id": submission.id}
+        feedbacks, meta, shared = await feedback_suggestions_single_flight.run(key, suggest_feedback, labels)
+        for meta_key, value in meta.items():
+            emit_meta(meta_key, value)
+        if shared:
+            emit_meta("shared_result", True)
+        return feedbacks
+
+    async def stream_feedback(exercise: E, submission: S, is_graded: Optional[bool], module_config: Optional[C],
+                              key: str) -> AsyncIterator[F]:
+        """Yields the stored suggestions as soon as the provider yields them (all at once for other providers)."""
+        if not inspect.isasyncgenfunction(func):
+            for feedback in await provide_feedback(exercise, submission, is_graded, module_config, key):
+                yield feedback
+            return
+
+        set_is_graded_context_var(is_graded)
+        set_is_streaming_context_var(True)
+        cache_key = request_key(module_name, key)
+        cached_feedbacks = await get_cached_suggestions(cache_key)
+        if cached_feedbacks is not None:
+            emit_meta("cached_result", True)
+            for feedback in cached_feedbacks:
+                yield feedback
+            return
+
+        # Not shared with identical requests (single-flight), the partial results could not be replayed to them
+        feedbacks: List[F] = []
+        async for feedback in func(exercise, submission, **get_kwargs(is_graded, module_config)):
+            # Stored one by one, so that every streamed suggestion has its internal ID already
+            if env.USE_ASYNC_DATABASE:
+                stored_feedback = (await astore_feedback_suggestions([feedback]))[0]
+            else:
+                stored_feedback = store_feedback_suggestions([feedback])[0]
+            feedbacks.append(stored_feedback)  # type: ignore
+            yield stored_feedback  # type: ignore
+        await store_suggestions(cache_key, exercise, submission, feedbacks)
+
+    async def run_job(payload: dict) -> dict:
+        exercise = exercise_type.parse_obj(payload["exercise"])
+        submission = submission_type.parse_obj(payload["submission"])
+        module_config = (module_config_type.parse_obj(payload["module_config"])
+                         if module_config_type is not None and payload["module_config"] is not None else None)
+
+        # Collect the metadata of the job, it is returned with the suggestions
+        metadata_context.set({})
+        feedbacks = await provide_feedback(exercise, submission, payload["is_graded"], module_config, payload["key"])
+        result = {
+            "feedbacks": [json.loads(feedback.json(by_alias=True)) for feedback in feedbacks],
+            "meta": get_meta(),
+        }
+
+        if payload["callback_url"]:
+            job_id = get_current_job_id()
+            try:
+                async with httpx.AsyncClient(timeout=env.FEEDBACK_SUGGESTIONS_CALLBACK_TIMEOUT) as client:
+                    response = await client.post(payload["callback_url"], json={"jobId": job_id, **result},
+                                                 headers={"X-Athena-Job-ID": str(job_id)})
+                    response.raise_for_status()
+            except httpx.HTTPError as exc:
+                # The suggestions can still be fetched with GET /feedback_suggestions/{job_id}
+                logger.warning("Could not send the feedback suggestions of job %s to the callback URL: %s", job_id, exc)
+        return result
+
+    register_job_handler(job_type, run_job)
+
     @app.post("/feedback_suggestions", responses=module_responses)
     @authenticated
     @with_meta
     async def wrapper(
+            response: Response,
             exercise: exercise_type,
             submission: submission_type,
             isGraded: is_graded_type = Body(True, alias="isGraded"),
+            run_async: bool = Body(False, alias="async"),
+            callback_url: Optional[AnyHttpUrl] = Body(None, alias="callbackUrl"),
             module_config: module_config_type = Depends(get_dynamic_module_config_factory(module_config_type))):
 
-        # Retrieve existing metadata for the exercise, submission and feedback
-        exercise.meta.update(get_stored_exercise_meta(exercise) or {})
-        submission.meta.update(get_stored_submission_meta(submission) or {})
+        # Identical requests (same LMS, exercise, submission, config and grading mode) share one computation
+        key = request_key(
+            lms_url_context_var.get(None),
+            _to_payload(exercise),
+            _to_payload(submission),
+            _to_payload(module_config) if isinstance(module_config, BaseModel) else module_config,
+            isGraded,
+        )
+
+        # Retrieve existing metadata for the exercise and submission and store them (in one transaction)
+        if env.USE_ASYNC_DATABASE:
+            await amerge_stored_meta_and_store(exercise, submission)
+        else:
+            merge_stored_meta_and_store(exercise, submission)
+
+        if not run_async and callback_url is None:
+            return await provide_feedback(exercise, submission, isGraded, module_config, key)
+
+        # Suggest feedback in a background job, the result is fetched with GET /feedback_suggestions/{job_id}
+        # or sent to the callback URL
+        job = await enqueue_job(job_type, {
+            "exercise": _to_payload(exercise),
+            "submission": _to_payload(submission),
+            "is_graded": isGraded,
+            "module_config": _to_payload(module_config) if isinstance(module_config, BaseModel) else module_config,
+            "key": key,
+            "callback_url": str(callback_url) if callback_url is not None else None,
+        })
+        emit_meta("job_id", job.id)
+        response.status_code = 202
+        return FeedbackSuggestionsJob(job_id=job.id, status=job.status)
+
+    @app.get("/feedback_suggestions/{job_id}", responses={
+        **module_responses,
+        404: {
+            "description": "There is no feedback suggestions job with this ID",
+        },
+    })
+    @authenticated
+    @with_meta
+    async def get_feedback_suggestions_job(job_id: int) -> FeedbackSuggestionsJob:
+        """
+        Get the status of an async feedback suggestions request, and the suggestions once it succeeded.
+        The metadata of the suggestions is returned as the metadata of this response.
+        """
+        job = await get_job_queue().get(job_id)
+        if job is None or job.job_type != job_type:
+            raise HTTPException(status_code=404, detail=f"Feedback suggestions job {job_id} not found")
+
+        feedbacks = None
+        if job.status == JobStatus.succeeded and job.result is not None:
+            feedbacks = job.result["feedbacks"]
+            for meta_key, value in job.result["meta"].items():
+                emit_meta(meta_key, value)
+        return FeedbackSuggestionsJob(job_id=job.id, status=job.status, feedbacks=feedbacks,
+                                      error=job.error if job.status == JobStatus.failed else None)
+
+    # own request model to allow for camelCase field names (see submission_selector)
+    class BatchFeedbackSuggestionsRequest(BaseModel):
+        exercise: exercise_type
+        submission_ids: Optional[List[int]] = None
+        submissions: Optional[List[submission_type]] = None
+        is_graded: Optional[bool] = True
 
-        store_exercise(exercise)
-        store_submissions([submission])
+        class Config:
+            # Allow camelCase field names in the API (converted to snake_case)
+            alias_generator = to_camel
+            allow_population_by_field_name = True
 
-        kwargs = {}
-        if "module_config" in inspect.signature(func).parameters:
-            kwargs["module_config"] = module_config
+    @app.post("/feedback_suggestions/batch", responses=module_responses)
+    @authenticated
+    async def batch_wrapper(
+            request: BatchFeedbackSuggestionsRequest,
+            module_config: module_config_type = Depends(get_dynamic_module_config_factory(module_config_type))):
+        """
+        Suggest feedback for many submissions of an exercise at once.
+
+        The submissions are either sent along (`submissions`), or referenced by `submissionIds`,
+        or all submissions of the exercise that were sent to the submissions consumer before are used.
+        The exercise is only stored once and the same exercise object is passed to the provider for all submissions.
+        They are processed with bounded concurrency (FEEDBACK_SUGGESTIONS_BATCH_CONCURRENCY) and the results are
+        streamed back as NDJSON in the order they finish, one line per submission:
+        `{"submissionId": ..., "feedbacks": [...], "meta": {...}}` or `{"submissionId": ..., "error": "..."}`.
+        """
+        exercise = request.exercise
+        exercise_payload = _to_payload(exercise)
+        module_config_payload = _to_payload(module_config) if isinstance(module_config, BaseModel) else module_config
 
-        if "is_graded" in inspect.signature(func).parameters:
-            kwargs["is_graded"] = isGraded
+        if request.submissions is not None:
+            submissions = request.submissions
+            # The keys are built from the submissions as they were sent, like the keys of the single requests
+            submission_payloads = {submission.id: _to_payload(submission) for submission in submissions}
+        else:
+            submissions = []
 
-        # Call the actual provider
-        if inspect.iscoroutinefunction(func):
-            feedbacks = await func(exercise, submission, **kwargs)
+        # Retrieve existing metadata for the exercise and submissions and store them (in one transaction)
+        if env.USE_ASYNC_DATABASE:
+            await amerge_stored_meta_and_store_submissions(exercise, submissions)
         else:
-            feedbacks = func(exercise, submission, **kwargs)
+            merge_stored_meta_and_store_submissions(exercise, submissions)
+
+        if request.submissions is None:
+            if env.USE_ASYNC_DATABASE:
+                submissions = await aget_stored_submissions(submission_type, exercise.id, request.submission_ids)
+            else:
+                submissions = list(get_stored_submissions(submission_type, exercise.id, request.submission_ids))
+            if request.submission_ids is not None and len(request.submission_ids) != len(submissions):
+                logger.warning("Not all submissions were found in the database! "
+                               "Have you sent all submissions to the submission consumer before?")
+            submission_payloads = {submission.id: _to_payload(submission) for submission in submissions}
+
+        slots = asyncio.Semaphore(env.FEEDBACK_SUGGESTIONS_BATCH_CONCURRENCY)
+
+        async def suggest_feedback_for(submission: S) -> bytes:
+            async with slots:
+                # Every submission runs in its own task, so this only collects the metadata of this submission
+                metadata_context.set({})
+                set_is_background_context_var(True)
+                key = request_key(lms_url_context_var.get(None), exercise_payload, submission_payloads[submission.id],
+                                  module_config_payload, request.is_graded)
+                try:
+                    feedbacks = await provide_feedback(exercise, submission, request.is_graded, module_config, key)
+                    line = {
+                        "submissionId": submission.id,
+                        "feedbacks": [json.loads(feedback.json(by_alias=True)) for feedback in feedbacks],
+                        "meta": get_meta(),
+                    }
+                except Exception as exc:  # pylint: disable=broad-except
+                    logger.exception("Could not suggest feedback for submission %d", submission.id)
+                    line = {"submissionId": submission.id, "error": str(exc)}
+            return (json.dumps(line) + "\n").encode("utf-8")
+
+        # The tasks are created here, so that they run with the context of the request (e.g. the LMS URL)
+        tasks = [asyncio.create_task(suggest_feedback_for(submission)) for submission in submissions]
+
+        async def lines() -> AsyncIterator[bytes]:
+            try:
+                for task in asyncio.as_completed(tasks):
+                    yield await task
+            finally:
+                # The client disconnected (or everything is done)
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.post("/feedback_suggestions/stream", responses=module_responses)
+    @authenticated
+    async def stream_wrapper(
+            request: Request,
+            exercise: exercise_type,
+            submission: submission_type,
+            isGraded: is_graded_type = Body(True, alias="isGraded"),
+            module_config: module_config_type = Depends(get_dynamic_module_config_factory(module_config_type))):
+        """
+        Suggest feedback like POST /feedback_suggestions, but stream the suggestions back as soon as they are ready.
+
+        Modules whose feedback provider is an async generator send every suggestion as soon as it is generated,
+        other modules send all suggestions at once when they are done.
+        The stream is NDJSON by default, or server-sent events if the request accepts `text/event-stream`:
+        `{"type": "feedback", "feedback": {...}}` for every suggestion, followed by
+        `{"type": "done", "meta": {...}}` or `{"type": "error", "error": "..."}`.
+        """
+        key = request_key(
+            lms_url_context_var.get(None),
+            _to_payload(exercise),
+            _to_payload(submission),
+            _to_payload(module_config) if isinstance(module_config, BaseModel) else module_config,
+            isGraded,
+        )
+
+        if env.USE_ASYNC_DATABASE:
+            await amerge_stored_meta_and_store(exercise, submission)
+        else:
+            merge_stored_meta_and_store(exercise, submission)
+
+        use_sse = "text/event-stream" in request.headers.get("accept", "")
+
+        async def events() -> AsyncIterator[bytes]:
+            try:
+                async for feedback in stream_feedback(exercise, submission, isGraded, module_config, key):
+                    yield _format_event("feedback", {"feedback": json.loads(feedback.json(by_alias=True))}, use_sse)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.exception("Could not suggest feedback for submission %d", submission.id)
+                yield _format_event("error", {"error": str(exc)}, use_sse)
+                return
+            yield _format_event("done", {"meta": get_meta()}, use_sse)
+
+        return StreamingResponse(events(), media_type="text/event-stream" if use_sse else "application/x-ndjson",
+                                 headers={"Cache-Control": "no-cache"})
+
+    @app.post("/feedback_suggestions/invalidate_cache", responses=module_responses)
+    @authenticated
+    @with_meta
+    async def invalidate_cache(
+            exercise_id: Optional[int] = Body(None, alias="exerciseId"),
+            submission_id: Optional[int] = Body(None, alias="submissionId")):
+        """
+        Remove the cached feedback suggestions for the exercise and/or submission, or all of them if neither is given.
+        Suggestions are only cached if FEEDBACK_SUGGESTIONS_RESULT_CACHE is enabled, or shortly in memory with
+        FEEDBACK_SUGGESTIONS_CACHE_TTL. Both only for the LMS that issued the request.
+        """
+        labels = {"lms_url": lms_url_context_var.get(None), "exercise_id": exercise_id, "submission_id": submission_id}
+        feedback_suggestions_single_flight.invalidate(**{name: value for name, value in labels.items()
+                                                         if value is not None})
+        if env.USE_ASYNC_DATABASE:
+            invalidated = await ainvalidate_cached_feedback_suggestions(exercise_id, submission_id)
+        else:
+            invalidated = invalidate_cached_feedback_suggestions(exercise_id, submission_id)
+        return {"invalidated": invalidated}
 
-        # Store feedback suggestions and assign internal IDs
-        feedbacks = store_feedback_suggestions(feedbacks)
-        return feedbacks
     return wrapper
 
 
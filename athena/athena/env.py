@@ -3,7 +3,55 @@ import os
 
 PRODUCTION = os.environ.get("PRODUCTION", "0") == "1"
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///../data/data.sqlite")
+# async driver URL (e.g. postgresql+asyncpg://... or sqlite+aiosqlite:///...), derived from DATABASE_URL if not set
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL")
+# use the async engine for the storage calls of the endpoint decorators (needs the "async" extra of athena)
+USE_ASYNC_DATABASE = os.environ.get("USE_ASYNC_DATABASE", "0") == "1"
+# connection pool settings (pool size and overflow are ignored for SQLite)
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", "5"))
+DATABASE_MAX_OVERFLOW = int(os.environ.get("DATABASE_MAX_OVERFLOW", "10"))
+DATABASE_POOL_PRE_PING = os.environ.get("DATABASE_POOL_PRE_PING", "1") == "1"
+DATABASE_POOL_RECYCLE = int(os.environ.get("DATABASE_POOL_RECYCLE", "1800"))  # seconds, -1 to disable
 
 # a key is needed to authorize a module to
 # communicate with the assessment module manager
-ASSESSMENT_MODULE_MANAGER_TO_ATHENA_MODULE_SECRET = os.getenv("SECRET")
\ No newline at end of file
+ASSESSMENT_MODULE_MANAGER_TO_ATHENA_MODULE_SECRET = os.getenv("SECRET")
+
+# on-disk cache for repositories downloaded from the LMS (programming modules only),
+# survives restarts and is shared between all workers of a module
+REPOSITORY_CACHE_DIR = os.environ.get("REPOSITORY_CACHE_DIR", "../data/repository_cache")
+REPOSITORY_CACHE_MAX_SIZE_MB = int(os.environ.get("REPOSITORY_CACHE_MAX_SIZE_MB", "2048"))
+# the content of a URL is downloaded again after this many seconds, the LMS may have updated the repository
+REPOSITORY_CACHE_URL_TTL = float(os.environ.get("REPOSITORY_CACHE_URL_TTL", "600"))
+# connection pool of the shared client for async repository downloads
+REPOSITORY_DOWNLOAD_MAX_CONNECTIONS = int(os.environ.get("REPOSITORY_DOWNLOAD_MAX_CONNECTIONS", "20"))
+REPOSITORY_DOWNLOAD_TIMEOUT = float(os.environ.get("REPOSITORY_DOWNLOAD_TIMEOUT", "60"))
+
+# background jobs of the submissions and feedback consumers
+JOB_QUEUE_BACKEND = os.environ.get("JOB_QUEUE_BACKEND", "database")  # "database" (durable) or "memory"
+# concurrency per job type, e.g. "submissions_consumer=1,feedback_consumer=4"
+JOB_CONCURRENCY = os.environ.get("JOB_CONCURRENCY", "")
+JOB_DEFAULT_CONCURRENCY = int(os.environ.get("JOB_DEFAULT_CONCURRENCY", "2"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_SECONDS = float(os.environ.get("JOB_RETRY_BACKOFF_SECONDS", "10"))
+JOB_POLL_INTERVAL_SECONDS = float(os.environ.get("JOB_POLL_INTERVAL_SECONDS", "2"))
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "60"))
+# succeeded and failed jobs (with their results) are deleted after this many seconds, 0 to keep them forever
+JOB_RETENTION_SECONDS = float(os.environ.get("JOB_RETENTION_SECONDS", "604800"))
+JOB_CLEANUP_INTERVAL_SECONDS = float(os.environ.get("JOB_CLEANUP_INTERVAL_SECONDS", "3600"))
+
+# deduplication of identical concurrent /feedback_suggestions requests
+FEEDBACK_SUGGESTIONS_SINGLE_FLIGHT = os.environ.get("FEEDBACK_SUGGESTIONS_SINGLE_FLIGHT", "1") == "1"
+# additionally keep the results in memory for this many seconds (0 to disable)
+FEEDBACK_SUGGESTIONS_CACHE_TTL = float(os.environ.get("FEEDBACK_SUGGESTIONS_CACHE_TTL", "0"))
+FEEDBACK_SUGGESTIONS_CACHE_MAX_SIZE = int(os.environ.get("FEEDBACK_SUGGESTIONS_CACHE_MAX_SIZE", "256"))
+
+# opt-in persisted cache of the feedback suggestions in the module database, for requests with the same exercise,
+# submission, module config and grading mode
+FEEDBACK_SUGGESTIONS_RESULT_CACHE = os.environ.get("FEEDBACK_SUGGESTIONS_RESULT_CACHE", "0") == "1"
+FEEDBACK_SUGGESTIONS_RESULT_CACHE_TTL = float(os.environ.get("FEEDBACK_SUGGESTIONS_RESULT_CACHE_TTL", "604800"))  # 0 = no expiry
+
+# async feedback suggestion requests can send their result to a callback URL of the LMS
+FEEDBACK_SUGGESTIONS_CALLBACK_TIMEOUT = float(os.environ.get("FEEDBACK_SUGGESTIONS_CALLBACK_TIMEOUT", "30"))
+# number of submissions of a /feedback_suggestions/batch request that are processed concurrently
+FEEDBACK_SUGGESTIONS_BATCH_CONCURRENCY = int(os.environ.get("FEEDBACK_SUGGESTIONS_BATCH_CONCURRENCY", "4"))
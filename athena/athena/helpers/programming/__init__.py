@@ -1,8 +1,10 @@
-from .code_repository import get_repository_zip, get_repository
+from .code_repository import get_repository_zip, get_repository, aget_repository_zip, aget_repository
 from .feedback import format_feedback_title
 
 __all__ = [
     "get_repository_zip",
     "get_repository",
+    "aget_repository_zip",
+    "aget_repository",
     "format_feedback_title",
 ]
@@ -1,15 +1,330 @@
+"""
+Persistent, content-addressed cache for code repositories that are downloaded from the LMS.
+
+Layout of the cache directory (configured via the REPOSITORY_CACHE_DIR environment variable):
+    urls/<sha256 of url>          -> content hash of the last zip downloaded from that URL
+    zips/<content hash>.zip       -> the downloaded repository zip
+    repos/<content hash>.git      -> the extracted repository (with a git history of one commit)
+
+Identical repositories (e.g. a submission that equals the template) are only stored once.
+The zips are content-addressed and never outdated, but the LMS can update the repository behind a URL, so a URL is
+downloaded again once its pointer is older than REPOSITORY_CACHE_URL_TTL seconds.
+All writes go to a temporary path first and are renamed into place, so concurrent workers never see partial files.
+Least recently used entries are evicted once the cache exceeds REPOSITORY_CACHE_MAX_SIZE_MB.
+
+Use the async variants (aget_repository_zip, aget_repository) from async code: They download with a shared,
+connection-pooled httpx.AsyncClient and run the git work in a thread pool, so they do not block the event loop.
+"""
+import asyncio
 import hashlib
+import os
+import shutil
 import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
 from pathlib import Path
-from typing import Optional, cast
+from typing import AsyncIterator, Dict, Iterator, List, Optional, cast
 from zipfile import ZipFile
 
-from athena import contextvars
+from athena import contextvars, env
+from athena.logger import logger
 
 import httpx
 from git.repo import Repo
 
-cache_dir = Path(tempfile.mkdtemp())
+cache_dir = Path(env.REPOSITORY_CACHE_DIR)
+urls_dir = cache_dir / "urls"
+zips_dir = cache_dir / "zips"
+repos_dir = cache_dir / "repos"
+for _dir in (urls_dir, zips_dir, repos_dir):
+    os.makedirs(_dir, exist_ok=True)
+
+# Temporary files of downloads and extractions are removed after this many seconds (left over by a crashed worker)
+TMP_MAX_AGE_SECONDS = 3600
+
+# One lock per cache key, so that concurrent requests for the same URL only download it once, and so that
+# entries are not evicted while they are used. The locks are dropped once nobody holds or waits for them.
+_key_locks: Dict[str, List] = {}  # key -> [lock, number of users]
+_key_locks_lock = threading.Lock()
+_async_key_locks: Dict[str, List] = {}
+_eviction_lock = threading.Lock()
+# Sizes of cache entries in bytes, computed once per entry and process
+_entry_sizes: Dict[str, int] = {}
+
+# Shared client for async downloads, created lazily and closed on shutdown of the module
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+@contextmanager
+def _key_lock(key: str) -> Iterator[None]:
+    with _key_locks_lock:
+        entry = _key_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _key_locks_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _key_locks[key]
+
+
+@asynccontextmanager
+async def _async_key_lock(key: str) -> AsyncIterator[None]:
+    entry = _async_key_locks.setdefault(key, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _async_key_locks[key]
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _touch(path: Path):
+    """Mark a cache entry as recently used (used for LRU eviction)."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def _write_atomic(path: Path, content: str):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _get_authorization_secret(authorization_secret: Optional[str]) -> str:
+    if authorization_secret is None:
+        if contextvars.repository_authorization_secret_context_var_empty():
+            raise ValueError("Authorization secret for the repository API is not set. Pass authorization_secret to this function or add the X-Repository-Authorization-Secret header to the request from the assessment module manager.")
+        authorization_secret = contextvars.get_repository_authorization_secret_context_var()
+    return cast(str, authorization_secret)
+
+
+def _get_cached_content_hash(url: str) -> Optional[str]:
+    """Return the content hash of the cached zip for the given URL, None if it is not cached (anymore) or outdated."""
+    url_path = urls_dir / _url_key(url)
+    try:
+        if time.time() - url_path.stat().st_mtime > env.REPOSITORY_CACHE_URL_TTL:
+            return None
+        content_hash = url_path.read_text().strip()
+    except FileNotFoundError:
+        return None
+    if not (zips_dir / f"{content_hash}.zip").exists():
+        return None
+    return content_hash
+
+
+def _store_downloaded_zip(url: str, tmp_path: str, content_hash: str):
+    """Move a fully downloaded zip into place and point the URL to it."""
+    os.replace(tmp_path, zips_dir / f"{content_hash}.zip")
+    _write_atomic(urls_dir / _url_key(url), content_hash)
+
+
+def _download_repository_zip(url: str, authorization_secret: Optional[str]) -> str:
+    """Download the zip from the given URL into the cache and return its content hash."""
+    authorization_secret = _get_authorization_secret(authorization_secret)
+    content_hash = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=zips_dir, prefix=".tmp-", suffix=".zip")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            with httpx.stream("GET", url, headers={ "Authorization": authorization_secret }) as response:
+                response.raise_for_status()
+                for chunk in response.iter_bytes():
+                    content_hash.update(chunk)
+                    f.write(chunk)
+        _store_downloaded_zip(url, tmp_path, content_hash.hexdigest())
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return content_hash.hexdigest()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the shared client for repository downloads (keeps connections to the LMS alive between requests)."""
+    global _async_client  # pylint: disable=global-statement
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=env.REPOSITORY_DOWNLOAD_MAX_CONNECTIONS,
+                                max_keepalive_connections=env.REPOSITORY_DOWNLOAD_MAX_CONNECTIONS),
+            timeout=httpx.Timeout(env.REPOSITORY_DOWNLOAD_TIMEOUT),
+        )
+    return _async_client
+
+
+async def close_async_client():
+    """Close the shared client for repository downloads."""
+    global _async_client  # pylint: disable=global-statement
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+async def _adownload_repository_zip(url: str, authorization_secret: Optional[str]) -> str:
+    """Download the zip from the given URL into the cache without blocking the event loop and return its content hash."""
+    authorization_secret = _get_authorization_secret(authorization_secret)
+    content_hash = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=zips_dir, prefix=".tmp-", suffix=".zip")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async with get_async_client().stream("GET", url, headers={ "Authorization": authorization_secret }) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    content_hash.update(chunk)
+                    f.write(chunk)
+        _store_downloaded_zip(url, tmp_path, content_hash.hexdigest())
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return content_hash.hexdigest()
+
+
+def _directory_size(path: Path) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, file_name))
+        for root, _, file_names in os.walk(path)
+        for file_name in file_names
+    )
+
+
+def _entry_size(content_hash: str) -> int:
+    if content_hash not in _entry_sizes:
+        size = 0
+        zip_path = zips_dir / f"{content_hash}.zip"
+        if zip_path.exists():
+            size += zip_path.stat().st_size
+        repo_path = repos_dir / f"{content_hash}.git"
+        if repo_path.exists():
+            size += _directory_size(repo_path)
+        _entry_sizes[content_hash] = size
+    return _entry_sizes[content_hash]
+
+
+def _remove_entry(content_hash: str):
+    _entry_sizes.pop(content_hash, None)
+    (zips_dir / f"{content_hash}.zip").unlink(missing_ok=True)
+    shutil.rmtree(repos_dir / f"{content_hash}.git", ignore_errors=True)
+
+
+def _remove_stale_files():
+    """Remove outdated URL pointers and the temporary files of crashed downloads and extractions."""
+    now = time.time()
+    stale_paths = [(path, env.REPOSITORY_CACHE_URL_TTL)
+                   for path in urls_dir.iterdir() if not path.name.startswith(".tmp-")]
+    stale_paths += [(path, TMP_MAX_AGE_SECONDS) for directory in (urls_dir, zips_dir, repos_dir)
+                    for path in directory.glob(".tmp-*")]
+    for path, max_age in stale_paths:
+        try:
+            if now - path.stat().st_mtime <= max_age:
+                continue
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+        except FileNotFoundError:
+            continue  # removed by another worker in the meantime
+
+
+def _evict_if_necessary(keep_content_hash: str):
+    """Evict the least recently used entries until the cache is smaller than the configured maximum size."""
+    max_size = env.REPOSITORY_CACHE_MAX_SIZE_MB * 1024 * 1024
+    with _eviction_lock:
+        _remove_stale_files()
+        entries = []
+        for zip_path in zips_dir.glob("*.zip"):
+            if zip_path.name.startswith(".tmp-"):
+                continue  # download in progress
+            try:
+                entries.append((zip_path.stat().st_mtime, zip_path.stem))
+            except FileNotFoundError:
+                continue  # evicted by another worker in the meantime
+
+        total_size = sum(_entry_size(content_hash) for _, content_hash in entries)
+        for _, content_hash in sorted(entries):
+            if total_size <= max_size:
+                break
+            if content_hash == keep_content_hash:
+                continue
+            total_size -= _entry_size(content_hash)
+            # Not while the entry is being opened or extracted (under the lock, it is touched then)
+            with _key_lock(content_hash):
+                logger.debug("Evicting repository %s from the repository cache", content_hash)
+                _remove_entry(content_hash)
+        _entry_sizes.pop(keep_content_hash, None)  # may still grow, e.g. if the repository is extracted next
+
+
+def _get_repository_zip_content_hash(url: str, authorization_secret: Optional[str] = None) -> str:
+    """Make sure that the zip of the given URL is in the cache and return its content hash."""
+    with _key_lock(_url_key(url)):
+        content_hash = _get_cached_content_hash(url)
+        if content_hash is None:
+            content_hash = _download_repository_zip(url, authorization_secret)
+            _evict_if_necessary(keep_content_hash=content_hash)
+    return content_hash
+
+
+async def _aget_repository_zip_content_hash(url: str, authorization_secret: Optional[str] = None) -> str:
+    """Async variant of _get_repository_zip_content_hash."""
+    async with _async_key_lock(_url_key(url)):
+        content_hash = _get_cached_content_hash(url)
+        if content_hash is None:
+            content_hash = await _adownload_repository_zip(url, authorization_secret)
+            await asyncio.to_thread(_evict_if_necessary, keep_content_hash=content_hash)
+    return content_hash
+
+
+def _open_zip(content_hash: str) -> Optional[ZipFile]:
+    """Open the cached zip with the given content hash, None if it was evicted in the meantime.
+
+    An open zip stays readable even if it is evicted afterwards.
+    """
+    with _key_lock(content_hash):
+        try:
+            repo_zip = ZipFile(zips_dir / f"{content_hash}.zip")
+        except FileNotFoundError:
+            return None
+        _touch(zips_dir / f"{content_hash}.zip")
+    return repo_zip
+
+
+def _extract_repository(content_hash: str) -> Path:
+    """Extract the cached zip with the given content hash into a git repository and return its path."""
+    repo_path = repos_dir / f"{content_hash}.git"
+    with _key_lock(content_hash):
+        if not (zips_dir / f"{content_hash}.zip").exists():
+            raise FileNotFoundError(f"Repository {content_hash} was evicted from the repository cache")
+        if not repo_path.exists():
+            tmp_path = Path(tempfile.mkdtemp(dir=repos_dir, prefix=".tmp-"))
+            try:
+                with ZipFile(zips_dir / f"{content_hash}.zip") as repo_zip:
+                    repo_zip.extractall(tmp_path)
+                if not (tmp_path / ".git").exists():
+                    repo = Repo.init(tmp_path, initial_branch='main')
+                    # Config username and email to prevent Git errors
+                    repo.config_writer().set_value("user", "name", "athena").release()
+                    repo.config_writer().set_value("user", "email", "doesnotexist.athena@cit.tum.de").release()
+                    repo.git.add(all=True, force=True)
+                    repo.git.commit('-m', 'Initial commit')
+                os.rename(tmp_path, repo_path)
+            except OSError:
+                if not repo_path.exists():
+                    raise
+                # Another worker extracted the same repository in the meantime
+            finally:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            _entry_sizes.pop(content_hash, None)
+        _touch(zips_dir / f"{content_hash}.zip")
+    return repo_path
 
 
 def get_repository_zip(url: str, authorization_secret: Optional[str] = None) -> ZipFile:
@@ -18,22 +333,11 @@ def get_repository_zip(url: str, authorization_secret: Optional[str] = None) ->
     the cache or by downloading it, and return a ZipFile object.
     Optional: Authorization secret for the API. If omitted, it will be auto-determined given the request session.
     """
-    url_hash = hashlib.md5(url.encode("utf-8")).hexdigest()
-    file_name = url_hash + ".zip"
-    cache_file_path = cache_dir / file_name
-
-    if not cache_file_path.exists():
-        if authorization_secret is None:
-            if contextvars.repository_authorization_secret_context_var_empty():
-                raise ValueError("Authorization secret for the repository API is not set. Pass authorization_secret to this function or add the X-Repository-Authorization-Secret header to the request from the assessment module manager.")
-            authorization_secret = contextvars.get_repository_authorization_secret_context_var()
-        with httpx.stream("GET", url, headers={ "Authorization": cast(str, authorization_secret) }) as response:
-            response.raise_for_status()
-            with open(cache_file_path, "wb") as f:
-                for chunk in response.iter_bytes():
-                    f.write(chunk)
-
-    return ZipFile(cache_file_path)
+    for _ in range(2):  # downloaded again if it was evicted right after the download
+        repo_zip = _open_zip(_get_repository_zip_content_hash(url, authorization_secret))
+        if repo_zip is not None:
+            return repo_zip
+    raise FileNotFoundError(f"Repository {url} was evicted from the repository cache")
 
 
 def get_repository(url: str, authorization_secret: Optional[str] = None) -> Repo:
@@ -41,20 +345,29 @@ def get_repository(url: str, authorization_secret: Optional[str] = None) -> Repo
     Retrieve a code repository from the given URL, either from the cache or by
     downloading it, and return a Repo object.
     """
+    content_hash = _get_repository_zip_content_hash(url, authorization_secret)
+    return Repo(_extract_repository(content_hash))
 
-    url_hash = hashlib.md5(url.encode("utf-8")).hexdigest()
-    dir_name = url_hash + ".git"
-    cache_dir_path = cache_dir / dir_name
 
-    if not cache_dir_path.exists():
-        repo_zip = get_repository_zip(url, authorization_secret)
-        repo_zip.extractall(cache_dir_path)
-        if not (cache_dir_path / ".git").exists():
-            repo = Repo.init(cache_dir_path, initial_branch='main')
-            # Config username and email to prevent Git errors
-            repo.config_writer().set_value("user", "name", "athena").release()
-            repo.config_writer().set_value("user", "email", "doesnotexist.athena@cit.tum.de").release()
-            repo.git.add(all=True, force=True)
-            repo.git.commit('-m', 'Initial commit')
+async def aget_repository_zip(url: str, authorization_secret: Optional[str] = None) -> ZipFile:
+    """
+    Async variant of get_repository_zip: Retrieve a zip file of a code repository from the given URL,
+    either from the cache or by downloading it, and return a ZipFile object.
+    Optional: Authorization secret for the API. If omitted, it will be auto-determined given the request session.
+    """
+    for _ in range(2):  # downloaded again if it was evicted right after the download
+        content_hash = await _aget_repository_zip_content_hash(url, authorization_secret)
+        repo_zip = await asyncio.to_thread(_open_zip, content_hash)
+        if repo_zip is not None:
+            return repo_zip
+    raise FileNotFoundError(f"Repository {url} was evicted from the repository cache")
 
-    return Repo(cache_dir_path)
\ No newline at end of file
+
+async def aget_repository(url: str, authorization_secret: Optional[str] = None) -> Repo:
+    """
+    Async variant of get_repository: Retrieve a code repository from the given URL, either from the cache or by
+    downloading it, and return a Repo object. Extracting and committing the repository runs in a thread pool.
+    """
+    content_hash = await _aget_repository_zip_content_hash(url, authorization_secret)
+    repo_path = await asyncio.to_thread(_extract_repository, content_hash)
+    return Repo(repo_path)
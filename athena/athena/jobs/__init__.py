@@ -0,0 +1,20 @@
+"""Durable background jobs with a pluggable queue and a worker pool with per job type concurrency."""
+from .job_queue import JobQueue, DatabaseJobQueue, InMemoryJobQueue, ClaimedJob, get_job_queue, set_job_queue
+from .worker import JobWorkerPool, job_worker_pool, register_job_handler, enqueue_job, get_job_concurrency, \
+    get_current_job_id
+from . import endpoints  # registers the job status endpoints and starts the workers with the app
+
+__all__ = [
+    "JobQueue",
+    "DatabaseJobQueue",
+    "InMemoryJobQueue",
+    "ClaimedJob",
+    "get_job_queue",
+    "set_job_queue",
+    "JobWorkerPool",
+    "job_worker_pool",
+    "register_job_handler",
+    "enqueue_job",
+    "get_job_concurrency",
+    "get_current_job_id",
+]
@@ -0,0 +1,41 @@
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+from athena.app import app
+from athena.authenticate import authenticated
+from athena.metadata import with_meta
+from athena.schemas import Job, JobStatus
+from .job_queue import get_job_queue
+from .worker import job_worker_pool
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    """Start the workers for all job types that have a registered handler."""
+    job_worker_pool.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    """Stop the workers, unfinished jobs are picked up again after a restart."""
+    await job_worker_pool.stop()
+
+
+@app.get("/jobs")
+@authenticated
+@with_meta
+async def list_jobs(status: Optional[JobStatus] = None, job_type: Optional[str] = None, limit: int = 100) -> List[Job]:
+    """List the most recent background jobs of the module, optionally filtered by status and job type."""
+    return await get_job_queue().list(status=status, job_type=job_type, limit=limit)
+
+
+@app.get("/jobs/{job_id}")
+@authenticated
+@with_meta
+async def get_job(job_id: int) -> Job:
+    """Get the status of a background job, e.g. one that was enqueued by the submissions consumer."""
+    job = await get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
@@ -0,0 +1,292 @@
+"""
+Job queues store the background jobs of a module until a worker runs them.
+
+The default DatabaseJobQueue stores the jobs in the `jobs` table of the module database, so they survive restarts and
+can be shared by multiple worker processes. The InMemoryJobQueue is meant for development and tests.
+Other backends can be plugged in with `set_job_queue`.
+"""
+import asyncio
+import itertools
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import delete, or_, update
+
+from athena import env
+from athena.database import get_db
+from athena.models import DBJob
+from athena.module_config import get_module_config
+from athena.schemas import Job, JobStatus
+
+
+class ClaimedJob(NamedTuple):
+    """A job that a worker claimed, with everything it needs to run it."""
+    job: Job
+    payload: dict
+    context: dict
+
+
+def utc_now() -> datetime:
+    """Naive UTC timestamps are stored in the database."""
+    return datetime.utcnow()
+
+
+class JobQueue(ABC):
+    """Interface of a job queue."""
+
+    @abstractmethod
+    async def enqueue(self, job_type: str, payload: dict, context: dict, max_attempts: int) -> Job:
+        """Add a new job to the queue."""
+
+    @abstractmethod
+    async def claim(self, job_type: str) -> Optional[ClaimedJob]:
+        """Claim the next job of the given type that is due, or return None if there is none."""
+
+    @abstractmethod
+    async def heartbeat(self, job_id: int):
+        """Extend the lease of a running job."""
+
+    @abstractmethod
+    async def complete(self, job_id: int, result: Any = None):
+        """Mark a running job as succeeded, with the JSON serializable result of its handler."""
+
+    @abstractmethod
+    async def fail(self, job_id: int, error: str, retry_at: Optional[datetime]):
+        """Mark a running job as failed, or queue it again to be retried at retry_at."""
+
+    @abstractmethod
+    async def get(self, job_id: int) -> Optional[Job]:
+        """Get a job by its ID."""
+
+    @abstractmethod
+    async def delete_finished(self, before: datetime) -> int:
+        """Delete the succeeded and failed jobs that finished before the given time, returns how many."""
+
+    @abstractmethod
+    async def list(self, status: Optional[JobStatus] = None, job_type: Optional[str] = None,
+                   limit: int = 100) -> List[Job]:
+        """List the most recent jobs, optionally filtered by status and type."""
+
+
+class DatabaseJobQueue(JobQueue):
+    """Durable job queue in the `jobs` table of the module database.
+
+    Jobs are claimed with a conditional UPDATE, so concurrent workers (also in other processes) never claim the same
+    job. Running jobs hold a lease that the worker extends periodically. If a worker dies, its jobs are claimed again
+    after the lease expired.
+    """
+
+    def __init__(self):
+        self.module_name = get_module_config().name
+
+    def _enqueue(self, job_type: str, payload: dict, context: dict, max_attempts: int) -> Job:
+        now = utc_now()
+        with get_db() as db:
+            db_job = DBJob(module_name=self.module_name, job_type=job_type, status=JobStatus.queued, payload=payload,
+                           context=context, attempts=0, max_attempts=max_attempts, run_after=now,
+                           created_at=now, updated_at=now)
+            db.add(db_job)
+            db.commit()
+            return db_job.to_schema()
+
+    def _claim(self, job_type: str) -> Optional[ClaimedJob]:
+        now = utc_now()
+        is_expired = (DBJob.status == JobStatus.running) & (DBJob.locked_until < now)  # lease of a dead worker expired
+        is_due = or_(
+            (DBJob.status == JobStatus.queued) & (DBJob.run_after <= now),
+            is_expired & (DBJob.attempts < DBJob.max_attempts),
+        )
+        with get_db() as db:
+            # A job that kills its worker (e.g. out of memory) must not be claimed again forever
+            db.execute(
+                update(DBJob)
+                .where(DBJob.module_name == self.module_name, DBJob.job_type == job_type, is_expired,
+                       DBJob.attempts >= DBJob.max_attempts)
+                .values(status=JobStatus.failed, locked_until=None, payload={}, context={}, updated_at=now,
+                        error="The worker stopped while running the job (lease expired) in the last attempt")
+            )
+            db.commit()
+            candidate_ids = [
+                job_id for job_id, in db.query(DBJob.id)
+                .filter(DBJob.module_name == self.module_name, DBJob.job_type == job_type, is_due)
+                .order_by(DBJob.run_after)
+                .limit(10)
+                .all()
+            ]
+            for job_id in candidate_ids:
+                result = db.execute(
+                    update(DBJob)
+                    .where(DBJob.id == job_id, is_due)
+                    .values(status=JobStatus.running, attempts=DBJob.attempts + 1,
+                            locked_until=now + timedelta(seconds=env.JOB_LEASE_SECONDS), updated_at=now)
+                )
+                db.commit()
+                if result.rowcount == 1:  # type: ignore
+                    db_job = db.query(DBJob).filter_by(id=job_id).one()
+                    return ClaimedJob(job=db_job.to_schema(), payload=db_job.payload, context=db_job.context)
+        return None
+
+    def _update(self, job_id: int, **values):
+        with get_db() as db:
+            db.execute(update(DBJob).where(DBJob.id == job_id).values(updated_at=utc_now(), **values))
+            db.commit()
+
+    def _delete_finished(self, before: datetime) -> int:
+        with get_db() as db:
+            result = db.execute(
+                delete(DBJob)
+                .where(DBJob.module_name == self.module_name,
+                       DBJob.status.in_([JobStatus.succeeded, JobStatus.failed]),
+                       DBJob.updated_at < before)
+            )
+            db.commit()
+            return result.rowcount  # type: ignore
+
+    def _get(self, job_id: int) -> Optional[Job]:
+        with get_db() as db:
+            db_job = db.query(DBJob).filter_by(id=job_id, module_name=self.module_name).one_or_none()
+            return db_job.to_schema() if db_job is not None else None
+
+    def _list(self, status: Optional[JobStatus], job_type: Optional[str], limit: int) -> List[Job]:
+        with get_db() as db:
+            query = db.query(DBJob).filter_by(module_name=self.module_name)
+            if status is not None:
+                query = query.filter_by(status=status)
+            if job_type is not None:
+                query = query.filter_by(job_type=job_type)
+            return [db_job.to_schema() for db_job in query.order_by(DBJob.id.desc()).limit(limit).all()]
+
+    # The database is accessed in a thread, so that polling for jobs does not block the event loop
+
+    async def enqueue(self, job_type: str, payload: dict, context: dict, max_attempts: int) -> Job:
+        return await asyncio.to_thread(self._enqueue, job_type, payload, context, max_attempts)
+
+    async def claim(self, job_type: str) -> Optional[ClaimedJob]:
+        return await asyncio.to_thread(self._claim, job_type)
+
+    async def heartbeat(self, job_id: int):
+        await asyncio.to_thread(self._update, job_id,
+                                locked_until=utc_now() + timedelta(seconds=env.JOB_LEASE_SECONDS))
+
+    # The payload (e.g. an exercise with all its submissions) and the context (with the repository authorization
+    # secret) are not needed anymore once a job finished
+
+    async def complete(self, job_id: int, result: Any = None):
+        await asyncio.to_thread(self._update, job_id, status=JobStatus.succeeded, locked_until=None, error=None,
+                                result=result, payload={}, context={})
+
+    async def fail(self, job_id: int, error: str, retry_at: Optional[datetime]):
+        if retry_at is None:
+            await asyncio.to_thread(self._update, job_id, status=JobStatus.failed, locked_until=None, error=error,
+                                    payload={}, context={})
+        else:
+            await asyncio.to_thread(self._update, job_id, status=JobStatus.queued, locked_until=None, error=error,
+                                    run_after=retry_at)
+
+    async def get(self, job_id: int) -> Optional[Job]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def delete_finished(self, before: datetime) -> int:
+        return await asyncio.to_thread(self._delete_finished, before)
+
+    async def list(self, status: Optional[JobStatus] = None, job_type: Optional[str] = None,
+                   limit: int = 100) -> List[Job]:
+        return await asyncio.to_thread(self._list, status, job_type, limit)
+
+
+class InMemoryJobQueue(JobQueue):
+    """Job queue that only lives in the current process, jobs are lost on restart."""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._jobs: Dict[int, Job] = {}
+        self._payloads: Dict[int, dict] = {}
+        self._contexts: Dict[int, dict] = {}
+
+    async def enqueue(self, job_type: str, payload: dict, context: dict, max_attempts: int) -> Job:
+        now = utc_now()
+        job = Job(id=next(self._ids), job_type=job_type, status=JobStatus.queued, attempts=0,
+                  max_attempts=max_attempts, run_after=now, created_at=now, updated_at=now)
+        self._jobs[job.id] = job
+        self._payloads[job.id] = payload
+        self._contexts[job.id] = context
+        return job
+
+    async def claim(self, job_type: str) -> Optional[ClaimedJob]:
+        now = utc_now()
+        for job in self._jobs.values():
+            if job.job_type == job_type and job.status == JobStatus.queued and job.run_after <= now:
+                job.status = JobStatus.running
+                job.attempts += 1
+                job.updated_at = now
+                return ClaimedJob(job=job.copy(), payload=self._payloads[job.id], context=self._contexts[job.id])
+        return None
+
+    async def heartbeat(self, job_id: int):
+        pass  # jobs of a dead process are lost anyway
+
+    async def complete(self, job_id: int, result: Any = None):
+        job = self._jobs[job_id]
+        job.status = JobStatus.succeeded
+        job.error = None
+        job.result = result
+        job.updated_at = utc_now()
+        # payloads can be large, they are not needed anymore
+        self._payloads.pop(job_id, None)
+        self._contexts.pop(job_id, None)
+
+    async def fail(self, job_id: int, error: str, retry_at: Optional[datetime]):
+        job = self._jobs[job_id]
+        job.error = error
+        job.updated_at = utc_now()
+        if retry_at is None:
+            job.status = JobStatus.failed
+            self._payloads.pop(job_id, None)
+            self._contexts.pop(job_id, None)
+        else:
+            job.status = JobStatus.queued
+            job.run_after = retry_at
+
+    async def get(self, job_id: int) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        return job.copy() if job is not None else None
+
+    async def delete_finished(self, before: datetime) -> int:
+        finished_ids = [
+            job.id for job in self._jobs.values()
+            if job.status in (JobStatus.succeeded, JobStatus.failed) and job.updated_at < before
+        ]
+        for job_id in finished_ids:
+            del self._jobs[job_id]
+        return len(finished_ids)
+
+    async def list(self, status: Optional[JobStatus] = None, job_type: Optional[str] = None,
+                   limit: int = 100) -> List[Job]:
+        jobs = [
+            job for job in reversed(list(self._jobs.values()))
+            if (status is None or job.status == status) and (job_type is None or job.job_type == job_type)
+        ]
+        return [job.copy() for job in jobs[:limit]]
+
+
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Get the job queue of the module, configured with the JOB_QUEUE_BACKEND environment variable."""
+    global _job_queue  # pylint: disable=global-statement
+    if _job_queue is None:
+        if env.JOB_QUEUE_BACKEND == "database":
+            _job_queue = DatabaseJobQueue()
+        elif env.JOB_QUEUE_BACKEND == "memory":
+            _job_queue = InMemoryJobQueue()
+        else:
+            raise ValueError(f"Unknown job queue backend {env.JOB_QUEUE_BACKEND}, use 'database' or 'memory'")
+    return _job_queue
+
+
+def set_job_queue(job_queue: JobQueue):
+    """Use a custom job queue backend. Call this before the module starts."""
+    global _job_queue  # pylint: disable=global-statement
+    _job_queue = job_queue
@@ -0,0 +1,221 @@
+"""
+Worker pool that runs the background jobs of the module.
+
+Every job type has its own handler and concurrency limit (JOB_CONCURRENCY), so that long running jobs of one type
+(e.g. the submissions consumer) cannot starve the others. Failed jobs are retried with exponential backoff.
+"""
+import asyncio
+import contextvars
+import inspect
+import traceback
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+
+from athena import env
+from athena.contextvars import (
+    get_lms_url,
+    get_remembered_repository_authorization_secret,
+    get_repository_authorization_secret_context_var,
+    repository_authorization_secret_context_var_empty,
+    set_is_background_context_var,
+    set_lms_url_context_var,
+    set_repository_authorization_secret_context_var,
+)
+from athena.logger import logger
+from athena.schemas import Job
+from .job_queue import ClaimedJob, get_job_queue, utc_now
+
+# Handlers can return a JSON serializable result, it is stored with the job
+JobHandler = Union[Callable[[dict], Any], Callable[[dict], Awaitable[Any]]]
+
+_job_handlers: Dict[str, JobHandler] = {}
+
+current_job_id_context_var: contextvars.ContextVar[int] = contextvars.ContextVar("current_job_id")
+
+
+def register_job_handler(job_type: str, handler: JobHandler):
+    """Register the handler that runs the jobs of the given type. Synchronous handlers run in a thread."""
+    _job_handlers[job_type] = handler
+
+
+def get_current_job_id() -> int:
+    """ID of the job that is running in the current context (i.e. called from a job handler)."""
+    return current_job_id_context_var.get()
+
+
+def get_job_concurrency(job_type: str) -> int:
+    """Maximum number of concurrently running jobs of the given type in this process."""
+    for entry in env.JOB_CONCURRENCY.split(","):
+        if "=" in entry:
+            name, concurrency = entry.split("=", 1)
+            if name.strip() == job_type:
+                return int(concurrency)
+    return env.JOB_DEFAULT_CONCURRENCY
+
+
+def _get_request_context() -> Dict[str, Any]:
+    """Context variables of the current request that the job needs when it runs later.
+
+    The repository authorization secret is stored with the job (in the module database, like the payload), so that
+    jobs can also download repositories after a restart or on another replica of the module.
+    """
+    context: Dict[str, Any] = {"lms_url": get_lms_url()}
+    if not repository_authorization_secret_context_var_empty():
+        context["repository_authorization_secret"] = get_repository_authorization_secret_context_var()
+    return context
+
+
+def _set_request_context(context: Dict[str, Any]):
+    set_lms_url_context_var(context["lms_url"])
+    # Jobs that were enqueued without the secret use the one that the LMS last sent to this process
+    repository_authorization_secret = context.get("repository_authorization_secret") \
+        or get_remembered_repository_authorization_secret(context["lms_url"])
+    if repository_authorization_secret is not None:
+        set_repository_authorization_secret_context_var(repository_authorization_secret)
+
+
+async def enqueue_job(job_type: str, payload: dict, max_attempts: Optional[int] = None) -> Job:
+    """Enqueue a job of the given type, it runs in the background with the context of the current request.
+
+    Args:
+        job_type (str): Type of the job, a handler must be registered for it with `register_job_handler`
+        payload (dict): JSON serializable arguments for the handler
+        max_attempts (int, optional): Maximum number of attempts, defaults to JOB_MAX_ATTEMPTS
+
+    Returns:
+        Job: The enqueued job
+    """
+    if job_type not in _job_handlers:
+        raise ValueError(f"No handler registered for job type {job_type}")
+    job = await get_job_queue().enqueue(job_type, payload, _get_request_context(),
+                                        max_attempts or env.JOB_MAX_ATTEMPTS)
+    job_worker_pool.wake_up(job_type)
+    logger.info("Enqueued %s job %d", job_type, job.id)
+    return job
+
+
+class JobWorkerPool:
+    """Polls the job queue for every registered job type and runs the jobs with limited concurrency."""
+
+    def __init__(self):
+        self._pollers: List[asyncio.Task] = []
+        self._cleanup: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+        self._wake_up_events: Dict[str, asyncio.Event] = {}
+
+    def wake_up(self, job_type: str):
+        """Poll for jobs of the given type right away instead of waiting for the next poll interval."""
+        if job_type in self._wake_up_events:
+            self._wake_up_events[job_type].set()
+
+    def start(self):
+        for job_type in _job_handlers:
+            self._wake_up_events[job_type] = asyncio.Event()
+            self._pollers.append(asyncio.create_task(self._poll(job_type)))
+        if self._pollers:
+            logger.info("Started job workers for %s", ", ".join(
+                f"{job_type} (concurrency {get_job_concurrency(job_type)})" for job_type in _job_handlers))
+        if self._pollers and env.JOB_RETENTION_SECONDS > 0:
+            self._cleanup = asyncio.create_task(self._delete_finished_jobs())
+
+    async def stop(self):
+        """Stop polling and cancel running jobs, they are picked up again after a restart."""
+        cleanup = [self._cleanup] if self._cleanup is not None else []
+        for task in self._pollers + list(self._running) + cleanup:
+            task.cancel()
+        await asyncio.gather(*self._pollers, *self._running, *cleanup, return_exceptions=True)
+        self._cleanup = None
+        self._pollers.clear()
+        self._running.clear()
+        self._wake_up_events.clear()
+
+    async def _poll(self, job_type: str):
+        slots = asyncio.Semaphore(get_job_concurrency(job_type))
+        wake_up_event = self._wake_up_events[job_type]
+        while True:
+            await slots.acquire()
+            try:
+                claimed_job = await get_job_queue().claim(job_type)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Could not claim %s job", job_type)
+                claimed_job = None
+            if claimed_job is None:
+                slots.release()
+                wake_up_event.clear()
+                try:
+                    await asyncio.wait_for(wake_up_event.wait(), timeout=env.JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._run(claimed_job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _delete_finished_jobs(self):
+        """Delete finished jobs after JOB_RETENTION_SECONDS, so that the jobs table does not grow without bound."""
+        while True:
+            try:
+                deleted = await get_job_queue().delete_finished(
+                    utc_now() - timedelta(seconds=env.JOB_RETENTION_SECONDS))
+                if deleted:
+                    logger.info("Deleted %d finished jobs", deleted)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Could not delete finished jobs")
+            await asyncio.sleep(env.JOB_CLEANUP_INTERVAL_SECONDS)
+
+    async def _heartbeat(self, job_id: int, handler_task: asyncio.Task):
+        """Extend the lease of the job while it runs, the handler is cancelled if the lease is lost.
+
+        Otherwise, another worker would claim the job after the lease expired and run it a second time.
+        """
+        last_beat = asyncio.get_running_loop().time()
+        while True:
+            await asyncio.sleep(env.JOB_LEASE_SECONDS / 3)
+            try:
+                await get_job_queue().heartbeat(job_id)
+                last_beat = asyncio.get_running_loop().time()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Could not extend the lease of job %d", job_id)
+                if asyncio.get_running_loop().time() - last_beat >= env.JOB_LEASE_SECONDS:
+                    logger.error("Lost the lease of job %d, cancelling it", job_id)
+                    handler_task.cancel()
+                    return
+
+    async def _call_handler(self, claimed_job: ClaimedJob) -> Any:
+        handler = _job_handlers[claimed_job.job.job_type]
+        if inspect.iscoroutinefunction(handler):
+            handler_task = asyncio.ensure_future(handler(claimed_job.payload))
+        else:
+            handler_task = asyncio.ensure_future(asyncio.to_thread(handler, claimed_job.payload))
+        heartbeat = asyncio.create_task(self._heartbeat(claimed_job.job.id, handler_task))
+        try:
+            return await handler_task
+        finally:
+            handler_task.cancel()  # if the worker itself is cancelled
+            heartbeat.cancel()
+
+    async def _run(self, claimed_job: ClaimedJob):
+        job = claimed_job.job
+        _set_request_context(claimed_job.context)  # the task runs in its own copy of the context
+        current_job_id_context_var.set(job.id)
+        set_is_background_context_var(True)
+        logger.info("Running %s job %d (attempt %d of %d)", job.job_type, job.id, job.attempts, job.max_attempts)
+        try:
+            result = await self._call_handler(claimed_job)
+        except Exception as exc:  # pylint: disable=broad-except
+            retry_at = None
+            if job.attempts < job.max_attempts:
+                backoff = env.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+                retry_at = utc_now() + timedelta(seconds=backoff)
+                logger.warning("%s job %d failed, retrying in %.0fs: %s", job.job_type, job.id, backoff, exc)
+            else:
+                logger.error("%s job %d failed after %d attempts: %s", job.job_type, job.id, job.attempts, exc)
+            await get_job_queue().fail(job.id, "".join(traceback.format_exception(exc)), retry_at)
+        else:
+            await get_job_queue().complete(job.id, result)
+            logger.info("%s job %d succeeded", job.job_type, job.id)
+
+
+job_worker_pool = JobWorkerPool()
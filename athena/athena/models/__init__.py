@@ -14,4 +14,7 @@ from .db_text_submission import DBTextSubmission
 from .db_modeling_submission import DBModelingSubmission
 from .db_programming_feedback import DBProgrammingFeedback
 from .db_text_feedback import DBTextFeedback
-from .db_modeling_feedback import DBModelingFeedback
\ No newline at end of file
+from .db_modeling_feedback import DBModelingFeedback
+from .db_job import DBJob
+from .db_feedback_suggestion_cache_entry import DBFeedbackSuggestionCacheEntry
+from .db_exercise_artifact import DBExerciseArtifact
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, DateTime, BigInteger, JSON, String
+
+from athena.database import Base
+from .model import Model
+
+
+class DBExerciseArtifact(Model, Base):
+    """Data that a module derived from an exercise (e.g. precomputed diffs), stored apart from the exercise meta."""
+    __tablename__ = "exercise_artifacts"
+
+    module_name = Column(String, primary_key=True)
+    lms_url = Column(String, primary_key=True)
+    exercise_id = Column(BigInteger, primary_key=True)
+    # one row per artifact, so that they can be written independently of each other and of the exercise
+    name = Column(String, primary_key=True)
+    data = Column(JSON, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, DateTime, BigInteger, JSON, String
+
+from athena.database import Base
+from .model import Model
+
+
+class DBFeedbackSuggestionCacheEntry(Model, Base):
+    """Feedback suggestions returned for a request, to return them again for identical requests."""
+    __tablename__ = "feedback_suggestion_cache"
+
+    # hash of the module name, exercise, submission, module config and is_graded
+    key = Column(String, primary_key=True)
+    module_name = Column(String, index=True, nullable=False)
+    lms_url = Column(String, index=True, nullable=False)
+    exercise_id = Column(BigInteger, index=True, nullable=False)
+    submission_id = Column(BigInteger, index=True, nullable=False)
+    # schema class of the suggestions (e.g. TextFeedback) and their IDs in the feedback table of the exercise type
+    feedback_type = Column(String)
+    feedback_ids = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, index=True)
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, DateTime, Integer, JSON, String, Enum as SqlEnum
+
+from athena.database import Base
+from athena.schemas.job import JobStatus
+from .model import Model
+from .big_integer_with_autoincrement import BigIntegerWithAutoincrement
+
+
+class DBJob(Model, Base):
+    __tablename__ = "jobs"
+
+    id = Column(BigIntegerWithAutoincrement, primary_key=True, index=True, autoincrement=True)
+    # modules of the same exercise type might share a database, each module only runs its own jobs
+    module_name = Column(String, index=True, nullable=False)
+    job_type = Column(String, index=True, nullable=False)
+    status = Column(SqlEnum(JobStatus), index=True, nullable=False)
+    payload = Column(JSON, nullable=False)
+    # context variables of the request that enqueued the job (e.g. the LMS URL), restored when the job runs
+    context = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    error = Column(String)
+    # JSON serializable return value of the handler, e.g. the feedback suggestions of an async request
+    result = Column(JSON)
+    run_after = Column(DateTime, index=True, nullable=False)
+    # running jobs are leased, if a worker dies the job is picked up again after the lease expired
+    locked_until = Column(DateTime)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
@@ -21,8 +21,14 @@ count_stored_submissions = functools.partial(athena.storage.count_stored_submiss
 get_stored_submissions = functools.partial(athena.storage.get_stored_submissions, Submission)
 get_stored_feedback = functools.partial(athena.storage.get_stored_feedback, Feedback)
 get_stored_feedback_suggestions = functools.partial(athena.storage.get_stored_feedback_suggestions, Feedback)
+aget_stored_exercises = functools.partial(athena.storage.aget_stored_exercises, Exercise)
+acount_stored_submissions = functools.partial(athena.storage.acount_stored_submissions, Submission)
+aget_stored_submissions = functools.partial(athena.storage.aget_stored_submissions, Submission)
+aget_stored_feedback = functools.partial(athena.storage.aget_stored_feedback, Feedback)
+aget_stored_feedback_suggestions = functools.partial(athena.storage.aget_stored_feedback_suggestions, Feedback)
 
 __all__ = [
     "Exercise", "Submission", "Feedback",
-    "get_stored_exercises", "get_stored_submissions", "get_stored_feedback", "get_stored_feedback_suggestions", "count_stored_submissions"
+    "get_stored_exercises", "get_stored_submissions", "get_stored_feedback", "get_stored_feedback_suggestions", "count_stored_submissions",
+    "aget_stored_exercises", "aget_stored_submissions", "aget_stored_feedback", "aget_stored_feedback_suggestions", "acount_stored_submissions"
 ]
@@ -0,0 +1,41 @@
+from datetime import datetime
+from enum import Enum
+from typing import Any, List, Optional
+
+from pydantic import Field
+
+from .schema import Schema
+
+
+class JobStatus(str, Enum):
+    """The status of a background job."""
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+class Job(Schema):
+    """A durable background job, e.g. a call of the submissions consumer or the feedback consumer."""
+    id: int = Field(example=1)
+    job_type: str = Field(description="The type of the job, i.e. the name of the handler that runs it.",
+                          example="submissions_consumer")
+    status: JobStatus = Field(example=JobStatus.queued)
+    attempts: int = Field(0, description="The number of times the job was started.", example=1)
+    max_attempts: int = Field(description="The job is not retried after this many attempts.", example=3)
+    error: Optional[str] = Field(None, description="The error of the last failed attempt.")
+    result: Optional[Any] = Field(None, description="What the handler returned, once the job succeeded.")
+    run_after: datetime = Field(description="The job is not started before this time (UTC), used for retries.")
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class FeedbackSuggestionsJob(Schema):
+    """An async request for feedback suggestions, see the `async` and `callbackUrl` options of /feedback_suggestions."""
+    job_id: int = Field(example=1)
+    status: JobStatus = Field(example=JobStatus.succeeded)
+    feedbacks: Optional[List[dict]] = Field(None, description="The feedback suggestions, once the job succeeded.")
+    error: Optional[str] = Field(None, description="The error, if the job failed.")
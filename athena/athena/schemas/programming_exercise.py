@@ -2,7 +2,8 @@ from pydantic import Field, AnyUrl
 from zipfile import ZipFile
 from git.repo import Repo
 
-from athena.helpers.programming.code_repository import get_repository_zip, get_repository
+from athena.helpers.programming.code_repository import get_repository_zip, get_repository, aget_repository_zip, \
+    aget_repository
 from .exercise_type import ExerciseType
 from .exercise import Exercise
 
@@ -51,4 +52,34 @@ class ProgrammingExercise(Exercise):
 
     def get_tests_repository(self) -> Repo:
         """Return the tests repository as a Repo object."""
-        return get_repository(self.tests_repository_uri)
\ No newline at end of file
+        return get_repository(self.tests_repository_uri)
+
+
+    async def aget_solution_zip(self) -> ZipFile:
+        """Return the solution repository as a ZipFile object without blocking the event loop."""
+        return await aget_repository_zip(self.solution_repository_uri)
+
+
+    async def aget_solution_repository(self) -> Repo:
+        """Return the solution repository as a Repo object without blocking the event loop."""
+        return await aget_repository(self.solution_repository_uri)
+
+
+    async def aget_template_zip(self) -> ZipFile:
+        """Return the template repository as a ZipFile object without blocking the event loop."""
+        return await aget_repository_zip(self.template_repository_uri)
+
+
+    async def aget_template_repository(self) -> Repo:
+        """Return the template repository as a Repo object without blocking the event loop."""
+        return await aget_repository(self.template_repository_uri)
+
+
+    async def aget_tests_zip(self) -> ZipFile:
+        """Return the tests repository as a ZipFile object without blocking the event loop."""
+        return await aget_repository_zip(self.tests_repository_uri)
+
+
+    async def aget_tests_repository(self) -> Repo:
+        """Return the tests repository as a Repo object without blocking the event loop."""
+        return await aget_repository(self.tests_repository_uri)
@@ -2,7 +2,8 @@ from pydantic import Field
 from zipfile import ZipFile
 from git.repo import Repo
 
-from athena.helpers.programming.code_repository import get_repository_zip, get_repository
+from athena.helpers.programming.code_repository import get_repository_zip, get_repository, aget_repository_zip, \
+    aget_repository
 from athena.schemas.submission import Submission
 
 
@@ -19,6 +20,16 @@ class ProgrammingSubmission(Submission):
     def get_repository(self) -> Repo:
         """Return the submission repository as a Repo object."""
         return get_repository(self.repository_uri)
+
+
+    async def aget_zip(self) -> ZipFile:
+        """Return the submission repository as a ZipFile object without blocking the event loop."""
+        return await aget_repository_zip(self.repository_uri)
+
+
+    async def aget_repository(self) -> Repo:
+        """Return the submission repository as a Repo object without blocking the event loop."""
+        return await aget_repository(self.repository_uri)
     
     def get_code(self, file_path: str) -> str:
         """
@@ -0,0 +1,114 @@
+"""
+Deduplication of identical concurrent requests.
+
+Identical requests (e.g. a tutor opening the same submission twice, or the LMS retrying after a timeout) would otherwise
+each start their own computation. With single-flight, the first request computes the result and all identical requests
+that arrive in the meantime wait for it. Optionally, results are additionally kept in memory for a short time.
+
+Example:
+    >>> feedback_single_flight = SingleFlight(cache_ttl=30)
+    >>> key = request_key(exercise.dict(), submission.dict())
+    >>> result, meta, shared = await feedback_single_flight.run(key, lambda: compute_feedback(exercise, submission))
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+from athena.metadata import metadata_context, get_meta
+
+T = TypeVar("T")
+
+
+def request_key(*parts: Any) -> str:
+    """Stable hash of the JSON serializable parts of a request."""
+    serialized = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class SingleFlight(Generic[T]):
+    """
+    Runs at most one computation per key at a time, sharing the result with all callers.
+
+    The metadata emitted during the computation (see athena.metadata) is captured, so that every caller can return it.
+
+    Cached results can be labeled (e.g. with the exercise and submission), to invalidate them selectively.
+
+    Args:
+        cache_ttl: Seconds to keep successful results after the computation finished, 0 to disable.
+        cache_max_size: Maximum number of cached results, the least recently used are evicted first.
+    """
+
+    def __init__(self, cache_ttl: float = 0, cache_max_size: int = 256):
+        self.cache_ttl = cache_ttl
+        self.cache_max_size = cache_max_size
+        self._in_flight: Dict[str, "asyncio.Future[Tuple[T, Dict[str, Any]]]"] = {}
+        # key -> (expires at, result, metadata, labels)
+        self._cache: "OrderedDict[str, Tuple[float, T, Dict[str, Any], Dict[str, Any]]]" = OrderedDict()
+
+    def _get_cached(self, key: str) -> Optional[Tuple[T, Dict[str, Any]]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, result, meta, _ = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return result, meta
+
+    def _set_cached(self, key: str, result: T, meta: Dict[str, Any], labels: Dict[str, Any]):
+        if self.cache_ttl <= 0:
+            return
+        self._cache[key] = (time.monotonic() + self.cache_ttl, result, meta, labels)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_max_size:
+            self._cache.popitem(last=False)
+
+    async def _compute(self, key: str, func: Callable[[], Awaitable[T]],
+                       labels: Dict[str, Any]) -> Tuple[T, Dict[str, Any]]:
+        # Collect the metadata of the computation separately from the metadata of the request that started it
+        metadata_context.set({})
+        try:
+            result = await func()
+            meta = dict(get_meta())
+            self._set_cached(key, result, meta, labels)
+            return result, meta
+        finally:
+            del self._in_flight[key]
+
+    async def run(self, key: str, func: Callable[[], Awaitable[T]],
+                  labels: Optional[Dict[str, Any]] = None) -> Tuple[T, Dict[str, Any], bool]:
+        """
+        Get the result of func for the key, computing it only if it is neither cached nor already being computed.
+        The labels are stored with the cached result, see invalidate.
+
+        Returns:
+            The result, the metadata emitted during the computation and whether the result was shared
+            (cached or computed for another request).
+        """
+        cached = self._get_cached(key)
+        if cached is not None:
+            return cached[0], cached[1], True
+
+        future = self._in_flight.get(key)
+        shared = future is not None
+        if future is None:
+            # Runs as a task, so that it continues for the other callers if the first caller is cancelled
+            future = asyncio.ensure_future(self._compute(key, func, labels or {}))
+            self._in_flight[key] = future
+        result, meta = await asyncio.shield(future)
+        return result, meta, shared
+
+    def invalidate(self, key: Optional[str] = None, **labels: Any):
+        """Remove the cached result for the key, the cached results with all the given labels, or all cached results."""
+        if key is not None:
+            self._cache.pop(key, None)
+        elif labels:
+            for cached_key, (_, _, _, cached_labels) in list(self._cache.items()):
+                if all(cached_labels.get(name) == value for name, value in labels.items()):
+                    del self._cache[cached_key]
+        else:
+            self._cache.clear()
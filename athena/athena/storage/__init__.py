@@ -1,3 +1,6 @@
 from .feedback_storage import *
 from .submission_storage import *
 from .exercise_storage import *
+from .assessment_storage import *
+from .feedback_suggestion_cache_storage import *
+from .exercise_artifact_storage import *
@@ -0,0 +1,135 @@
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from athena.contextvars import get_lms_url
+from athena.database import get_db, get_async_db
+from athena.schemas import Exercise, Submission, Feedback
+from athena.storage.bulk_upsert import bulk_insert_returning_ids, bulk_upsert, to_row
+
+
+def _merge_stored_meta_and_store(db: Session, exercise: Exercise, submissions: List[Submission],
+                                 lms_feedbacks: List[Feedback], lms_url: str):
+    db_exercise_cls = exercise.__class__.get_model_class()
+    exercise.meta.update(db.query(db_exercise_cls.meta).filter_by(id=exercise.id,  # type: ignore
+                                                                  lms_url=lms_url).scalar() or {})
+    bulk_upsert(db, db_exercise_cls, [to_row(db_exercise_cls, {**exercise.dict(), "lms_url": lms_url})])
+
+    if submissions:
+        db_submission_cls = submissions[0].__class__.get_model_class()
+        stored_submission_metas = dict(
+            db.query(db_submission_cls.id, db_submission_cls.meta)  # type: ignore
+            .filter(db_submission_cls.id.in_([s.id for s in submissions]))  # type: ignore
+            .filter(db_submission_cls.lms_url == lms_url)  # type: ignore
+            .all()
+        )
+        for submission in submissions:
+            submission.meta.update(stored_submission_metas.get(submission.id) or {})
+        bulk_upsert(db, db_submission_cls, [
+            to_row(db_submission_cls, {**submission.dict(), "lms_url": lms_url}) for submission in submissions
+        ])
+
+    if lms_feedbacks:
+        db_feedback_cls = lms_feedbacks[0].__class__.get_model_class()
+        stored_feedbacks = {
+            lms_id: (internal_id, meta)
+            for internal_id, lms_id, meta in db.query(db_feedback_cls.id, db_feedback_cls.lms_id,  # type: ignore
+                                                      db_feedback_cls.meta)
+            .filter(db_feedback_cls.lms_id.in_([f.id for f in lms_feedbacks]))  # type: ignore
+            .filter(db_feedback_cls.lms_url == lms_url)  # type: ignore
+            .all()
+        }
+
+        existing_rows = []
+        new_rows = []
+        new_feedbacks: List[Feedback] = []
+        for feedback in lms_feedbacks:
+            lms_id = feedback.id
+            internal_id, stored_meta = stored_feedbacks.get(lms_id, (None, None))
+            feedback.meta.update(stored_meta or {})
+            row = to_row(db_feedback_cls, {**feedback.dict(), "is_suggestion": False, "lms_id": lms_id,
+                                           "lms_url": lms_url})
+            if internal_id is None:
+                del row["id"]
+                new_rows.append(row)
+                new_feedbacks.append(feedback)
+            else:
+                row["id"] = feedback.id = internal_id
+                existing_rows.append(row)
+
+        bulk_upsert(db, db_feedback_cls, existing_rows)
+        for feedback, internal_id in zip(new_feedbacks, bulk_insert_returning_ids(db, db_feedback_cls, new_rows)):
+            feedback.id = internal_id
+    db.commit()
+
+
+def merge_stored_meta_and_store(
+        exercise: Exercise, submission: Submission, lms_feedbacks: Optional[List[Feedback]] = None,
+        lms_url: Optional[str] = None
+):
+    """Merges the stored metadata into the given exercise, submission and LMS feedbacks and stores them.
+
+    Everything is read and written in one session and one transaction, with one query per entity type.
+    The stored metadata takes precedence over the metadata sent by the LMS.
+    The IDs of the given feedbacks are LMS IDs, they are replaced by the internal IDs in place.
+
+    Args:
+        exercise (Exercise): The exercise to store, its meta is updated in place.
+        submission (Submission): The submission to store, its meta is updated in place.
+        lms_feedbacks (List[Feedback], optional): The LMS feedbacks to store, their meta and IDs are updated in place.
+        lms_url (str, optional): The URL of the LMS instance that issued the query
+    """
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+    if lms_feedbacks is None:
+        lms_feedbacks = []
+
+    with get_db() as db:
+        _merge_stored_meta_and_store(db, exercise, [submission], lms_feedbacks, lms_url)
+
+
+async def amerge_stored_meta_and_store(
+        exercise: Exercise, submission: Submission, lms_feedbacks: Optional[List[Feedback]] = None,
+        lms_url: Optional[str] = None
+):
+    """Async variant of merge_stored_meta_and_store."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+    if lms_feedbacks is None:
+        lms_feedbacks = []
+
+    async with get_async_db() as db:
+        await db.run_sync(_merge_stored_meta_and_store, exercise, [submission], lms_feedbacks, lms_url)
+
+
+def merge_stored_meta_and_store_submissions(exercise: Exercise, submissions: List[Submission],
+                                            lms_url: Optional[str] = None):
+    """Merges the stored metadata into the given exercise and submissions and stores them.
+
+    Like merge_stored_meta_and_store, but for many submissions of the exercise (e.g. a batch request), in one
+    transaction with one query per entity type.
+
+    Args:
+        exercise (Exercise): The exercise to store, its meta is updated in place.
+        submissions (List[Submission]): The submissions of the exercise to store, their meta is updated in place.
+        lms_url (str, optional): The URL of the LMS instance that issued the query
+    """
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    with get_db() as db:
+        _merge_stored_meta_and_store(db, exercise, submissions, [], lms_url)
+
+
+async def amerge_stored_meta_and_store_submissions(exercise: Exercise, submissions: List[Submission],
+                                                   lms_url: Optional[str] = None):
+    """Async variant of merge_stored_meta_and_store_submissions."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        await db.run_sync(_merge_stored_meta_and_store, exercise, submissions, [], lms_url)
@@ -0,0 +1,95 @@
+"""
+Bulk write helpers for the storage functions.
+
+On PostgreSQL and SQLite, rows are written with dialect-native `INSERT ... ON CONFLICT DO UPDATE` statements in chunks
+(executemany), instead of one SELECT plus INSERT/UPDATE per row as with `Session.merge`.
+Generated IDs are fetched with `RETURNING`. Other dialects fall back to `Session.merge`.
+"""
+from typing import Any, Dict, Iterator, List, Type
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+BULK_CHUNK_SIZE = 1000
+
+_dialect_inserts = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def _chunks(rows: List[Dict[str, Any]], size: int = BULK_CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def supports_bulk_upsert(db: Session) -> bool:
+    """Whether the database of the session supports native upserts with RETURNING."""
+    return db.get_bind().dialect.name in _dialect_inserts
+
+
+def to_row(model_class: Type, values: Dict[str, Any]) -> Dict[str, Any]:
+    """Only keep the values that belong to a column of the table of the model class."""
+    columns = model_class.__table__.columns
+    return {key: value for key, value in values.items() if key in columns}
+
+
+def bulk_upsert(db: Session, model_class: Type, rows: List[Dict[str, Any]]):
+    """Insert the rows or update them if a row with the same primary key exists. Does not commit.
+
+    Args:
+        db (Session): Database session
+        model_class (Type): SQLAlchemy model class, i.e. DBTextExercise
+        rows (List[Dict[str, Any]]): Column values of each row, including the primary key
+    """
+    if not rows:
+        return
+    if not supports_bulk_upsert(db):
+        for row in rows:
+            db.merge(model_class(**row))
+        return
+
+    table = model_class.__table__
+    # A statement may only affect every row once (ON CONFLICT on PostgreSQL), so the last row with a primary key wins,
+    # like with merge
+    primary_key = [column.name for column in table.primary_key.columns]
+    rows = list({tuple(row.get(name) for name in primary_key): row for row in rows}.values())
+    statement = _dialect_inserts[db.get_bind().dialect.name](table)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(table.primary_key.columns),
+        set_={
+            column.name: statement.excluded[column.name]
+            for column in table.columns
+            if not column.primary_key and column.name in rows[0]
+        },
+    )
+    for chunk in _chunks(rows):
+        db.execute(statement, chunk)
+
+
+def bulk_insert_returning_ids(db: Session, model_class: Type, rows: List[Dict[str, Any]]) -> List[int]:
+    """Insert the rows (without a primary key) and return the generated IDs in the order of the rows. Does not commit.
+
+    Args:
+        db (Session): Database session
+        model_class (Type): SQLAlchemy model class, i.e. DBTextFeedback
+        rows (List[Dict[str, Any]]): Column values of each row, without the primary key
+
+    Returns:
+        List[int]: The generated IDs
+    """
+    if not rows:
+        return []
+    if not supports_bulk_upsert(db):
+        models = [model_class(**row) for row in rows]
+        db.add_all(models)
+        db.flush()  # Ensure the IDs are generated now
+        return [model.id for model in models]
+
+    table = model_class.__table__
+    statement = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+    ids: List[int] = []
+    for chunk in _chunks(rows):
+        ids.extend(db.execute(statement, chunk).scalars().all())
+    return ids
@@ -0,0 +1,87 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from athena.contextvars import get_lms_url
+from athena.database import get_db, get_async_db
+from athena.models import DBExerciseArtifact
+from athena.module_config import get_module_config
+from athena.storage.bulk_upsert import bulk_upsert
+
+
+def _get_stored_exercise_artifact(db: Session, module_name: str, lms_url: str, exercise_id: int,
+                                  name: str) -> Optional[Dict[str, Any]]:
+    artifact = db.get(DBExerciseArtifact, (module_name, lms_url, exercise_id, name))
+    return artifact.data if artifact is not None else None
+
+
+def _store_exercise_artifact(db: Session, module_name: str, lms_url: str, exercise_id: int, name: str,
+                             data: Dict[str, Any]):
+    bulk_upsert(db, DBExerciseArtifact, [{
+        "module_name": module_name,
+        "lms_url": lms_url,
+        "exercise_id": exercise_id,
+        "name": name,
+        "data": data,
+        "updated_at": datetime.utcnow(),
+    }])
+    db.commit()
+
+
+def get_stored_exercise_artifact(exercise_id: int, name: str,
+                                 lms_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Returns the artifact of this module with the given name for the exercise, or None if it was not stored yet.
+
+    Args:
+        exercise_id (int): The exercise the artifact was derived from.
+        name (str): Name of the artifact.
+        lms_url (str, optional): The URL of the LMS instance that issued the query
+    """
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    with get_db() as db:
+        return _get_stored_exercise_artifact(db, get_module_config().name, lms_url, exercise_id, name)
+
+
+async def aget_stored_exercise_artifact(exercise_id: int, name: str,
+                                        lms_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Async variant of get_stored_exercise_artifact."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        return await db.run_sync(_get_stored_exercise_artifact, get_module_config().name, lms_url, exercise_id, name)
+
+
+def store_exercise_artifact(exercise_id: int, name: str, data: Dict[str, Any], lms_url: Optional[str] = None):
+    """Stores (or replaces) an artifact of this module for the exercise.
+
+    Artifacts are kept in their own rows, not in the exercise meta, so that they are neither sent back and forth with
+    the exercise on every request nor overwritten when the exercise is stored.
+
+    Args:
+        exercise_id (int): The exercise the artifact was derived from.
+        name (str): Name of the artifact.
+        data (Dict[str, Any]): JSON serializable artifact.
+        lms_url (str, optional): The URL of the LMS instance that issued the query
+    """
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    with get_db() as db:
+        _store_exercise_artifact(db, get_module_config().name, lms_url, exercise_id, name, data)
+
+
+async def astore_exercise_artifact(exercise_id: int, name: str, data: Dict[str, Any], lms_url: Optional[str] = None):
+    """Async variant of store_exercise_artifact."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        await db.run_sync(_store_exercise_artifact, get_module_config().name, lms_url, exercise_id, name, data)
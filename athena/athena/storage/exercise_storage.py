@@ -1,8 +1,37 @@
 from typing import List, Iterable, Optional, Type
 
+from sqlalchemy.orm import Session
+
 from athena.contextvars import get_lms_url
-from athena.database import get_db
+from athena.database import get_db, get_async_db
 from athena.schemas import Exercise
+from athena.storage.bulk_upsert import bulk_upsert, to_row
+
+
+def _get_stored_exercises(db: Session, exercise_cls: Type[Exercise], lms_url: str,
+                          only_ids: Optional[List[int]]) -> List[Exercise]:
+    db_exercise_cls = exercise_cls.get_model_class()
+    query = db.query(db_exercise_cls)
+    if only_ids is not None:
+        query = query.filter(db_exercise_cls.id.in_(only_ids))  # type: ignore
+    query = query.filter(db_exercise_cls.lms_url == lms_url)  # type: ignore
+    return [e.to_schema() for e in query.all()]
+
+
+def _get_stored_exercise_meta(db: Session, exercise: Exercise, lms_url: str) -> Optional[dict]:
+    db_exercise_cls: Type[Exercise] = exercise.__class__.get_model_class()
+    return db.query(db_exercise_cls.meta).filter_by(id=exercise.id,
+                                                    lms_url=lms_url).scalar()  # type: ignore
+
+
+def _store_exercises(db: Session, exercises: List[Exercise], lms_url: str):
+    if not exercises:
+        return
+
+    db_exercise_cls = exercises[0].__class__.get_model_class()
+    rows = [to_row(db_exercise_cls, {**e.dict(), "lms_url": lms_url}) for e in exercises]
+    bulk_upsert(db, db_exercise_cls, rows)
+    db.commit()
 
 
 def get_stored_exercises(exercise_cls: Type[Exercise], lms_url: Optional[str] = None, only_ids: Optional[List[int]] = None) -> \
@@ -15,13 +44,19 @@ Iterable[Exercise]:
     if lms_url is None:
         lms_url = get_lms_url()
 
-    db_exercise_cls = exercise_cls.get_model_class()
     with get_db() as db:
-        query = db.query(db_exercise_cls)
-        if only_ids is not None:
-            query = query.filter(db_exercise_cls.id.in_(only_ids))  # type: ignore
-        query = query.filter(db_exercise_cls.lms_url == lms_url)  # type: ignore
-        return (e.to_schema() for e in query.all())
+        return iter(_get_stored_exercises(db, exercise_cls, lms_url, only_ids))
+
+
+async def aget_stored_exercises(exercise_cls: Type[Exercise], lms_url: Optional[str] = None,
+                                only_ids: Optional[List[int]] = None) -> List[Exercise]:
+    """Async variant of get_stored_exercises."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        return await db.run_sync(_get_stored_exercises, exercise_cls, lms_url, only_ids)
 
 
 def get_stored_exercise_meta(exercise: Exercise, lms_url: Optional[str] = None, ) -> Optional[dict]:
@@ -30,10 +65,18 @@ def get_stored_exercise_meta(exercise: Exercise, lms_url: Optional[str] = None,
     if lms_url is None:
         lms_url = get_lms_url()
 
-    db_exercise_cls: Type[Exercise] = exercise.__class__.get_model_class()
     with get_db() as db:
-        return db.query(db_exercise_cls.meta).filter_by(id=exercise.id,
-                                                        lms_url=lms_url).scalar()  # type: ignore
+        return _get_stored_exercise_meta(db, exercise, lms_url)
+
+
+async def aget_stored_exercise_meta(exercise: Exercise, lms_url: Optional[str] = None) -> Optional[dict]:
+    """Async variant of get_stored_exercise_meta."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        return await db.run_sync(_get_stored_exercise_meta, exercise, lms_url)
 
 
 def store_exercises(exercises: List[Exercise], lms_url: Optional[str] = None):
@@ -43,13 +86,24 @@ def store_exercises(exercises: List[Exercise], lms_url: Optional[str] = None):
         lms_url = get_lms_url()
 
     with get_db() as db:
-        for e in exercises:
-            exercise_model = e.to_model()
-            exercise_model.lms_url = lms_url
-            db.merge(exercise_model)
-        db.commit()
+        _store_exercises(db, exercises, lms_url)
+
+
+async def astore_exercises(exercises: List[Exercise], lms_url: Optional[str] = None):
+    """Async variant of store_exercises."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        await db.run_sync(_store_exercises, exercises, lms_url)
 
 
 def store_exercise(exercise: Exercise, lms_url: Optional[str] = None):
     """Stores the given exercise."""
     store_exercises([exercise], lms_url)
+
+
+async def astore_exercise(exercise: Exercise, lms_url: Optional[str] = None):
+    """Async variant of store_exercise."""
+    await astore_exercises([exercise], lms_url)
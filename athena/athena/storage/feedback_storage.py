@@ -1,8 +1,64 @@
 from typing import Iterable, Union, Type, Optional, List
 
+from sqlalchemy.orm import Session
+
 from athena.contextvars import get_lms_url
-from athena.database import get_db
+from athena.database import get_db, get_async_db
 from athena.schemas import Feedback
+from athena.storage.bulk_upsert import bulk_insert_returning_ids, bulk_upsert, to_row
+
+
+def _get_stored_feedback(db: Session, feedback_cls: Type[Feedback], exercise_id: int, submission_id: Union[int, None],
+                         lms_url: str, is_suggestion: bool) -> List[Feedback]:
+    db_feedback_cls = feedback_cls.get_model_class()
+    query = db.query(db_feedback_cls).filter_by(exercise_id=exercise_id, is_suggestion=is_suggestion, lms_url=lms_url)
+    if submission_id is not None:
+        query = query.filter_by(submission_id=submission_id)
+    return [f.to_schema() for f in query.all()]
+
+
+def _get_stored_feedback_meta(db: Session, feedback: Feedback, lms_url: str) -> Optional[dict]:
+    db_feedback_cls = feedback.__class__.get_model_class()
+    return db.query(db_feedback_cls.meta).filter_by(id=feedback.id,  # type: ignore
+                                                    lms_url=lms_url).scalar()
+
+
+def _store_feedback(db: Session, feedback: Feedback, is_lms_id: bool, lms_url: str) -> Feedback:
+    db_feedback_cls = feedback.__class__.get_model_class()
+    lms_id = None
+    if is_lms_id:
+        lms_id = feedback.id
+        internal_id = db.query(db_feedback_cls.id).filter_by(lms_id=lms_id,  # type: ignore
+                                                             lms_url=lms_url).scalar()
+        feedback.id = internal_id
+
+    stored_feedback_model = db.merge(feedback.to_model(lms_id=lms_id, lms_url=lms_url))
+    db.commit()
+    return stored_feedback_model.to_schema()
+
+
+def _store_feedback_suggestions(db: Session, feedbacks: List[Feedback], lms_url: str) -> List[Feedback]:
+    if not feedbacks:
+        return []
+
+    db_feedback_cls = feedbacks[0].__class__.get_model_class()
+    rows = [
+        to_row(db_feedback_cls, {**feedback.dict(), "is_suggestion": True, "lms_id": None, "lms_url": lms_url})
+        for feedback in feedbacks
+    ]
+    # New suggestions get their IDs generated by the database, existing ones are updated
+    new_indices = [i for i, feedback in enumerate(feedbacks) if feedback.id is None]
+    existing_rows = [row for row, feedback in zip(rows, feedbacks) if feedback.id is not None]
+    new_rows = [{key: value for key, value in rows[i].items() if key != "id"} for i in new_indices]
+
+    bulk_upsert(db, db_feedback_cls, existing_rows)
+    generated_ids = bulk_insert_returning_ids(db, db_feedback_cls, new_rows)
+    db.commit()
+
+    stored_feedbacks = [feedback.copy() for feedback in feedbacks]
+    for i, generated_id in zip(new_indices, generated_ids):
+        stored_feedbacks[i].id = generated_id
+    return stored_feedbacks
 
 
 def get_stored_feedback(
@@ -16,12 +72,20 @@ def get_stored_feedback(
     if lms_url is None:
         lms_url = get_lms_url()
 
-    db_feedback_cls = feedback_cls.get_model_class()
     with get_db() as db:
-        query = db.query(db_feedback_cls).filter_by(exercise_id=exercise_id, is_suggestion=0, lms_url=lms_url)
-        if submission_id is not None:
-            query = query.filter_by(submission_id=submission_id)
-        return (f.to_schema() for f in query.all())
+        return iter(_get_stored_feedback(db, feedback_cls, exercise_id, submission_id, lms_url, is_suggestion=False))
+
+
+async def aget_stored_feedback(
+        feedback_cls: Type[Feedback], exercise_id: int, submission_id: Union[int, None], lms_url: Optional[str] = None
+) -> List[Feedback]:
+    """Async variant of get_stored_feedback."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        return await db.run_sync(_get_stored_feedback, feedback_cls, exercise_id, submission_id, lms_url, False)
 
 
 def get_stored_feedback_meta(feedback: Feedback, lms_url: Optional[str] = None) -> Optional[dict]:
@@ -30,10 +94,18 @@ def get_stored_feedback_meta(feedback: Feedback, lms_url: Optional[str] = None)
     if lms_url is None:
         lms_url = get_lms_url()
 
-    db_feedback_cls = feedback.__class__.get_model_class()
     with get_db() as db:
-        return db.query(db_feedback_cls.meta).filter_by(id=feedback.id,  # type: ignore
-                                                        lms_url=lms_url).scalar()
+        return _get_stored_feedback_meta(db, feedback, lms_url)
+
+
+async def aget_stored_feedback_meta(feedback: Feedback, lms_url: Optional[str] = None) -> Optional[dict]:
+    """Async variant of get_stored_feedback_meta."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        return await db.run_sync(_get_stored_feedback_meta, feedback, lms_url)
 
 
 def store_feedback(feedback: Feedback, is_lms_id=False, lms_url: Optional[str] = None) -> Feedback:
@@ -50,18 +122,18 @@ def store_feedback(feedback: Feedback, is_lms_id=False, lms_url: Optional[str] =
     if lms_url is None:
         lms_url = get_lms_url()
 
-    db_feedback_cls = feedback.__class__.get_model_class()
     with get_db() as db:
-        lms_id = None
-        if is_lms_id:
-            lms_id = feedback.id
-            internal_id = db.query(db_feedback_cls.id).filter_by(lms_id=lms_id,  # type: ignore
-                                                                 lms_url=lms_url).scalar()
-            feedback.id = internal_id
+        return _store_feedback(db, feedback, is_lms_id, lms_url)
+
+
+async def astore_feedback(feedback: Feedback, is_lms_id=False, lms_url: Optional[str] = None) -> Feedback:
+    """Async variant of store_feedback."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
 
-        stored_feedback_model = db.merge(feedback.to_model(lms_id=lms_id, lms_url=lms_url))
-        db.commit()
-        return stored_feedback_model.to_schema()
+    async with get_async_db() as db:
+        return await db.run_sync(_store_feedback, feedback, is_lms_id, lms_url)
 
 
 def get_stored_feedback_suggestions(
@@ -72,13 +144,20 @@ def get_stored_feedback_suggestions(
     if lms_url is None:
         lms_url = get_lms_url()
 
-    db_feedback_cls = feedback_cls.get_model_class()
     with get_db() as db:
-        query = db.query(db_feedback_cls).filter_by(exercise_id=exercise_id, is_suggestion=True,
-                                                    lms_url=lms_url)
-        if submission_id is not None:
-            query = query.filter_by(submission_id=submission_id)
-        return (f.to_schema() for f in query.all())
+        return iter(_get_stored_feedback(db, feedback_cls, exercise_id, submission_id, lms_url, is_suggestion=True))
+
+
+async def aget_stored_feedback_suggestions(
+        feedback_cls: Type[Feedback], exercise_id: int, submission_id: int, lms_url: Optional[str] = None
+) -> List[Feedback]:
+    """Async variant of get_stored_feedback_suggestions."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        return await db.run_sync(_get_stored_feedback, feedback_cls, exercise_id, submission_id, lms_url, True)
 
 
 def store_feedback_suggestions(feedbacks: List[Feedback], lms_url: Optional[str] = None) -> List[Feedback]:
@@ -91,18 +170,25 @@ def store_feedback_suggestions(feedbacks: List[Feedback], lms_url: Optional[str]
     if lms_url is None:
         lms_url = get_lms_url()
 
-    stored_feedbacks: List[Feedback] = []
     with get_db() as db:
-        for feedback in feedbacks:
-            feedback_model = feedback.to_model(is_suggestion=True)
-            feedback_model.lms_url = lms_url
-            feedback_model = db.merge(feedback_model)
-            db.flush()  # Ensure the ID is generated now
-            stored_feedbacks.append(feedback_model.to_schema())
-        db.commit()
-    return stored_feedbacks
+        return _store_feedback_suggestions(db, feedbacks, lms_url)
+
+
+async def astore_feedback_suggestions(feedbacks: List[Feedback], lms_url: Optional[str] = None) -> List[Feedback]:
+    """Async variant of store_feedback_suggestions."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        return await db.run_sync(_store_feedback_suggestions, feedbacks, lms_url)
 
 
 def store_feedback_suggestion(feedback: Feedback, lms_url: Optional[str] = None):
     """Stores the given feedback as a suggestion."""
     store_feedback_suggestions([feedback], lms_url)
+
+
+async def astore_feedback_suggestion(feedback: Feedback, lms_url: Optional[str] = None):
+    """Async variant of store_feedback_suggestion."""
+    await astore_feedback_suggestions([feedback], lms_url)
@@ -0,0 +1,143 @@
+import importlib
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from athena.contextvars import get_lms_url
+from athena.database import get_db, get_async_db
+from athena.models import DBFeedbackSuggestionCacheEntry
+from athena.module_config import get_module_config
+from athena.schemas import Feedback
+from athena.storage.bulk_upsert import bulk_upsert
+
+
+def _get_cached_feedback_suggestions(db: Session, key: str, now: datetime) -> Optional[List[Feedback]]:
+    entry = db.get(DBFeedbackSuggestionCacheEntry, key)
+    if entry is None or (entry.expires_at is not None and entry.expires_at <= now):
+        return None
+    if not entry.feedback_ids:
+        return []
+
+    feedback_cls = getattr(importlib.import_module("athena.schemas"), entry.feedback_type)
+    db_feedback_cls = feedback_cls.get_model_class()
+    feedbacks_by_id = {
+        feedback.id: feedback.to_schema()
+        for feedback in db.query(db_feedback_cls).filter(db_feedback_cls.id.in_(entry.feedback_ids)).all()
+    }
+    if len(feedbacks_by_id) != len(entry.feedback_ids):
+        return None  # some suggestions were deleted in the meantime
+    return [feedbacks_by_id[feedback_id] for feedback_id in entry.feedback_ids]
+
+
+def _store_cached_feedback_suggestions(db: Session, key: str, module_name: str, lms_url: str, exercise_id: int,
+                                       submission_id: int, feedbacks: List[Feedback], now: datetime,
+                                       expires_at: Optional[datetime]):
+    # Clean up expired entries along the way, so the table does not grow forever
+    db.execute(delete(DBFeedbackSuggestionCacheEntry)
+               .where(DBFeedbackSuggestionCacheEntry.module_name == module_name)
+               .where(DBFeedbackSuggestionCacheEntry.expires_at <= now))
+    bulk_upsert(db, DBFeedbackSuggestionCacheEntry, [{
+        "key": key,
+        "module_name": module_name,
+        "lms_url": lms_url,
+        "exercise_id": exercise_id,
+        "submission_id": submission_id,
+        "feedback_type": feedbacks[0].__class__.__name__ if feedbacks else None,
+        "feedback_ids": [feedback.id for feedback in feedbacks],
+        "created_at": now,
+        "expires_at": expires_at,
+    }])
+    db.commit()
+
+
+def _invalidate_cached_feedback_suggestions(db: Session, module_name: str, lms_url: str,
+                                            exercise_id: Optional[int], submission_id: Optional[int]) -> int:
+    statement = delete(DBFeedbackSuggestionCacheEntry) \
+        .where(DBFeedbackSuggestionCacheEntry.module_name == module_name) \
+        .where(DBFeedbackSuggestionCacheEntry.lms_url == lms_url)
+    if exercise_id is not None:
+        statement = statement.where(DBFeedbackSuggestionCacheEntry.exercise_id == exercise_id)
+    if submission_id is not None:
+        statement = statement.where(DBFeedbackSuggestionCacheEntry.submission_id == submission_id)
+    result = db.execute(statement)
+    db.commit()
+    return result.rowcount
+
+
+def get_cached_feedback_suggestions(key: str) -> Optional[List[Feedback]]:
+    """Returns the cached feedback suggestions for the request key, or None if there are none or they expired."""
+    with get_db() as db:
+        return _get_cached_feedback_suggestions(db, key, datetime.utcnow())
+
+
+async def aget_cached_feedback_suggestions(key: str) -> Optional[List[Feedback]]:
+    """Async variant of get_cached_feedback_suggestions."""
+    async with get_async_db() as db:
+        return await db.run_sync(_get_cached_feedback_suggestions, key, datetime.utcnow())
+
+
+def store_cached_feedback_suggestions(key: str, exercise_id: int, submission_id: int, feedbacks: List[Feedback],
+                                      ttl: Optional[float] = None, lms_url: Optional[str] = None):
+    """Caches the stored feedback suggestions (with their internal IDs assigned) for the request key.
+
+    Args:
+        key (str): Hash of the request, see athena.single_flight.request_key.
+        exercise_id (int): The exercise of the request, to invalidate the entry later.
+        submission_id (int): The submission of the request, to invalidate the entry later.
+        feedbacks (List[Feedback]): The stored feedback suggestions.
+        ttl (float, optional): Seconds until the entry expires, None or 0 to keep it until it is invalidated.
+        lms_url (str, optional): The URL of the LMS instance that issued the query
+    """
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl) if ttl else None
+    with get_db() as db:
+        _store_cached_feedback_suggestions(db, key, get_module_config().name, lms_url, exercise_id, submission_id,
+                                           feedbacks, now, expires_at)
+
+
+async def astore_cached_feedback_suggestions(key: str, exercise_id: int, submission_id: int, feedbacks: List[Feedback],
+                                             ttl: Optional[float] = None, lms_url: Optional[str] = None):
+    """Async variant of store_cached_feedback_suggestions."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl) if ttl else None
+    async with get_async_db() as db:
+        await db.run_sync(_store_cached_feedback_suggestions, key, get_module_config().name, lms_url, exercise_id,
+                          submission_id, feedbacks, now, expires_at)
+
+
+def invalidate_cached_feedback_suggestions(exercise_id: Optional[int] = None, submission_id: Optional[int] = None,
+                                           lms_url: Optional[str] = None) -> int:
+    """Removes the cached feedback suggestions of this module for the exercise and/or submission (all if both are None).
+
+    Returns:
+        int: The number of removed cache entries.
+    """
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    with get_db() as db:
+        return _invalidate_cached_feedback_suggestions(db, get_module_config().name, lms_url, exercise_id, submission_id)
+
+
+async def ainvalidate_cached_feedback_suggestions(exercise_id: Optional[int] = None,
+                                                  submission_id: Optional[int] = None,
+                                                  lms_url: Optional[str] = None) -> int:
+    """Async variant of invalidate_cached_feedback_suggestions."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        return await db.run_sync(_invalidate_cached_feedback_suggestions, get_module_config().name, lms_url,
+                                 exercise_id, submission_id)
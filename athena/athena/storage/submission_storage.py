@@ -1,8 +1,42 @@
 from typing import List, Iterable, Union, Type, Optional
 
+from sqlalchemy.orm import Session
+
 from athena.contextvars import get_lms_url
-from athena.database import get_db
+from athena.database import get_db, get_async_db
 from athena.schemas import Submission
+from athena.storage.bulk_upsert import bulk_upsert, to_row
+
+
+def _count_stored_submissions(db: Session, submission_cls: Type[Submission], exercise_id: int, lms_url: str) -> int:
+    db_submission_cls = submission_cls.get_model_class()
+    return db.query(db_submission_cls).filter_by(exercise_id=exercise_id,
+                                                 lms_url=lms_url).count()  # type: ignore
+
+
+def _get_stored_submissions(db: Session, submission_cls: Type[Submission], exercise_id: int,
+                            only_ids: Union[List[int], None], lms_url: str) -> List[Submission]:
+    db_submission_cls = submission_cls.get_model_class()
+    query = db.query(db_submission_cls).filter_by(exercise_id=exercise_id, lms_url=lms_url)
+    if only_ids is not None:
+        query = query.filter(db_submission_cls.id.in_(only_ids))  # type: ignore
+    return [s.to_schema() for s in query.all()]
+
+
+def _get_stored_submission_meta(db: Session, submission: Submission, lms_url: str) -> Optional[dict]:
+    db_submission_cls = submission.__class__.get_model_class()
+    return db.query(db_submission_cls.meta).filter_by(id=submission.id,  # type: ignore
+                                                      lms_url=lms_url).scalar()
+
+
+def _store_submissions(db: Session, submissions: List[Submission], lms_url: str):
+    if not submissions:
+        return
+
+    db_submission_cls = submissions[0].__class__.get_model_class()
+    rows = [to_row(db_submission_cls, {**s.dict(), "lms_url": lms_url}) for s in submissions]
+    bulk_upsert(db, db_submission_cls, rows)
+    db.commit()
 
 
 def count_stored_submissions(
@@ -13,10 +47,20 @@ def count_stored_submissions(
     if lms_url is None:
         lms_url = get_lms_url()
 
-    db_submission_cls = submission_cls.get_model_class()
     with get_db() as db:
-        return db.query(db_submission_cls).filter_by(exercise_id=exercise_id,
-                                                     lms_url=lms_url).count()  # type: ignore
+        return _count_stored_submissions(db, submission_cls, exercise_id, lms_url)
+
+
+async def acount_stored_submissions(
+        submission_cls: Type[Submission], exercise_id: int, lms_url: Optional[str] = None
+) -> int:
+    """Async variant of count_stored_submissions."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        return await db.run_sync(_count_stored_submissions, submission_cls, exercise_id, lms_url)
 
 
 def get_stored_submissions(
@@ -31,12 +75,21 @@ def get_stored_submissions(
     if lms_url is None:
         lms_url = get_lms_url()
 
-    db_submission_cls = submission_cls.get_model_class()
     with get_db() as db:
-        query = db.query(db_submission_cls).filter_by(exercise_id=exercise_id, lms_url=lms_url)
-        if only_ids is not None:
-            query = query.filter(db_submission_cls.id.in_(only_ids))  # type: ignore
-        return (s.to_schema() for s in query.all())
+        return iter(_get_stored_submissions(db, submission_cls, exercise_id, only_ids, lms_url))
+
+
+async def aget_stored_submissions(
+        submission_cls: Type[Submission], exercise_id: int, only_ids: Union[List[int], None] = None,
+        lms_url: Optional[str] = None
+) -> List[Submission]:
+    """Async variant of get_stored_submissions."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        return await db.run_sync(_get_stored_submissions, submission_cls, exercise_id, only_ids, lms_url)
 
 
 def get_stored_submission_meta(submission: Submission, lms_url: Optional[str] = None) -> Optional[dict]:
@@ -45,10 +98,18 @@ def get_stored_submission_meta(submission: Submission, lms_url: Optional[str] =
     if lms_url is None:
         lms_url = get_lms_url()
 
-    db_submission_cls = submission.__class__.get_model_class()
     with get_db() as db:
-        return db.query(db_submission_cls.meta).filter_by(id=submission.id,  # type: ignore
-                                                          lms_url=lms_url).scalar()
+        return _get_stored_submission_meta(db, submission, lms_url)
+
+
+async def aget_stored_submission_meta(submission: Submission, lms_url: Optional[str] = None) -> Optional[dict]:
+    """Async variant of get_stored_submission_meta."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        return await db.run_sync(_get_stored_submission_meta, submission, lms_url)
 
 
 def store_submissions(submissions: List[Submission], lms_url: Optional[str] = None):
@@ -58,13 +119,24 @@ def store_submissions(submissions: List[Submission], lms_url: Optional[str] = No
         lms_url = get_lms_url()
 
     with get_db() as db:
-        for s in submissions:
-            submission_model = s.to_model()
-            submission_model.lms_url = lms_url
-            db.merge(submission_model)
-        db.commit()
+        _store_submissions(db, submissions, lms_url)
+
+
+async def astore_submissions(submissions: List[Submission], lms_url: Optional[str] = None):
+    """Async variant of store_submissions."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    async with get_async_db() as db:
+        await db.run_sync(_store_submissions, submissions, lms_url)
 
 
 def store_submission(submission: Submission, lms_url: Optional[str] = None):
     """Stores the given submission."""
     store_submissions([submission], lms_url)
+
+
+async def astore_submission(submission: Submission, lms_url: Optional[str] = None):
+    """Async variant of store_submission."""
+    await astore_submissions([submission], lms_url)
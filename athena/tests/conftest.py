@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# athena reads module.conf from the working directory and the environment when it is imported
+_module_dir = tempfile.mkdtemp(prefix="athena-tests-")
+with open(os.path.join(_module_dir, "module.conf"), "w", encoding="utf-8") as module_conf:
+    module_conf.write("[module]\nname = module_test\ntype = programming\nport = 5999\n")
+os.chdir(_module_dir)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_module_dir}/data/data.sqlite")
+os.environ.setdefault("REPOSITORY_CACHE_DIR", os.path.join(_module_dir, "repository_cache"))
@@ -0,0 +1,54 @@
+from athena.database import Base, engine, get_db
+from athena.models import DBProgrammingFeedback
+from athena.programming import Feedback
+from athena.storage import store_feedback_suggestions
+from athena.storage.bulk_upsert import bulk_upsert, to_row
+
+LMS_URL = "https://lms.example.com"
+
+
+def make_feedback(title: str, feedback_id=None) -> Feedback:
+    return Feedback(id=feedback_id, exercise_id=1, submission_id=2, title=title, description=f"{title} description",
+                    credits=1.0, meta={})
+
+
+def get_stored_titles() -> dict:
+    with get_db() as db:
+        return dict(db.query(DBProgrammingFeedback.id, DBProgrammingFeedback.title).all())
+
+
+def test_store_new_and_existing_suggestions():
+    Base.metadata.create_all(engine)
+    first, second = store_feedback_suggestions([make_feedback("first"), make_feedback("second")], LMS_URL)
+    assert first.id is not None and second.id is not None and first.id != second.id
+
+    # new and existing suggestions mixed, the IDs of the new ones have to be assigned in the right order
+    stored = store_feedback_suggestions([
+        make_feedback("new 1"),
+        make_feedback("second updated", second.id),
+        make_feedback("new 2"),
+        make_feedback("first updated", first.id),
+        make_feedback("new 3"),
+    ], LMS_URL)
+
+    assert [feedback.id for feedback in stored][1::2] == [second.id, first.id]
+    assert len({feedback.id for feedback in stored}) == 5
+    stored_titles = get_stored_titles()
+    for feedback in stored:
+        assert stored_titles[feedback.id] == feedback.title
+
+
+def test_bulk_upsert_with_a_duplicate_primary_key():
+    Base.metadata.create_all(engine)
+    (feedback,) = store_feedback_suggestions([make_feedback("original")], LMS_URL)
+
+    rows = [
+        to_row(DBProgrammingFeedback, {**make_feedback(title, feedback.id).dict(), "is_suggestion": True,
+                                       "lms_url": LMS_URL})
+        for title in ("first update", "last update")
+    ]
+    with get_db() as db:
+        bulk_upsert(db, DBProgrammingFeedback, rows)
+        db.commit()
+
+    assert get_stored_titles()[feedback.id] == "last update"  # like merge, the last row wins
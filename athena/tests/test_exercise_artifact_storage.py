@@ -0,0 +1,16 @@
+from athena.database import Base, engine
+from athena.storage import get_stored_exercise_artifact, store_exercise_artifact
+
+LMS_URL = "https://lms.example.com"
+
+
+def test_artifacts_are_stored_per_exercise_name_and_lms():
+    Base.metadata.create_all(engine)
+    store_exercise_artifact(1, "precomputed_artifacts", {"tokens": 10}, LMS_URL)
+    store_exercise_artifact(1, "split_result:abc", {"items": []}, LMS_URL)
+    store_exercise_artifact(1, "precomputed_artifacts", {"tokens": 12}, LMS_URL)
+
+    assert get_stored_exercise_artifact(1, "precomputed_artifacts", LMS_URL) == {"tokens": 12}
+    assert get_stored_exercise_artifact(1, "split_result:abc", LMS_URL) == {"items": []}
+    assert get_stored_exercise_artifact(2, "precomputed_artifacts", LMS_URL) is None
+    assert get_stored_exercise_artifact(1, "precomputed_artifacts", "https://other-lms.example.com") is None
@@ -0,0 +1,44 @@
+import asyncio
+import contextvars
+
+from athena import contextvars as athena_contextvars
+from athena.database import Base, engine, get_db
+from athena.jobs import job_queue, worker
+from athena.jobs.job_queue import DatabaseJobQueue
+from athena.models import DBJob
+from athena.schemas import JobStatus
+
+
+def test_job_runs_with_the_repository_secret_in_a_fresh_process():
+    Base.metadata.create_all(engine)
+    job_queue.set_job_queue(DatabaseJobQueue())
+    secrets = []
+
+    def handler(payload: dict):
+        secrets.append(athena_contextvars.get_repository_authorization_secret_context_var())
+    worker.register_job_handler("test_repository_job", handler)
+
+    async def enqueue():
+        # like an authenticated request of the LMS
+        athena_contextvars.set_lms_url_context_var("https://lms.example.com")
+        athena_contextvars.set_repository_authorization_secret_context_var("lms-secret")
+        return await worker.enqueue_job("test_repository_job", {"exercise_id": 1})
+
+    job = contextvars.Context().run(asyncio.run, enqueue())
+
+    # restart (or another replica): nothing is left in memory, only the job in the database
+    athena_contextvars._repository_authorization_secrets.clear()  # pylint: disable=protected-access
+    job_queue.set_job_queue(DatabaseJobQueue())
+
+    async def run_job():
+        claimed_job = await job_queue.get_job_queue().claim("test_repository_job")
+        assert claimed_job is not None
+        await worker.JobWorkerPool()._run(claimed_job)  # pylint: disable=protected-access
+
+    contextvars.Context().run(asyncio.run, run_job())
+
+    assert secrets == ["lms-secret"]
+    with get_db() as db:
+        db_job = db.query(DBJob).filter_by(id=job.id).one()
+        assert db_job.status == JobStatus.succeeded
+        assert db_job.context == {}  # the secret is not kept once the job finished
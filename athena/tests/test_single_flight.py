@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from athena.metadata import emit_meta
+from athena.single_flight import SingleFlight
+
+
+def test_identical_concurrent_requests_share_one_computation():
+    single_flight: SingleFlight[str] = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        emit_meta("model", "gpt-4o")
+        return "suggestions"
+
+    async def scenario():
+        return await asyncio.gather(*[single_flight.run("key", compute) for _ in range(3)])
+
+    results = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert results == [
+        ("suggestions", {"model": "gpt-4o"}, False),
+        ("suggestions", {"model": "gpt-4o"}, True),
+        ("suggestions", {"model": "gpt-4o"}, True),
+    ]
+
+
+def test_exception_reaches_the_waiting_callers_if_the_first_caller_is_cancelled():
+    single_flight: SingleFlight[str] = SingleFlight()
+    started = []
+
+    async def compute():
+        started.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("The module failed")
+
+    async def scenario():
+        first = asyncio.ensure_future(single_flight.run("key", compute))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(single_flight.run("key", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        # The computation continues for the second caller, which gets its exception
+        with pytest.raises(ValueError, match="The module failed"):
+            await second
+        # Failures are not shared with later requests
+        with pytest.raises(ValueError):
+            await single_flight.run("key", compute)
+
+    asyncio.run(scenario())
+
+    assert len(started) == 2
+
+
+def test_invalidate_by_labels():
+    single_flight: SingleFlight[str] = SingleFlight(cache_ttl=60)
+
+    async def scenario():
+        for submission_id in (1, 2):
+            await single_flight.run(f"key-{submission_id}", lambda: asyncio.sleep(0, result="suggestions"),
+                                    {"exercise_id": 1, "submission_id": submission_id})
+        single_flight.invalidate(exercise_id=1, submission_id=1)
+        return [(await single_flight.run(f"key-{submission_id}", lambda: asyncio.sleep(0, result="new")))[0]
+                for submission_id in (1, 2)]
+
+    assert asyncio.run(scenario()) == ["new", "suggestions"]
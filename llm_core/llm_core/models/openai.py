@@ -1,8 +1,15 @@
+import asyncio
+import json
 import os
+import tempfile
+import threading
+import time
 import openai
 import requests
+import httpx
 
-from typing import Dict, List
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 from enum import Enum
 from pydantic import Field, validator, PositiveInt
 from langchain.base_language import BaseLanguageModel
@@ -10,7 +17,6 @@ from langchain_openai import AzureChatOpenAI, ChatOpenAI
 
 from athena.logger import logger
 from .model_config import ModelConfig
-from .callbacks import UsageHandler
 
 
 OPENAI_PREFIX = "openai_"
@@ -20,34 +26,198 @@ azure_openai_available = bool(os.environ.get("AZURE_OPENAI_API_KEY"))
 
 available_models: Dict[str, BaseLanguageModel] = {}
 
-# Load Non-Azure OpenAI models
-if openai_available:
+# Configured model instances, keyed by event loop, model name and sampling parameters, so that requests share them
+MODEL_POOL_MAX_SIZE = int(os.environ.get("LLM_MODEL_POOL_MAX_SIZE", "64"))
+_model_pool: "OrderedDict[Tuple[Any, ...], BaseLanguageModel]" = OrderedDict()
+# One HTTP client (connection pool) per provider endpoint, shared by all model instances, closed on shutdown.
+# Async clients can only be used on the event loop they were first used on, so there is one per endpoint and event loop
+# (e.g. the job workers run their own event loops).
+_http_clients: Dict[str, httpx.Client] = {}
+_http_async_clients: Dict[Tuple[str, Optional[asyncio.AbstractEventLoop]], httpx.AsyncClient] = {}
+# Fields of the base models that hold their clients, pooled models create their own on top of the shared HTTP client
+_CLIENT_FIELDS = ("client", "async_client", "root_client", "root_async_client", "http_client", "http_async_client")
+
+
+def get_http_client(endpoint: str) -> httpx.Client:
+    """Return the shared HTTP client for the provider endpoint (keeps connections alive between requests)."""
+    client = _http_clients.get(endpoint)
+    if client is None or client.is_closed:
+        client = openai.DefaultHttpxClient()
+        _http_clients[endpoint] = client
+    return client
+
+
+def _get_running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _forget_closed_loops():
+    """Drop the async clients (and the pooled models using them) of event loops that are closed."""
+    for key in [key for key in _http_async_clients if key[1] is not None and key[1].is_closed()]:
+        del _http_async_clients[key]
+    for key in [key for key in _model_pool if key[0] is not None and key[0].is_closed()]:
+        del _model_pool[key]
+
+
+def get_http_async_client(endpoint: str) -> httpx.AsyncClient:
+    """Return the shared async HTTP client for the provider endpoint on the running event loop (keeps connections alive
+    between requests)."""
+    _forget_closed_loops()
+    key = (endpoint, _get_running_loop())
+    client = _http_async_clients.get(key)
+    if client is None or client.is_closed:
+        client = openai.DefaultAsyncHttpxClient()
+        _http_async_clients[key] = client
+    return client
+
+
+async def close_http_clients():
+    """Close the shared HTTP clients of the providers, called by athena when the module shuts down.
+
+    Async clients of other event loops cannot be closed from this one, they are only dropped.
+    """
+    loop = _get_running_loop()
+    for client in _http_clients.values():
+        client.close()
+    for (_, client_loop), async_client in _http_async_clients.items():
+        if client_loop is None or client_loop is loop:
+            await async_client.aclose()
+    _http_clients.clear()
+    _http_async_clients.clear()
+    _model_pool.clear()  # their clients are closed
+
+
+def _get_endpoint(model: BaseLanguageModel) -> str:
+    return getattr(model, "azure_endpoint", None) or getattr(model, "openai_api_base", None) or "openai"
+
+
+# Discovering the models calls the providers, so the result is cached in a file and refreshed in the background after
+# the TTL.
+# A static list of models (LLM_AVAILABLE_MODELS) skips the discovery altogether, e.g. to run against a local stand-in.
+MODELS_CACHE_FILE = os.environ.get("LLM_MODELS_CACHE_FILE", "../data/llm_models.json")
+MODELS_CACHE_TTL = float(os.environ.get("LLM_MODELS_CACHE_TTL", "86400"))
+
+
+def _discover_openai_models() -> List[str]:
     openai.api_type = "openai"
-    for model in openai.models.list():
-        if "gpt" in model.id:
-            available_models[OPENAI_PREFIX + model.id] = ChatOpenAI(model=model.id)
-
-# Load Azure OpenAI models
-if azure_openai_available:
-    def _get_azure_openai_deployments() -> List[str]:
-        # If this breaks in the future we have to use azure-mgmt-cognitiveservices which needs 6 additional environment variables
-        base_url = f"{os.environ.get('AZURE_OPENAI_ENDPOINT')}/openai"
-        headers = {
-            "api-key": os.environ["AZURE_OPENAI_API_KEY"]
-        }
-
-        models_response = requests.get(f"{base_url}/models?api-version=2023-03-15-preview", headers=headers, timeout=30)
-        models_data = models_response.json()["data"]
-        deployments_response = requests.get(f"{base_url}/deployments?api-version=2023-03-15-preview", headers=headers,
-                                            timeout=30)
-        deployments_data = deployments_response.json()["data"]
-
-        # Check if deployment["model"] is a substring of model["id"], i.e. "gpt-4o" is substring "gpt-4o-2024-05-13"
-        chat_completion_models = ",".join(model["id"] for model in models_data if model["capabilities"]["chat_completion"])
-        return [deployment["id"] for deployment in deployments_data if deployment["model"] in chat_completion_models]
-
-    for deployment in _get_azure_openai_deployments():
-        available_models[AZURE_OPENAI_PREFIX + deployment] = AzureChatOpenAI(azure_deployment=deployment)
+    return [OPENAI_PREFIX + model.id for model in openai.models.list() if "gpt" in model.id]
+
+
+def _discover_azure_openai_models() -> List[str]:
+    # If this breaks in the future we have to use azure-mgmt-cognitiveservices which needs 6 additional environment variables
+    base_url = f"{os.environ.get('AZURE_OPENAI_ENDPOINT')}/openai"
+    headers = {
+        "api-key": os.environ["AZURE_OPENAI_API_KEY"]
+    }
+
+    models_response = requests.get(f"{base_url}/models?api-version=2023-03-15-preview", headers=headers, timeout=30)
+    models_data = models_response.json()["data"]
+    deployments_response = requests.get(f"{base_url}/deployments?api-version=2023-03-15-preview", headers=headers,
+                                        timeout=30)
+    deployments_data = deployments_response.json()["data"]
+
+    # Check if deployment["model"] is a substring of model["id"], i.e. "gpt-4o" is substring "gpt-4o-2024-05-13"
+    chat_completion_models = ",".join(model["id"] for model in models_data if model["capabilities"]["chat_completion"])
+    return [AZURE_OPENAI_PREFIX + deployment["id"] for deployment in deployments_data
+            if deployment["model"] in chat_completion_models]
+
+
+def _get_providers() -> Dict[str, Optional[str]]:
+    """The configured providers, the cache is only valid for the providers it was discovered with."""
+    return {
+        "openai": os.environ.get("OPENAI_BASE_URL", "default") if openai_available else None,
+        "azure_openai": os.environ.get("AZURE_OPENAI_ENDPOINT") if azure_openai_available else None,
+    }
+
+
+def _read_models_cache() -> Optional[Tuple[float, List[str]]]:
+    try:
+        with open(MODELS_CACHE_FILE, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get("providers") != _get_providers():
+        return None
+    return cache["discovered_at"], cache["models"]
+
+
+def _write_models_cache(model_names: List[str]):
+    cache = {"providers": _get_providers(), "discovered_at": time.time(), "models": model_names}
+    try:
+        cache_dir = os.path.dirname(os.path.abspath(MODELS_CACHE_FILE))
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, MODELS_CACHE_FILE)
+    except OSError:
+        logger.warning("Could not write the model cache %s", MODELS_CACHE_FILE, exc_info=True)
+
+
+_background_refresh: Optional[threading.Thread] = None
+
+
+def _refresh_in_background():
+    """Discover the models in a thread and update the cache file, for the next start of the module."""
+    global _background_refresh  # pylint: disable=global-statement
+    if _background_refresh is not None and _background_refresh.is_alive():
+        return
+    _background_refresh = threading.Thread(target=discover_model_names, kwargs={"refresh": True},
+                                           name="llm-model-discovery", daemon=True)
+    _background_refresh.start()
+
+
+def discover_model_names(refresh: bool = False) -> List[str]:
+    """Names of the available models (with provider prefix).
+
+    Taken from LLM_AVAILABLE_MODELS if set, otherwise from the cache file. The providers are only called (blocking)
+    if there is no cache at all. An outdated cache is used right away and refreshed in the background, so that newly
+    discovered models are available after the next start. If the discovery fails, the outdated cache is kept.
+
+    Args:
+        refresh (bool): Discover the models (blocking) even if there is a cache
+    """
+    static_models = os.environ.get("LLM_AVAILABLE_MODELS")
+    if static_models:
+        return [name.strip() for name in static_models.split(",") if name.strip()]
+
+    cached = _read_models_cache()
+    if cached is not None and not refresh:
+        if time.time() - cached[0] >= MODELS_CACHE_TTL:
+            _refresh_in_background()
+        return cached[1]
+
+    try:
+        model_names = []
+        if openai_available:
+            model_names += _discover_openai_models()
+        if azure_openai_available:
+            model_names += _discover_azure_openai_models()
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Could not discover the available models")
+        return cached[1] if cached is not None else []
+
+    _write_models_cache(model_names)
+    return model_names
+
+
+def _create_model(model_name: str) -> Optional[BaseLanguageModel]:
+    if model_name.startswith(AZURE_OPENAI_PREFIX):
+        return AzureChatOpenAI(azure_deployment=model_name[len(AZURE_OPENAI_PREFIX):])
+    if model_name.startswith(OPENAI_PREFIX):
+        return ChatOpenAI(model=model_name[len(OPENAI_PREFIX):])
+    logger.warning("Unknown model %s, model names have to start with %s or %s",
+                   model_name, OPENAI_PREFIX, AZURE_OPENAI_PREFIX)
+    return None
+
+
+for _model_name in discover_model_names():
+    _model = _create_model(_model_name)
+    if _model is not None:
+        available_models[_model_name] = _model
 
 if available_models:
     logger.info("Available openai models: %s", ", ".join(available_models.keys()))
@@ -114,16 +284,29 @@ decreasing the model's likelihood to repeat the same line verbatim.
         def get_model(self) -> BaseLanguageModel:
             """Get the model from the configuration.
 
+            Models are pooled by their configuration, so the same instance (and its connections) is returned for
+            equal configurations. Track the usage with callbacks in the run config, not on the model.
+
             Returns:
                 BaseLanguageModel: The model.
             """
+            config = self.dict()
+            _forget_closed_loops()
+            # The async client of the model is bound to the event loop
+            key = (_get_running_loop(), self.model_name.value,
+                   tuple(sorted((attr, repr(value)) for attr, value in config.items() if attr != "model_name")))
+            model = _model_pool.get(key)
+            if model is not None:
+                _model_pool.move_to_end(key)
+                return model
+
             model = available_models[self.model_name.value]
-            kwargs = model.__dict__
+            kwargs = {attr: value for attr, value in model.__dict__.items() if attr not in _CLIENT_FIELDS}
             secrets = {secret: getattr(model, secret) for secret in model.lc_secrets.keys()}
             kwargs.update(secrets)
 
-            model_kwargs = kwargs.get("model_kwargs", {})
-            for attr, value in self.dict().items():
+            model_kwargs = dict(kwargs.get("model_kwargs", {}))
+            for attr, value in config.items():
                 if attr == "model_name":
                     # Skip model_name
                     continue
@@ -134,10 +317,14 @@ decreasing the model's likelihood to repeat the same line verbatim.
                     # Otherwise, add it to model_kwargs (necessary for chat models)
                     model_kwargs[attr] = value
             kwargs["model_kwargs"] = model_kwargs
-            kwargs["callbacks"] = [UsageHandler()]
+            kwargs["http_client"] = get_http_client(_get_endpoint(model))
+            kwargs["http_async_client"] = get_http_async_client(_get_endpoint(model))
 
             # Initialize a copy of the model using the config
             model = model.__class__(**kwargs)
+            _model_pool[key] = model
+            while len(_model_pool) > MODEL_POOL_MAX_SIZE:
+                _model_pool.popitem(last=False)
             return model
 
 
@@ -0,0 +1,102 @@
+"""
+In-process fake of the Batch API of OpenAI, for tests and local runs without a provider (LLM_BATCH_BACKEND="fake").
+
+It implements the parts of the async OpenAI client that the batch execution uses (files.create, files.content,
+batches.create, batches.retrieve). Batches complete after completion_delay seconds, and the content of every response
+comes from the responder, which gets the body of the chat completion request.
+
+Example:
+    >>> set_fake_batch_client(FakeBatchClient(responder=lambda body: json.dumps({"feedbacks": []})))
+"""
+import json
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, Optional
+
+
+class _FakeFiles:
+    def __init__(self, client: "FakeBatchClient"):
+        self._client = client
+
+    async def create(self, file, purpose: str) -> SimpleNamespace:
+        content = Path(file).read_text(encoding="utf-8") if not isinstance(file, bytes) else file.decode("utf-8")
+        file_id = f"file-{uuid.uuid4().hex}"
+        self._client.files_content[file_id] = content
+        return SimpleNamespace(id=file_id, purpose=purpose)
+
+    async def content(self, file_id: str) -> SimpleNamespace:
+        return SimpleNamespace(text=self._client.files_content[file_id])
+
+
+class _FakeBatches:
+    def __init__(self, client: "FakeBatchClient"):
+        self._client = client
+
+    async def create(self, input_file_id: str, endpoint: str, completion_window: str,
+                     metadata: Optional[dict] = None) -> SimpleNamespace:
+        batch = SimpleNamespace(id=f"batch-{uuid.uuid4().hex}", status="in_progress", input_file_id=input_file_id,
+                                endpoint=endpoint, completion_window=completion_window, metadata=metadata,
+                                created_at=time.time(), output_file_id=None, error_file_id=None)
+        self._client.stored_batches[batch.id] = batch
+        return batch
+
+    async def retrieve(self, batch_id: str) -> SimpleNamespace:
+        batch = self._client.stored_batches[batch_id]
+        if batch.status == "in_progress" and time.time() - batch.created_at >= self._client.completion_delay:
+            self._client.complete(batch)
+        return batch
+
+
+class FakeBatchClient:
+    """
+    Fake of the Batch API of OpenAI.
+
+    Args:
+        responder: Returns the content of the response for the body of a chat completion request,
+            or raises an exception to make the call fail. Responds with an empty JSON object by default.
+        completion_delay: Seconds until a batch is completed.
+    """
+
+    def __init__(self, responder: Optional[Callable[[dict], str]] = None, completion_delay: float = 0):
+        self.responder = responder or (lambda body: "{}")
+        self.completion_delay = completion_delay
+        self.files_content: Dict[str, str] = {}
+        self.stored_batches: Dict[str, SimpleNamespace] = {}
+        self.files = _FakeFiles(self)
+        self.batches = _FakeBatches(self)
+
+    def complete(self, batch: SimpleNamespace):
+        """Answer all calls of the batch with the responder."""
+        output_lines, error_lines = [], []
+        for line in self.files_content[batch.input_file_id].splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            try:
+                content = self.responder(request["body"])
+            except Exception as exc:  # pylint: disable=broad-except
+                error_lines.append({"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request["custom_id"],
+                                    "response": None, "error": {"code": "fake_error", "message": str(exc)}})
+                continue
+            output_lines.append({
+                "id": f"batch_req_{uuid.uuid4().hex}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "model": request["body"].get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }},
+                "error": None,
+            })
+
+        for attribute, lines in (("output_file_id", output_lines), ("error_file_id", error_lines)):
+            if lines:
+                file_id = f"file-{uuid.uuid4().hex}"
+                self.files_content[file_id] = "".join(json.dumps(line) + "\n" for line in lines)
+                setattr(batch, attribute, file_id)
+        batch.status = "completed"
@@ -0,0 +1,324 @@
+"""
+Execution of LLM calls with the Batch API of OpenAI / Azure OpenAI.
+
+Pre-computing suggestions for a whole exercise is not latency sensitive. Batch calls cost half as much and do not count
+against the rate limits of the interactive calls, but take up to 24 hours. predict_and_parse calls that are tagged as
+batch work are collected per model for LLM_BATCH_WINDOW_SECONDS (or until LLM_BATCH_MAX_REQUESTS are pending), written
+to a JSONL file and submitted as one batch. The batch is polled every LLM_BATCH_POLL_INTERVAL seconds, and once it is
+done, the results are handed back to the waiting calls.
+
+Submitted batches survive a restart of the module: the ID of every running batch is stored next to its input file in
+LLM_BATCH_DIR, together with the custom IDs of its calls. A custom ID is the hash of the request body, so when the job
+is retried after the restart and makes the same calls again, they wait for the running batch instead of being
+submitted (and paid for) a second time. The running batches of a model are resumed on its first batch call.
+
+Only calls of durable background jobs run as batch work by default, never calls of a request that a client waits for.
+
+Configured with environment variables:
+    LLM_BATCH_BACKGROUND=0  # 1 = run the calls of background jobs as batch work
+    LLM_BATCH_BACKEND="openai"  # "openai" (the client of the model, OpenAI or Azure) or "fake" (FakeBatchClient)
+    LLM_BATCH_WINDOW_SECONDS=30
+    LLM_BATCH_MAX_REQUESTS=1000
+    LLM_BATCH_POLL_INTERVAL=60
+    LLM_BATCH_DIR="../data/llm_batches"  # the input files and IDs of running batches, to resume them after a restart
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import openai
+from langchain_community.adapters.openai import convert_message_to_dict
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from athena import emit_meta, get_meta
+from athena.contextvars import get_is_background
+from athena.logger import logger
+from llm_core.models.callbacks import UsageHandler
+from .llm_scheduler import get_model_name
+
+BATCH_BACKGROUND = os.environ.get("LLM_BATCH_BACKGROUND", "0") == "1"
+BATCH_WINDOW_SECONDS = float(os.environ.get("LLM_BATCH_WINDOW_SECONDS", "30"))
+BATCH_MAX_REQUESTS = int(os.environ.get("LLM_BATCH_MAX_REQUESTS", "1000"))
+BATCH_POLL_INTERVAL = float(os.environ.get("LLM_BATCH_POLL_INTERVAL", "60"))
+BATCH_DIR = os.environ.get("LLM_BATCH_DIR", "../data/llm_batches")
+
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchRequestError(Exception):
+    """A call of a batch has no (successful) result."""
+
+
+def _is_running_job() -> bool:
+    from athena.jobs import get_current_job_id  # pylint: disable=import-outside-toplevel
+    try:
+        get_current_job_id()
+    except LookupError:
+        return False
+    return True
+
+
+def is_batch_work() -> bool:
+    """Whether the calls of the current work run as batch work by default, only in durable background jobs."""
+    return BATCH_BACKGROUND and get_is_background() and _is_running_job()
+
+
+def get_custom_id(body: dict) -> str:
+    """ID of a call in a batch, identical calls have the same ID (and share the response)."""
+    serialized = json.dumps(body, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class BatchRequest:
+    custom_id: str
+    body: Optional[dict]  # None for the calls of a resumed batch
+    future: "asyncio.Future[dict]"
+    # False for the calls of a resumed batch until they are made again, their results are kept until then
+    claimed: bool = True
+
+
+def _get_client(model: BaseLanguageModel) -> Any:
+    """The async OpenAI (or Azure OpenAI) client of the model, it has the right endpoint and credentials."""
+    if os.environ.get("LLM_BATCH_BACKEND", "openai") == "fake":
+        return get_fake_batch_client()
+    client = getattr(model, "root_async_client", None)
+    return client if client is not None else openai.AsyncOpenAI()
+
+
+def _get_request_body(model: BaseLanguageModel, messages: List[BaseMessage]) -> dict:
+    """The chat completion request that the model would send for the messages (in JSON mode)."""
+    body = {key: value for key, value in dict(getattr(model, "_default_params", {})).items() if key != "stream"}
+    body["model"] = get_model_name(model)  # the deployment for Azure
+    body["messages"] = [convert_message_to_dict(message) for message in messages]
+    body["response_format"] = {"type": "json_object"}
+    return body
+
+
+class ModelBatchQueue:
+    """Collects the calls to one model (a batch may only contain a single model) and runs them as batches."""
+
+    def __init__(self, client: Any, model_name: str):
+        self.client = client
+        self.model_name = model_name
+        # Azure OpenAI has no version prefix in the URLs of the batch requests
+        self.url = "/chat/completions" if isinstance(client, openai.AsyncAzureOpenAI) else "/v1/chat/completions"
+        self._pending: List[BatchRequest] = []
+        # calls that are pending or in a running batch, by custom ID
+        self._requests: Dict[str, BatchRequest] = {}
+        self._full = asyncio.Event()
+        self._collector: Optional[asyncio.Task] = None
+        self._resumed = False
+        self._tasks: List[asyncio.Task] = []
+
+    def add(self, body: dict) -> "asyncio.Future[dict]":
+        """Add a call to the next batch, the future resolves to the chat completion response."""
+        if not self._resumed:
+            self._resumed = True
+            self._resume()
+
+        custom_id = get_custom_id(body)
+        request = self._requests.get(custom_id)
+        if request is not None:
+            # the same call is already pending or running, e.g. in a batch that was submitted before a restart
+            if not request.claimed:
+                request.claimed = True
+                if request.future.done():
+                    del self._requests[custom_id]
+            return request.future
+
+        request = BatchRequest(custom_id=custom_id, body=body, future=asyncio.get_running_loop().create_future())
+        self._requests[custom_id] = request
+        self._pending.append(request)
+        if len(self._pending) >= BATCH_MAX_REQUESTS:
+            self._full.set()
+        if self._collector is None:
+            self._collector = asyncio.create_task(self._collect())
+        return request.future
+
+    def _resume(self):
+        """Wait for the batches of the model that were submitted before the last restart."""
+        for state_path in Path(BATCH_DIR).glob("*.batch.json"):
+            try:
+                state = json.loads(state_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                logger.exception("Could not read the state of the batch in %s", state_path)
+                continue
+            if state["model_name"] != self.model_name:
+                continue
+            requests = []
+            for custom_id in state["custom_ids"]:
+                request = BatchRequest(custom_id=custom_id, body=None,
+                                       future=asyncio.get_running_loop().create_future(), claimed=False)
+                self._requests.setdefault(custom_id, request)
+                requests.append(request)
+            logger.info("Resuming batch %s with %d LLM calls", state["batch_id"], len(requests))
+            self._tasks.append(asyncio.create_task(self._wait_for_batch_safely(
+                state["batch_id"], requests, state_path, Path(state["input_path"]))))
+
+    async def _collect(self):
+        try:
+            await asyncio.wait_for(self._full.wait(), timeout=BATCH_WINDOW_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        requests = self._pending[:BATCH_MAX_REQUESTS]
+        self._pending = self._pending[BATCH_MAX_REQUESTS:]
+        self._full.clear()
+        # Calls that arrive from now on go into the next batch
+        self._collector = asyncio.create_task(self._collect()) if self._pending else None
+        if len(self._pending) >= BATCH_MAX_REQUESTS:
+            self._full.set()
+
+        try:
+            await self._run_batch(requests)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.exception("Could not run a batch of %d LLM calls", len(requests))
+            self._fail(requests, exc)
+
+    def _fail(self, requests: List[BatchRequest], exc: Exception):
+        for request in requests:
+            self._requests.pop(request.custom_id, None)
+            if not request.future.done():
+                request.future.set_exception(exc)
+
+    def _write_input_file(self, requests: List[BatchRequest]) -> Path:
+        os.makedirs(BATCH_DIR, exist_ok=True)
+        path = Path(BATCH_DIR) / f"{int(time.time())}-{uuid.uuid4().hex}.jsonl"
+        with open(path, "w", encoding="utf-8") as f:
+            for request in requests:
+                f.write(json.dumps({"custom_id": request.custom_id, "method": "POST", "url": self.url,
+                                    "body": request.body}) + "\n")
+        return path
+
+    def _write_state_file(self, batch_id: str, requests: List[BatchRequest], input_path: Path) -> Path:
+        path = Path(BATCH_DIR) / f"{batch_id}.batch.json"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({
+            "batch_id": batch_id,
+            "model_name": self.model_name,
+            "input_path": str(input_path),
+            "custom_ids": [request.custom_id for request in requests],
+        }), encoding="utf-8")
+        os.replace(tmp_path, path)
+        return path
+
+    async def _read_results(self, file_id: Optional[str]) -> Dict[str, dict]:
+        if not file_id:
+            return {}
+        content = await self.client.files.content(file_id)
+        results = {}
+        for line in content.text.splitlines():
+            if line.strip():
+                result = json.loads(line)
+                results[result["custom_id"]] = result
+        return results
+
+    async def _run_batch(self, requests: List[BatchRequest]):
+        input_path = await asyncio.to_thread(self._write_input_file, requests)
+        input_file = await self.client.files.create(file=input_path, purpose="batch")
+        batch = await self.client.batches.create(input_file_id=input_file.id, endpoint=self.url,
+                                                 completion_window="24h")
+        state_path = await asyncio.to_thread(self._write_state_file, batch.id, requests, input_path)
+        logger.info("Submitted batch %s with %d LLM calls", batch.id, len(requests))
+        await self._wait_for_batch(batch.id, requests, state_path, input_path)
+
+    async def _wait_for_batch_safely(self, batch_id: str, requests: List[BatchRequest], state_path: Path,
+                                     input_path: Path):
+        try:
+            await self._wait_for_batch(batch_id, requests, state_path, input_path)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.exception("Could not resume batch %s", batch_id)
+            self._fail(requests, exc)
+
+    async def _wait_for_batch(self, batch_id: str, requests: List[BatchRequest], state_path: Path,
+                              input_path: Path):
+        batch = await self.client.batches.retrieve(batch_id)
+        while batch.status not in TERMINAL_STATUSES:
+            await asyncio.sleep(BATCH_POLL_INTERVAL)
+            batch = await self.client.batches.retrieve(batch_id)
+        logger.info("Batch %s ended with status %s", batch.id, batch.status)
+
+        # Expired or cancelled batches can still have results for some of the calls
+        results = await self._read_results(batch.output_file_id)
+        results.update(await self._read_results(batch.error_file_id))
+        for request in requests:
+            if request.claimed:
+                self._requests.pop(request.custom_id, None)
+            # otherwise the result is kept until the call is made again (after the restart)
+            if request.future.done():
+                continue
+            result = results.get(request.custom_id)
+            response = (result or {}).get("response") or {}
+            if result is None:
+                request.future.set_exception(
+                    BatchRequestError(f"Batch {batch.id} ended with status {batch.status} without a result"))
+            elif result.get("error") or response.get("status_code") != 200:
+                request.future.set_exception(
+                    BatchRequestError(f"Call failed in batch {batch.id}: {result.get('error') or response.get('body')}"))
+            else:
+                request.future.set_result(response["body"])
+            if not request.claimed:
+                request.future.exception()  # mark it as retrieved, nobody might make the call again
+
+        state_path.unlink(missing_ok=True)
+        # The input is kept for failed batches only, to inspect them
+        if batch.status == "completed":
+            input_path.unlink(missing_ok=True)
+
+
+_queues: Dict[str, ModelBatchQueue] = {}
+
+
+def _record_usage(response: dict):
+    """Record the usage of a batch call in the metadata of the request, like for the other calls."""
+    usage = response.get("usage") or {}
+    message = AIMessage(content="", response_metadata={"model_name": response.get("model")}, usage_metadata={
+        "input_tokens": usage.get("prompt_tokens", 0),
+        "output_tokens": usage.get("completion_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0),
+    })
+    UsageHandler().on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+
+
+async def predict_in_batch(model: BaseLanguageModel, messages: List[BaseMessage]) -> str:
+    """Run a chat completion of the model as part of a batch and return the content of the response."""
+    model_name = get_model_name(model)
+    queue = _queues.get(model_name)
+    if queue is None:
+        queue = ModelBatchQueue(_get_client(model), model_name)
+        _queues[model_name] = queue
+
+    start = time.perf_counter()
+    # Identical calls share the future, so a cancelled caller must not cancel it
+    response = await asyncio.shield(queue.add(_get_request_body(model, messages)))
+    emit_meta("llmBatchRequests", get_meta().get("llmBatchRequests", 0) + 1)
+    emit_meta("llmBatchWaitMs", get_meta().get("llmBatchWaitMs", 0) + (time.perf_counter() - start) * 1000)
+    _record_usage(response)
+    return response["choices"][0]["message"]["content"]
+
+
+_fake_batch_client: Optional[Any] = None
+
+
+def get_fake_batch_client() -> Any:
+    """The in-process fake of the Batch API that is used with LLM_BATCH_BACKEND="fake"."""
+    global _fake_batch_client  # pylint: disable=global-statement
+    if _fake_batch_client is None:
+        from .fake_batch_client import FakeBatchClient  # pylint: disable=import-outside-toplevel
+        _fake_batch_client = FakeBatchClient()
+    return _fake_batch_client
+
+
+def set_fake_batch_client(client: Any):
+    """Use a custom fake of the Batch API, e.g. a FakeBatchClient with a responder for a test."""
+    global _fake_batch_client  # pylint: disable=global-statement
+    _fake_batch_client = client
+    _queues.clear()
@@ -0,0 +1,255 @@
+"""
+Cache of the LLM responses of predict_and_parse.
+
+Identical prompts recur often, e.g. the same problem statement split for every submission, student files that equal
+the template, or re-runs in the playground. The responses are cached by a hash of the model name, the model
+parameters, the fully formatted prompt and the JSON schema of the output, so any change to one of them is a miss.
+
+Responses are only cached for deterministic calls (temperature 0), unless the caller forces the cache.
+
+Configured with environment variables:
+    LLM_CACHE_BACKEND="none"  # "none" (default), "disk" or "database"
+    LLM_CACHE_DIR="../data/llm_cache"  # for the disk backend
+    LLM_CACHE_MAX_SIZE_MB=512  # the least recently used responses are evicted above this size
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, List, Optional, Type
+
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.messages import BaseMessage
+from langchain_core.pydantic_v1 import BaseModel
+from sqlalchemy import Column, Float, Integer, String, Text, delete, func, select
+from sqlalchemy.orm import Session
+
+from athena.database import Base, get_db
+from athena.logger import logger
+from athena.storage.bulk_upsert import bulk_upsert
+from .llm_scheduler import get_model_name
+
+DEFAULT_MAX_SIZE_MB = 512
+# The database cache evicts down to this fraction of the maximum size, so that it does not evict on every write
+DATABASE_EVICTION_TARGET = 0.9
+
+
+def get_model_params(model: BaseLanguageModel) -> dict:
+    """Parameters of the model that change its output (temperature, max_tokens, ...), without credentials."""
+    return dict(getattr(model, "_identifying_params", {}))
+
+
+def cache_key(model: BaseLanguageModel, messages: List[BaseMessage], pydantic_object: Type[BaseModel]) -> str:
+    """Hash of everything that determines the response of a call."""
+    serialized = json.dumps({
+        "model": get_model_name(model),
+        "params": get_model_params(model),
+        "messages": [[message.type, message.content] for message in messages],
+        "schema": pydantic_object.schema(),
+    }, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def is_deterministic(model: BaseLanguageModel) -> bool:
+    """Whether repeated calls are expected to give the same response, only then the cache is used by default."""
+    temperature: Any = getattr(model, "temperature", None)
+    return not temperature
+
+
+class LLMCache(ABC):
+    """Storage of the cached responses, serialized as JSON."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """Get the cached response for the key and mark it as recently used, None on a miss."""
+
+    @abstractmethod
+    async def set(self, key: str, model_name: str, value: str):
+        """Cache the response for the key, evicting the least recently used responses if the cache is full."""
+
+
+class DiskLLMCache(LLMCache):
+    """One file per response in a directory, the modification time of the files is used for LRU eviction."""
+
+    def __init__(self, cache_dir: str, max_size_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = max_size_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # estimated size of the directory, only recomputed (by listing it) when it seems to exceed the limit
+        self._size: Optional[int] = None
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            value = path.read_text()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return value
+
+    def _evict(self):
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # evicted by another process
+            entries.append((stat.st_mtime, stat.st_size, path))
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in sorted(entries, key=lambda entry: entry[0]):
+            if size <= self.max_size_bytes:
+                break
+            path.unlink(missing_ok=True)
+            size -= entry_size
+        self._size = size
+
+    def _set(self, key: str, value: str):
+        # Write to a temporary file first, so that concurrent processes never read partial responses
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            f.write(value)
+        os.replace(tmp_path, self._path(key))
+
+        if self._size is None:
+            self._evict()
+        else:
+            self._size += len(value.encode("utf-8"))
+            if self._size > self.max_size_bytes:
+                self._evict()
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, model_name: str, value: str):
+        await asyncio.to_thread(self._set, key, value)
+
+
+class DBLLMCacheEntry(Base):
+    __tablename__ = "llm_response_cache"
+
+    key = Column(String, primary_key=True)
+    model_name = Column(String, nullable=False)
+    value = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(Float, nullable=False)
+    last_used_at = Column(Float, nullable=False, index=True)
+
+
+class DatabaseLLMCache(LLMCache):
+    """Responses in the llm_response_cache table of the database, shared by all modules."""
+
+    def __init__(self, max_size_bytes: int):
+        self.max_size_bytes = max_size_bytes
+        # estimated size of the table, only recomputed when it seems to exceed the limit (other processes write to the
+        # table as well)
+        self._size: Optional[int] = None
+
+    def _get(self, key: str) -> Optional[str]:
+        with get_db() as db:
+            entry = db.get(DBLLMCacheEntry, key)
+            if entry is None:
+                return None
+            value = entry.value
+            entry.last_used_at = time.time()
+            db.commit()
+            return value
+
+    def _evict(self, db: Session):
+        size = db.query(func.sum(DBLLMCacheEntry.size)).scalar() or 0
+        if size > self.max_size_bytes:
+            # Delete the least recently used entries that make up the excess, in one statement
+            excess = size - int(self.max_size_bytes * DATABASE_EVICTION_TARGET)
+            entries = select(
+                DBLLMCacheEntry.key,
+                DBLLMCacheEntry.size,
+                func.sum(DBLLMCacheEntry.size).over(order_by=(DBLLMCacheEntry.last_used_at, DBLLMCacheEntry.key))
+                .label("cumulative_size"),
+            ).subquery()
+            db.execute(delete(DBLLMCacheEntry).where(DBLLMCacheEntry.key.in_(
+                select(entries.c.key).where(entries.c.cumulative_size - entries.c.size < excess)
+            )))
+            size = db.query(func.sum(DBLLMCacheEntry.size)).scalar() or 0
+        self._size = size
+
+    def _set(self, key: str, model_name: str, value: str):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with get_db() as db:
+            bulk_upsert(db, DBLLMCacheEntry, [{
+                "key": key,
+                "model_name": model_name,
+                "value": value,
+                "size": size,
+                "created_at": now,
+                "last_used_at": now,
+            }])
+            if self._size is not None:
+                self._size += size
+            if self._size is None or self._size > self.max_size_bytes:
+                self._evict(db)
+            db.commit()
+
+    # The database is accessed in a thread, so that it does not block the event loop
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, model_name: str, value: str):
+        await asyncio.to_thread(self._set, key, model_name, value)
+
+
+_llm_cache: Optional[LLMCache] = None
+_llm_cache_configured = False
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Get the LLM response cache, configured with the LLM_CACHE_BACKEND environment variable (None if disabled)."""
+    global _llm_cache, _llm_cache_configured  # pylint: disable=global-statement
+    if not _llm_cache_configured:
+        backend = os.environ.get("LLM_CACHE_BACKEND", "none")
+        max_size_bytes = int(float(os.environ.get("LLM_CACHE_MAX_SIZE_MB", DEFAULT_MAX_SIZE_MB)) * 1024 * 1024)
+        if backend == "disk":
+            _llm_cache = DiskLLMCache(os.environ.get("LLM_CACHE_DIR", "../data/llm_cache"), max_size_bytes)
+        elif backend == "database":
+            _llm_cache = DatabaseLLMCache(max_size_bytes)
+        elif backend != "none":
+            raise ValueError(f"Unknown LLM cache backend {backend}, use 'none', 'disk' or 'database'")
+        _llm_cache_configured = True
+    return _llm_cache
+
+
+def set_llm_cache(llm_cache: Optional[LLMCache]):
+    """Use a custom LLM response cache, or None to disable caching."""
+    global _llm_cache, _llm_cache_configured  # pylint: disable=global-statement
+    _llm_cache = llm_cache
+    _llm_cache_configured = True
+
+
+async def get_cached_response(key: str) -> Optional[str]:
+    """Cached response for the key, cache errors are logged and count as a miss."""
+    llm_cache = get_llm_cache()
+    if llm_cache is None:
+        return None
+    try:
+        return await llm_cache.get(key)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Could not read from the LLM cache")
+        return None
+
+
+async def store_cached_response(key: str, model_name: str, value: str):
+    """Cache the response for the key, cache errors are logged only."""
+    llm_cache = get_llm_cache()
+    if llm_cache is None:
+        return
+    try:
+        await llm_cache.set(key, model_name, value)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Could not write to the LLM cache")
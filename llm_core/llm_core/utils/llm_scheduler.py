@@ -0,0 +1,199 @@
+"""
+Process-wide scheduler for the LLM calls, so that concurrent requests stay within the rate limits of the provider.
+
+Every model has two token buckets, one for requests per minute (RPM) and one for tokens per minute (TPM).
+A call waits until both buckets have enough capacity for it. The tokens of a call are estimated up front from the
+prompt (tiktoken) plus the maximum number of completion tokens. Waiting calls are served by priority class first
+and in arrival order second, so interactive requests overtake background work.
+
+When the provider still responds with 429, the model is paused and its rates are halved. They recover step by step
+with every successful call (additive increase, multiplicative decrease).
+
+The buckets are kept in the rate limit store (see rate_limit_store). On PostgreSQL, they are shared by all module
+processes by default, so the combined traffic of all modules and replicas stays within the limits of a shared
+deployment.
+
+Limits are configured with environment variables:
+    LLM_RATE_LIMITS="gpt-4o=500:300000,gpt-35-turbo=1000:600000"  # model=rpm:tpm, by model or deployment name
+    LLM_DEFAULT_RPM=0  # for the other models, 0 = no limit
+    LLM_DEFAULT_TPM=0
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from langchain.base_language import BaseLanguageModel
+
+from athena.contextvars import get_is_background, get_is_graded
+from athena.logger import logger
+from .rate_limit_store import get_rate_limit_store
+
+BACKOFF_INITIAL_SECONDS = float(os.environ.get("LLM_RATE_LIMIT_BACKOFF_SECONDS", "2"))
+BACKOFF_MAX_SECONDS = float(os.environ.get("LLM_RATE_LIMIT_MAX_BACKOFF_SECONDS", "60"))
+
+
+class Priority(IntEnum):
+    """Priority class of an LLM call, lower values are served first."""
+    graded_interactive = 0
+    non_graded_interactive = 1
+    graded_background = 2
+    non_graded_background = 3
+
+
+def get_current_priority() -> Priority:
+    """Priority of the calls of the current request, derived from the request context of athena."""
+    is_background = get_is_background()
+    is_graded = get_is_graded() is not False  # unknown counts as graded (tutor-facing)
+    if is_background:
+        return Priority.graded_background if is_graded else Priority.non_graded_background
+    return Priority.graded_interactive if is_graded else Priority.non_graded_interactive
+
+
+def _parse_rate_limits(value: str) -> Dict[str, Tuple[int, int]]:
+    """Parse model=rpm:tpm entries, malformed entries are logged and skipped (the model gets the default limits)."""
+    limits = {}
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        try:
+            model_name, rates = entry.split("=", 1)
+            rpm, tpm = rates.split(":", 1)
+            limits[model_name.strip()] = (int(rpm), int(tpm))
+        except ValueError:
+            logger.error("Ignoring the malformed entry %r of LLM_RATE_LIMITS, expected model=rpm:tpm", entry.strip())
+    return limits
+
+
+class ModelRateLimiter:
+    """Rate limiter of a single model with a priority queue of the calls of this process that wait for it."""
+
+    def __init__(self, model_name: str, rpm: int, tpm: int):
+        self.model_name = model_name
+        self.rpm = rpm
+        self.tpm = tpm
+        # a 429 pauses the model locally even if it has no limits (then the shared store is not used at all)
+        self.paused_until = 0.0
+        self._backoff = BACKOFF_INITIAL_SECONDS
+        self._sequence = itertools.count()
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @property
+    def is_limited(self) -> bool:
+        return bool(self.rpm or self.tpm)
+
+    async def _reserve(self, num_tokens: int) -> float:
+        wait_time = self.paused_until - time.time()
+        if wait_time > 0:
+            return wait_time
+        if not self.is_limited:
+            return 0
+        return await get_rate_limit_store().reserve(self.model_name, num_tokens, self.rpm, self.tpm)
+
+    async def _dispatch(self):
+        """Grant the waiting calls in priority order as long as there is capacity, waiting for the refill between."""
+        try:
+            while self._waiters:
+                _, _, num_tokens, future = self._waiters[0]
+                if future.done():  # cancelled while waiting
+                    heapq.heappop(self._waiters)
+                    continue
+                wait_time = await self._reserve(num_tokens)
+                if wait_time > 0:
+                    await asyncio.sleep(wait_time)
+                    continue
+                heapq.heappop(self._waiters)
+                if not future.done():
+                    future.set_result(None)
+        except Exception as exc:  # pylint: disable=broad-except
+            # e.g. the database is not reachable, fail the waiting calls instead of hanging
+            logger.exception("Could not schedule the calls of %s", self.model_name)
+            for *_, future in self._waiters:
+                if not future.done():
+                    future.set_exception(exc)
+            self._waiters.clear()
+        finally:
+            self._dispatcher = None
+
+    async def acquire(self, num_tokens: int, priority: Priority):
+        """Wait until the call may be sent."""
+        if not self.is_limited and self.paused_until <= time.time():
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), num_tokens, future))
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def on_success(self):
+        self._backoff = BACKOFF_INITIAL_SECONDS
+        if self.is_limited:
+            await get_rate_limit_store().report_success(self.model_name)
+
+    async def on_rate_limited(self, retry_after: Optional[float] = None):
+        """Pause the model after a 429 and reduce its rates (for all processes sharing the store)."""
+        pause = retry_after if retry_after is not None else self._backoff
+        self.paused_until = max(self.paused_until, time.time() + pause)
+        self._backoff = min(self._backoff * 2, BACKOFF_MAX_SECONDS)
+        if self.is_limited:
+            await get_rate_limit_store().report_rate_limited(self.model_name, pause)
+        logger.warning("Rate limit of %s reached, pausing for %.1fs", self.model_name, pause)
+
+
+class LLMScheduler:
+    """Keeps one rate limiter per model for the whole process."""
+
+    def __init__(self):
+        self.rate_limits = _parse_rate_limits(os.environ.get("LLM_RATE_LIMITS", ""))
+        self.default_rpm = int(os.environ.get("LLM_DEFAULT_RPM", "0"))
+        self.default_tpm = int(os.environ.get("LLM_DEFAULT_TPM", "0"))
+        self._limiters: Dict[str, ModelRateLimiter] = {}
+
+    def get_limiter(self, model_name: str) -> ModelRateLimiter:
+        limiter = self._limiters.get(model_name)
+        if limiter is None:
+            rpm, tpm = self.rate_limits.get(model_name, (self.default_rpm, self.default_tpm))
+            limiter = ModelRateLimiter(model_name, rpm, tpm)
+            self._limiters[model_name] = limiter
+        return limiter
+
+    @asynccontextmanager
+    async def slot(self, model_name: str, num_tokens: int,
+                   priority: Optional[Priority] = None) -> AsyncIterator[ModelRateLimiter]:
+        """Wait for the rate limits of the model, then run the call in the context."""
+        limiter = self.get_limiter(model_name)
+        await limiter.acquire(num_tokens, priority if priority is not None else get_current_priority())
+        yield limiter
+
+
+llm_scheduler = LLMScheduler()
+
+
+def get_model_name(model: BaseLanguageModel) -> str:
+    """Name of the model (or Azure deployment) that the rate limits apply to."""
+    return getattr(model, "deployment_name", None) or getattr(model, "model_name", None) or type(model).__name__
+
+
+def get_max_completion_tokens(model: BaseLanguageModel) -> int:
+    return getattr(model, "max_tokens", None) or 0
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def get_retry_after(error: BaseException) -> Optional[float]:
+    """Seconds from the Retry-After header of a 429 response of the provider, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
@@ -1,4 +1,6 @@
-from typing import Type, TypeVar, List
+import math
+from functools import lru_cache
+from typing import Dict, Type, TypeVar, List, Optional, Tuple
 from pydantic import BaseModel
 import tiktoken
 from langchain.chat_models import ChatOpenAI
@@ -14,11 +16,19 @@ from athena import emit_meta
 T = TypeVar("T", bound=BaseModel)
 
 
+OMITTED = "omitted"
+TRUNCATED_MARKER = "\n... (truncated)"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = "cl100k_base") -> tiktoken.Encoding:
+    """Returns the (cached) tiktoken encoding, loading it is expensive."""
+    return tiktoken.get_encoding(encoding_name)
+
+
 def num_tokens_from_string(string: str) -> int:
     """Returns the number of tokens in a text string."""
-    encoding = tiktoken.get_encoding("cl100k_base")
-    num_tokens = len(encoding.encode(string))
-    return num_tokens
+    return len(get_encoding().encode(string))
 
 
 def num_tokens_from_prompt(chat_prompt: ChatPromptTemplate, prompt_input: dict) -> int:
@@ -26,14 +36,104 @@ def num_tokens_from_prompt(chat_prompt: ChatPromptTemplate, prompt_input: dict)
     return num_tokens_from_string(chat_prompt.format(**prompt_input))
 
 
+def _count_feature_occurrences(prompt: ChatPromptTemplate, feature: str) -> int:
+    """How often the feature is inserted into the prompt, 1 if the templates cannot be inspected."""
+    occurrences = 0
+    for message in prompt.messages:
+        template = getattr(getattr(message, "prompt", None), "template", None)
+        if isinstance(template, str):
+            occurrences += template.count("{" + feature + "}")
+    return occurrences or 1
+
+
+def plan_prompt_budget(prompt: ChatPromptTemplate,
+                       prompt_input: dict,
+                       max_input_tokens: int,
+                       omittable_features: List[str],
+                       truncatable_features: Optional[List[str]] = None) -> Tuple[dict, Dict[str, str], int]:
+    """Fit the prompt into the token budget by omitting or truncating features, in order of priority.
+
+    The full prompt and each feature value are tokenized only once. The savings of omitting (or truncating) a feature
+    are computed from its token count, and the plan is only verified with one more full pass at the end.
+    Tokenization is not exactly additive at the boundaries of the features, so if the verification fails by a few
+    tokens, a feature that was just truncated is truncated further by the remaining excess, otherwise the next
+    feature is taken as well.
+
+    Args:
+        prompt (ChatPromptTemplate): Prompt template
+        prompt_input (dict): Prompt input, it is not modified
+        max_input_tokens (int): Maximum number of tokens allowed
+        omittable_features (List[str]): Features that can be omitted, ordered by priority (least important first)
+        truncatable_features (Optional[List[str]]): Omittable features that are truncated to fit instead of being
+            omitted, their beginning is kept (e.g. the first hunks of a long diff)
+
+    Returns:
+        (dict, Dict[str, str], int): Tuple of (prompt_input, actions, num_tokens) where prompt_input is the input to use,
+                                     actions maps the omitted and truncated features to "omitted" or "truncated",
+                                     and num_tokens is the number of tokens of the resulting prompt
+    """
+    truncatable_features = truncatable_features or []
+    encoding = get_encoding()
+    prompt_input = dict(prompt_input)
+    actions: Dict[str, str] = {}
+
+    num_tokens = num_tokens_from_prompt(prompt, prompt_input)
+    omitted_tokens = len(encoding.encode(OMITTED))
+    marker_tokens = len(encoding.encode(TRUNCATED_MARKER))
+    remaining_features = [feature for feature in omittable_features if feature in prompt_input]
+    # (feature, its original tokens, number of kept tokens) of the feature that was truncated last
+    last_truncated: Optional[Tuple[str, List[int], int]] = None
+
+    while num_tokens > max_input_tokens and (remaining_features or last_truncated is not None):
+        excess = num_tokens - max_input_tokens
+        if last_truncated is not None:
+            # The verification failed by a few tokens, cut the truncated feature further before taking the next one
+            feature, tokens, keep = last_truncated
+            keep -= math.ceil(excess / _count_feature_occurrences(prompt, feature))
+            if keep > 0:
+                prompt_input[feature] = encoding.decode(tokens[:keep]) + TRUNCATED_MARKER
+                last_truncated = (feature, tokens, keep)
+            else:
+                prompt_input[feature] = OMITTED
+                actions[feature] = "omitted"
+                last_truncated = None
+            num_tokens = num_tokens_from_prompt(prompt, prompt_input)
+            continue
+
+        while excess > 0 and remaining_features:
+            feature = remaining_features.pop(0)
+            occurrences = _count_feature_occurrences(prompt, feature)
+            tokens = encoding.encode(str(prompt_input[feature]))
+
+            if feature in truncatable_features:
+                keep = len(tokens) - marker_tokens - math.ceil(excess / occurrences)
+                if keep > 0:
+                    prompt_input[feature] = encoding.decode(tokens[:keep]) + TRUNCATED_MARKER
+                    actions[feature] = "truncated"
+                    last_truncated = (feature, tokens, keep)
+                    excess -= occurrences * (len(tokens) - keep - marker_tokens)
+                    continue
+
+            prompt_input[feature] = OMITTED
+            actions[feature] = "omitted"
+            excess -= occurrences * (len(tokens) - omitted_tokens)
+
+        # Verify the plan with one full pass
+        num_tokens = num_tokens_from_prompt(prompt, prompt_input)
+
+    return prompt_input, actions, num_tokens
+
+
 def check_prompt_length_and_omit_features_if_necessary(prompt: ChatPromptTemplate, 
                                                        prompt_input: dict, 
                                                        max_input_tokens: int, 
                                                        omittable_features: List[str],
-                                                       debug: bool):
+                                                       debug: bool,
+                                                       truncatable_features: Optional[List[str]] = None):
     """Check if the input is too long and omit features if necessary.
 
-    Note: Omitted features will be replaced with "omitted" in the prompt
+    Note: Omitted features will be replaced with "omitted" in the prompt, truncated features keep their beginning
+    followed by "... (truncated)"
 
     Args:
         prompt (ChatPromptTemplate): Prompt template
@@ -41,29 +141,25 @@ def check_prompt_length_and_omit_features_if_necessary(prompt: ChatPromptTemplat
         max_input_tokens (int): Maximum number of tokens allowed
         omittable_features (List[str]): List of features that can be omitted, ordered by priority (least important first)
         debug (bool): Debug flag
+        truncatable_features (Optional[List[str]]): Omittable features that are truncated to fit instead of omitted
 
     Returns:
         (dict, bool): Tuple of (prompt_input, should_run) where prompt_input is the input with omitted features and 
                       should_run is True if the model should run, False otherwise
     """
-    if num_tokens_from_prompt(prompt, prompt_input) <= max_input_tokens:
-        # Full prompt fits into LLM context => should run with full prompt
-        return prompt_input, True
-
-    omitted_features = []
-
-    # Omit features until the input is short enough
-    for feature in omittable_features:
-        if feature in prompt_input:
-            omitted_features.append(feature)
-            prompt_input[feature] = "omitted"
-            if num_tokens_from_prompt(prompt, prompt_input) <= max_input_tokens:
-                if debug:
-                    emit_meta("omitted_features", omitted_features)
-                return prompt_input, True
-
-    # If we get here, we couldn't omit enough features
-    return prompt_input, False
+    prompt_input, actions, num_tokens = plan_prompt_budget(
+        prompt, prompt_input, max_input_tokens, omittable_features, truncatable_features
+    )
+    if num_tokens > max_input_tokens:
+        # We couldn't omit enough features
+        return prompt_input, False
+
+    if debug and actions:
+        emit_meta("omitted_features", [feature for feature, action in actions.items() if action == "omitted"])
+        truncated_features = [feature for feature, action in actions.items() if action == "truncated"]
+        if truncated_features:
+            emit_meta("truncated_features", truncated_features)
+    return prompt_input, True
 
 
 def supports_function_calling(model: BaseLanguageModel):
@@ -1,18 +1,78 @@
-from typing import Optional, Type, TypeVar, List
+import os
+import time
+from typing import AsyncIterator, Optional, Type, TypeVar, List
 from langchain_core.language_models import BaseLanguageModel
+from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.pydantic_v1 import BaseModel, ValidationError
 from langchain_core.runnables import RunnableSequence
-from athena import get_experiment_environment
+from athena import get_experiment_environment, emit_meta, get_meta
+from athena.logger import logger
+
+from llm_core.models.callbacks import UsageHandler
+from llm_core.utils.llm_utils import num_tokens_from_prompt
+from llm_core.utils.llm_scheduler import Priority, llm_scheduler, get_model_name, get_max_completion_tokens, \
+    is_rate_limit_error, get_retry_after
+from llm_core.utils.llm_cache import cache_key, is_deterministic, get_llm_cache, get_cached_response, \
+    store_cached_response
+from llm_core.utils.llm_batch import is_batch_work, predict_in_batch
 
 T = TypeVar("T", bound=BaseModel)
 
+# how often a call is retried after the provider responded with 429 (on top of the retries of the client)
+RATE_LIMIT_MAX_RETRIES = int(os.environ.get("LLM_RATE_LIMIT_MAX_RETRIES", "3"))
+
+
+def _get_tags(tags: Optional[List[str]]) -> List[str]:
+    experiment = get_experiment_environment()
+
+    tags = tags or []
+    if experiment.experiment_id is not None:
+        tags.append(f"experiment-{experiment.experiment_id}")
+    if experiment.module_configuration_id is not None:
+        tags.append(f"module-configuration-{experiment.module_configuration_id}")
+    if experiment.run_id is not None:
+        tags.append(f"run-{experiment.run_id}")
+    return tags
+
+
+def _get_cache_key(model: BaseLanguageModel, chat_prompt: ChatPromptTemplate, prompt_input: dict,
+                   pydantic_object: Type[T], use_cache: Optional[bool]) -> Optional[str]:
+    """Key of the call in the LLM response cache, None if the cache is not used for it."""
+    if use_cache is None:
+        use_cache = is_deterministic(model)
+    if not use_cache or get_llm_cache() is None:
+        return None
+    return cache_key(model, chat_prompt.format_messages(**prompt_input), pydantic_object)
+
+
+async def _get_cached_result(key: str, pydantic_object: Type[T]) -> Optional[T]:
+    cached = await get_cached_response(key)
+    if cached is not None:
+        try:
+            cached_result = pydantic_object.parse_raw(cached)
+            emit_meta("llmCacheHits", get_meta().get("llmCacheHits", 0) + 1)
+            return cached_result
+        except ValidationError:
+            pass  # e.g. a validator changed without changing the schema, call the model again
+    emit_meta("llmCacheMisses", get_meta().get("llmCacheMisses", 0) + 1)
+    return None
+
+
+def _emit_rate_limit_wait(start: float):
+    wait_ms = (time.perf_counter() - start) * 1000
+    emit_meta("llmRateLimitWaitMs", get_meta().get("llmRateLimitWaitMs", 0) + wait_ms)
+
+
 async def predict_and_parse(
         model: BaseLanguageModel, 
         chat_prompt: ChatPromptTemplate, 
         prompt_input: dict, 
         pydantic_object: Type[T], 
-        tags: Optional[List[str]]
+        tags: Optional[List[str]],
+        priority: Optional[Priority] = None,
+        use_cache: Optional[bool] = None,
+        batch: Optional[bool] = None,
     ) -> Optional[T]:
     """Predicts an LLM completion using the model and parses the output using the provided Pydantic model
 
@@ -22,19 +82,16 @@ async def predict_and_parse(
         prompt_input (dict): Input parameters to use for the prompt
         pydantic_object (Type[T]): Pydantic model to parse the output
         tags (Optional[List[str]]: List of tags to tag the prediction with
+        priority (Optional[Priority]): Priority class in the LLM scheduler, derived from the request if not given
+        use_cache (Optional[bool]): Whether to use the LLM response cache (if configured). By default, only calls
+            with temperature 0 are cached, True forces the cache for other temperatures as well, False disables it.
+        batch (Optional[bool]): Whether to run the call with the Batch API of the provider (cheaper, but takes up to
+            24 hours), by default only in background jobs if LLM_BATCH_BACKGROUND is enabled. See llm_batch.
 
     Returns:
         Optional[T]: Parsed output, or None if it could not be parsed
     """
-    experiment = get_experiment_environment()
-
-    tags = tags or []
-    if experiment.experiment_id is not None:
-        tags.append(f"experiment-{experiment.experiment_id}")
-    if experiment.module_configuration_id is not None:
-        tags.append(f"module-configuration-{experiment.module_configuration_id}")
-    if experiment.run_id is not None:
-        tags.append(f"run-{experiment.run_id}")
+    tags = _get_tags(tags)
 
     structured_output_llm = model.with_structured_output(pydantic_object, method="json_mode")
     chain = RunnableSequence(
@@ -42,7 +99,150 @@ async def predict_and_parse(
         structured_output_llm
     )
 
-    try:
-        return await chain.ainvoke(prompt_input, config={"tags": tags})
-    except ValidationError as e:
-        raise ValueError(f"Could not parse output: {e}") from e
\ No newline at end of file
+    model_name = get_model_name(model)
+
+    key = _get_cache_key(model, chat_prompt, prompt_input, pydantic_object, use_cache)
+    if key is not None:
+        cached_result = await _get_cached_result(key, pydantic_object)
+        if cached_result is not None:
+            return cached_result
+
+    if batch is None:
+        batch = is_batch_work()
+    if batch:
+        # Batch calls have their own quota, so they do not go through the scheduler
+        content = await predict_in_batch(model, chat_prompt.format_messages(**prompt_input))
+        try:
+            result = pydantic_object.parse_raw(content)
+        except ValidationError as e:
+            raise ValueError(f"Could not parse output: {e}") from e
+        if key is not None:
+            await store_cached_response(key, model_name, result.json())
+        return result
+
+    # All calls go through the process-wide scheduler to stay within the rate limits of the provider
+    num_tokens = num_tokens_from_prompt(chat_prompt, prompt_input) + get_max_completion_tokens(model)
+    for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+        start = time.perf_counter()
+        async with llm_scheduler.slot(model_name, num_tokens, priority) as limiter:
+            _emit_rate_limit_wait(start)
+            try:
+                # The usage is tracked per call, so that the (pooled) model can be shared by requests
+                result = await chain.ainvoke(prompt_input, config={"tags": tags, "callbacks": [UsageHandler()]})
+            except ValidationError as e:
+                raise ValueError(f"Could not parse output: {e}") from e
+            except Exception as e:  # pylint: disable=broad-except
+                if not is_rate_limit_error(e) or attempt == RATE_LIMIT_MAX_RETRIES:
+                    raise
+                await limiter.on_rate_limited(get_retry_after(e))
+                continue
+            await limiter.on_success()
+            if key is not None and result is not None:
+                await store_cached_response(key, model_name, result.json())
+            return result
+    return None
+
+
+async def stream_and_parse(
+        model: BaseLanguageModel,
+        chat_prompt: ChatPromptTemplate,
+        prompt_input: dict,
+        pydantic_object: Type[T],
+        items_field: str,
+        tags: Optional[List[str]],
+        priority: Optional[Priority] = None,
+        use_cache: Optional[bool] = None,
+    ) -> AsyncIterator[BaseModel]:
+    """Streams an LLM completion using the model and yields the items of a list field of the Pydantic model
+    as soon as they are complete, e.g. the feedbacks of an assessment while the model is still writing the next ones.
+
+    The JSON output is parsed incrementally. An item is complete once the model starts the next one (or the output
+    ends). Items that do not match their model are skipped, because the items before them were already yielded.
+
+    Args:
+        model (BaseLanguageModel): The model to predict with
+        chat_prompt (ChatPromptTemplate): Prompt to use
+        prompt_input (dict): Input parameters to use for the prompt
+        pydantic_object (Type[T]): Pydantic model of the whole output, it is used for the prompt and the cache
+        items_field (str): Name of the list field of pydantic_object whose items are yielded, e.g. "feedbacks"
+        tags (Optional[List[str]]: List of tags to tag the prediction with
+        priority (Optional[Priority]): Priority class in the LLM scheduler, derived from the request if not given
+        use_cache (Optional[bool]): Whether to use the LLM response cache (if configured), see predict_and_parse
+
+    Yields:
+        BaseModel: The parsed items, in the order of the output
+    """
+    if is_batch_work():
+        # Batch calls cannot be streamed, the items come all at once
+        result = await predict_and_parse(model, chat_prompt, prompt_input, pydantic_object, tags, priority, use_cache)
+        for item in getattr(result, items_field) if result is not None else []:
+            yield item
+        return
+
+    tags = _get_tags(tags)
+    item_model = pydantic_object.__fields__[items_field].type_
+
+    json_llm = model.bind(response_format={"type": "json_object"}, stream_usage=True)
+    chain = RunnableSequence(
+        chat_prompt,
+        json_llm,
+        JsonOutputParser()
+    )
+
+    model_name = get_model_name(model)
+
+    key = _get_cache_key(model, chat_prompt, prompt_input, pydantic_object, use_cache)
+    if key is not None:
+        cached_result = await _get_cached_result(key, pydantic_object)
+        if cached_result is not None:
+            for item in getattr(cached_result, items_field):
+                yield item
+            return
+
+    def parse_item(item: dict) -> Optional[BaseModel]:
+        try:
+            return item_model.parse_obj(item)
+        except ValidationError as e:
+            logger.warning("Skipping an item of the output that could not be parsed: %s", e)
+            return None
+
+    # All calls go through the process-wide scheduler to stay within the rate limits of the provider
+    num_tokens = num_tokens_from_prompt(chat_prompt, prompt_input) + get_max_completion_tokens(model)
+    for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+        start = time.perf_counter()
+        async with llm_scheduler.slot(model_name, num_tokens, priority) as limiter:
+            _emit_rate_limit_wait(start)
+            output: dict = {}
+            num_yielded = 0
+            try:
+                # The parser yields the whole (partial) output every time it grows
+                async for output in chain.astream(prompt_input,
+                                                  config={"tags": tags, "callbacks": [UsageHandler()]}):
+                    items = output.get(items_field) if isinstance(output, dict) else None
+                    while isinstance(items, list) and len(items) > num_yielded + 1:
+                        item = parse_item(items[num_yielded])
+                        num_yielded += 1
+                        if item is not None:
+                            yield item
+            except Exception as e:  # pylint: disable=broad-except
+                # Only retry if nothing was yielded yet, otherwise the items would be duplicated
+                if not is_rate_limit_error(e) or attempt == RATE_LIMIT_MAX_RETRIES or num_yielded > 0:
+                    raise
+                await limiter.on_rate_limited(get_retry_after(e))
+                continue
+            await limiter.on_success()
+
+            # The last item is complete once the output ended
+            items = output.get(items_field) if isinstance(output, dict) else None
+            for item_dict in (items if isinstance(items, list) else [])[num_yielded:]:
+                item = parse_item(item_dict)
+                if item is not None:
+                    yield item
+
+            if key is not None:
+                try:
+                    result = pydantic_object.parse_obj(output)
+                except ValidationError:
+                    return  # only complete, valid outputs are cached
+                await store_cached_response(key, model_name, result.json())
+            return
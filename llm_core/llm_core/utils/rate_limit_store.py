@@ -0,0 +1,198 @@
+"""
+Storage of the rate limit state of the LLM scheduler.
+
+The modules share the quota of the provider (e.g. one Azure deployment), so on PostgreSQL (the shared database of a
+deployment) the token buckets live in a table of the database by default and every process reserves its calls there.
+With SQLite, every module has its own database file that would share nothing, so the local store keeps the state in
+the memory of the process (also for tests).
+
+Configured with LLM_RATE_LIMIT_BACKEND="database" or "local", by default depending on the database.
+"""
+import asyncio
+import os
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from sqlalchemy import Column, Float, String, case, update
+from sqlalchemy.exc import IntegrityError
+
+from athena.database import Base, engine, get_db
+
+# lowest fraction of the configured rates after repeated 429s
+MIN_RATE_FACTOR = 0.1
+# fraction of the configured rates that is recovered with every successful call
+RATE_RECOVERY_STEP = 0.05
+
+
+@dataclass
+class RateLimitState:
+    """Token buckets of a model for requests and tokens per minute, they refill continuously up to the limit."""
+    request_level: float
+    token_level: float
+    updated_at: float
+    paused_until: float = 0.0
+    rate_factor: float = 1.0
+
+
+def _refill(state: RateLimitState, rpm: int, tpm: int, now: float):
+    elapsed = max(0.0, now - state.updated_at)
+    state.request_level = min(rpm, state.request_level + elapsed * rpm * state.rate_factor / 60)
+    state.token_level = min(tpm, state.token_level + elapsed * tpm * state.rate_factor / 60)
+    state.updated_at = now
+
+
+def reserve_in_state(state: RateLimitState, num_tokens: int, rpm: int, tpm: int, now: float) -> float:
+    """
+    Take one request and num_tokens tokens from the buckets if both have enough, 0 means unlimited.
+    Returns 0 if they were taken, otherwise the seconds to wait before trying again (nothing is taken then).
+    """
+    _refill(state, rpm, tpm, now)
+    num_tokens = min(num_tokens, tpm)  # larger calls would never fit otherwise
+    wait_time = max(0.0, state.paused_until - now)
+    if rpm and state.request_level < 1:
+        wait_time = max(wait_time, (1 - state.request_level) * 60 / (rpm * state.rate_factor))
+    if tpm and state.token_level < num_tokens:
+        wait_time = max(wait_time, (num_tokens - state.token_level) * 60 / (tpm * state.rate_factor))
+    if wait_time > 0:
+        return wait_time
+    if rpm:
+        state.request_level -= 1
+    if tpm:
+        state.token_level -= num_tokens
+    return 0.0
+
+
+class RateLimitStore(ABC):
+    """Shared state of the rate limiters, all times are UNIX timestamps."""
+
+    @abstractmethod
+    async def reserve(self, model_name: str, num_tokens: int, rpm: int, tpm: int) -> float:
+        """Reserve a call, see reserve_in_state."""
+
+    @abstractmethod
+    async def report_rate_limited(self, model_name: str, pause: float):
+        """Pause the model for everyone and halve its rates."""
+
+    @abstractmethod
+    async def report_success(self, model_name: str):
+        """Recover the rates of the model a little."""
+
+
+class LocalRateLimitStore(RateLimitStore):
+    """Rate limit state of the current process only."""
+
+    def __init__(self):
+        self._states: Dict[str, RateLimitState] = {}
+
+    def _get_state(self, model_name: str, rpm: int, tpm: int) -> RateLimitState:
+        if model_name not in self._states:
+            self._states[model_name] = RateLimitState(request_level=rpm, token_level=tpm, updated_at=time.time())
+        return self._states[model_name]
+
+    async def reserve(self, model_name: str, num_tokens: int, rpm: int, tpm: int) -> float:
+        return reserve_in_state(self._get_state(model_name, rpm, tpm), num_tokens, rpm, tpm, time.time())
+
+    async def report_rate_limited(self, model_name: str, pause: float):
+        state = self._get_state(model_name, 0, 0)
+        state.paused_until = max(state.paused_until, time.time() + pause)
+        state.rate_factor = max(MIN_RATE_FACTOR, state.rate_factor / 2)
+
+    async def report_success(self, model_name: str):
+        if model_name in self._states:
+            state = self._states[model_name]
+            state.rate_factor = min(1.0, state.rate_factor + RATE_RECOVERY_STEP)
+
+
+class DBLLMRateLimit(Base):
+    __tablename__ = "llm_rate_limits"
+
+    model_name = Column(String, primary_key=True)
+    request_level = Column(Float, nullable=False)
+    token_level = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)
+    paused_until = Column(Float, nullable=False, default=0.0)
+    rate_factor = Column(Float, nullable=False, default=1.0)
+
+
+class DatabaseRateLimitStore(RateLimitStore):
+    """
+    Rate limit state in the llm_rate_limits table of the (shared) database.
+    A reservation locks the row of the model (SELECT ... FOR UPDATE), so concurrent processes never overbook.
+    """
+
+    def _reserve(self, model_name: str, num_tokens: int, rpm: int, tpm: int) -> float:
+        with get_db() as db:
+            row = db.query(DBLLMRateLimit).filter_by(model_name=model_name).with_for_update().one_or_none()
+            if row is None:
+                row = DBLLMRateLimit(model_name=model_name, request_level=rpm, token_level=tpm, updated_at=time.time(),
+                                     paused_until=0.0, rate_factor=1.0)
+                db.add(row)
+                try:
+                    db.flush()
+                except IntegrityError:
+                    # Another process created the row at the same time
+                    db.rollback()
+                    row = db.query(DBLLMRateLimit).filter_by(model_name=model_name).with_for_update().one()
+            state = RateLimitState(request_level=row.request_level, token_level=row.token_level,
+                                   updated_at=row.updated_at, paused_until=row.paused_until,
+                                   rate_factor=row.rate_factor)
+            wait_time = reserve_in_state(state, num_tokens, rpm, tpm, time.time())
+            row.request_level = state.request_level
+            row.token_level = state.token_level
+            row.updated_at = state.updated_at
+            db.commit()
+            return wait_time
+
+    def _report_rate_limited(self, model_name: str, pause: float):
+        paused_until = time.time() + pause
+        with get_db() as db:
+            row = db.query(DBLLMRateLimit).filter_by(model_name=model_name).with_for_update().one_or_none()
+            if row is not None:
+                row.paused_until = max(row.paused_until, paused_until)
+                row.rate_factor = max(MIN_RATE_FACTOR, row.rate_factor / 2)
+                db.commit()
+
+    def _report_success(self, model_name: str):
+        recovered_rate_factor = DBLLMRateLimit.rate_factor + RATE_RECOVERY_STEP
+        with get_db() as db:
+            db.execute(update(DBLLMRateLimit)
+                       .where(DBLLMRateLimit.model_name == model_name, DBLLMRateLimit.rate_factor < 1.0)
+                       .values(rate_factor=case((recovered_rate_factor > 1.0, 1.0), else_=recovered_rate_factor)))
+            db.commit()
+
+    # The database is accessed in a thread, so that waiting for the row lock does not block the event loop
+
+    async def reserve(self, model_name: str, num_tokens: int, rpm: int, tpm: int) -> float:
+        return await asyncio.to_thread(self._reserve, model_name, num_tokens, rpm, tpm)
+
+    async def report_rate_limited(self, model_name: str, pause: float):
+        await asyncio.to_thread(self._report_rate_limited, model_name, pause)
+
+    async def report_success(self, model_name: str):
+        await asyncio.to_thread(self._report_success, model_name)
+
+
+_rate_limit_store: Optional[RateLimitStore] = None
+
+
+def get_rate_limit_store() -> RateLimitStore:
+    """Get the rate limit store, configured with the LLM_RATE_LIMIT_BACKEND environment variable."""
+    global _rate_limit_store  # pylint: disable=global-statement
+    if _rate_limit_store is None:
+        default_backend = "database" if engine.dialect.name == "postgresql" else "local"
+        backend = os.environ.get("LLM_RATE_LIMIT_BACKEND", default_backend)
+        if backend == "database":
+            _rate_limit_store = DatabaseRateLimitStore()
+        elif backend == "local":
+            _rate_limit_store = LocalRateLimitStore()
+        else:
+            raise ValueError(f"Unknown rate limit backend {backend}, use 'database' or 'local'")
+    return _rate_limit_store
+
+
+def set_rate_limit_store(rate_limit_store: RateLimitStore):
+    """Use a custom rate limit store, e.g. a LocalRateLimitStore in tests."""
+    global _rate_limit_store  # pylint: disable=global-statement
+    _rate_limit_store = rate_limit_store
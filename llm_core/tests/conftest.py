@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# athena reads module.conf from the working directory and llm_core the providers from the environment when imported
+_module_dir = tempfile.mkdtemp(prefix="llm-core-tests-")
+with open(os.path.join(_module_dir, "module.conf"), "w", encoding="utf-8") as module_conf:
+    module_conf.write("[module]\nname = module_test\ntype = text\nport = 5999\n")
+os.chdir(_module_dir)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_module_dir}/data/data.sqlite")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("LLM_AVAILABLE_MODELS", "openai_gpt-4o-mini")  # no discovery through the provider
@@ -0,0 +1,31 @@
+import asyncio
+
+from athena import app
+from llm_core.models import openai as openai_models
+
+
+def test_async_clients_are_shared_per_event_loop():
+    async def get_clients():
+        return openai_models.get_http_async_client("openai"), openai_models.get_http_async_client("openai")
+
+    first_loop_clients = asyncio.run(get_clients())
+    second_loop_clients = asyncio.run(get_clients())
+
+    assert first_loop_clients[0] is first_loop_clients[1]
+    assert second_loop_clients[0] is not first_loop_clients[0]
+    # The client of the closed event loop was dropped
+    assert first_loop_clients[0] not in openai_models._http_async_clients.values()  # pylint: disable=protected-access
+
+
+def test_close_http_clients():
+    async def use_and_close():
+        client = openai_models.get_http_async_client("openai")
+        await openai_models.close_http_clients()
+        return client
+
+    assert asyncio.run(use_and_close()).is_closed
+    assert not openai_models._http_async_clients  # pylint: disable=protected-access
+
+
+def test_importing_the_providers_registers_no_app_hooks():
+    assert openai_models.close_http_clients not in app.router.on_shutdown
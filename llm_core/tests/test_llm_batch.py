@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.pydantic_v1 import BaseModel
+from langchain_openai import ChatOpenAI
+
+from llm_core.utils import llm_batch
+from llm_core.utils.fake_batch_client import FakeBatchClient
+from llm_core.utils.predict_and_parse import predict_and_parse
+
+
+class Answer(BaseModel):
+    answer: str
+
+
+model = ChatOpenAI(model="gpt-4o-mini", api_key="test", temperature=0)
+chat_prompt = ChatPromptTemplate.from_messages([
+    ("system", "Answer in JSON with the key 'answer'."),
+    ("human", "{question}"),
+])
+
+
+def respond(body: dict) -> str:
+    return json.dumps({"answer": body["messages"][-1]["content"].upper()})
+
+
+@pytest.fixture(name="fake_client")
+def fixture_fake_client(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_BATCH_BACKEND", "fake")
+    monkeypatch.setattr(llm_batch, "BATCH_WINDOW_SECONDS", 0.01)
+    monkeypatch.setattr(llm_batch, "BATCH_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(llm_batch, "BATCH_DIR", str(tmp_path))
+    client = FakeBatchClient(responder=respond)
+    llm_batch.set_fake_batch_client(client)
+    yield client
+    llm_batch.set_fake_batch_client(None)
+
+
+async def predict(question: str) -> Answer:
+    return await predict_and_parse(model, chat_prompt, {"question": question}, Answer, tags=None, use_cache=False,
+                                   batch=True)
+
+
+def test_predict_and_parse_in_batch(fake_client, tmp_path):
+    async def run():
+        return await asyncio.gather(predict("a"), predict("b"), predict("a"))
+
+    answers = asyncio.run(run())
+
+    assert [answer.answer for answer in answers] == ["A", "B", "A"]
+    assert len(fake_client.stored_batches) == 1
+    # identical calls are only sent once
+    batch = next(iter(fake_client.stored_batches.values()))
+    assert len(fake_client.files_content[batch.input_file_id].splitlines()) == 2
+    # nothing is left to resume
+    assert not list(tmp_path.glob("*.batch.json"))
+
+
+def test_predict_and_parse_in_batch_fails_for_failed_call(fake_client):
+    def fail(body: dict) -> str:
+        raise ValueError("provider error")
+    fake_client.responder = fail
+
+    with pytest.raises(llm_batch.BatchRequestError):
+        asyncio.run(predict("a"))
+
+
+def test_running_batch_is_resumed_after_restart(fake_client, tmp_path):
+    fake_client.completion_delay = 3600
+
+    async def submit_and_crash():
+        task = asyncio.create_task(predict("a"))
+        while not list(tmp_path.glob("*.batch.json")):
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(submit_and_crash())  # the polling of the batch is cancelled with the event loop
+
+    # restart: the process forgot everything except the files in the batch directory
+    llm_batch._queues.clear()  # pylint: disable=protected-access
+    fake_client.completion_delay = 0
+
+    answer = asyncio.run(predict("a"))
+
+    assert answer.answer == "A"
+    assert len(fake_client.stored_batches) == 1  # the call was not submitted again
+    assert not list(tmp_path.glob("*.batch.json"))
+
+
+def test_batch_work_only_in_jobs(monkeypatch):
+    monkeypatch.setattr(llm_batch, "BATCH_BACKGROUND", True)
+    monkeypatch.setattr(llm_batch, "get_is_background", lambda: True)
+
+    # e.g. a batch request that a client waits for
+    assert not llm_batch.is_batch_work()
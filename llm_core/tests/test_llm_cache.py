@@ -0,0 +1,26 @@
+import asyncio
+
+from athena.database import Base, engine, get_db
+from llm_core.utils.llm_cache import DatabaseLLMCache, DBLLMCacheEntry
+
+
+def get_stored_keys() -> set:
+    with get_db() as db:
+        return {key for key, in db.query(DBLLMCacheEntry.key).all()}
+
+
+def test_database_cache_evicts_the_least_recently_used_entries():
+    Base.metadata.create_all(engine)
+    llm_cache = DatabaseLLMCache(max_size_bytes=100)
+
+    async def scenario():
+        for key in ("a", "b", "c"):
+            await llm_cache.set(key, "gpt-4o", "x" * 30)
+        assert await llm_cache.get("a") == "x" * 30  # "b" is the least recently used now
+        await llm_cache.set("d", "gpt-4o", "x" * 30)
+
+    asyncio.run(scenario())
+
+    # 120 bytes are evicted down to 90 bytes
+    assert get_stored_keys() == {"a", "c", "d"}
+    assert llm_cache._size == 90  # pylint: disable=protected-access
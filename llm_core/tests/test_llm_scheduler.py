@@ -0,0 +1,12 @@
+from llm_core.utils.llm_scheduler import _parse_rate_limits  # pylint: disable=protected-access
+
+
+def test_parse_rate_limits():
+    assert _parse_rate_limits("gpt-4o=500:300000, gpt-35-turbo = 1000:600000") == {
+        "gpt-4o": (500, 300000),
+        "gpt-35-turbo": (1000, 600000),
+    }
+
+
+def test_malformed_rate_limits_are_skipped():
+    assert _parse_rate_limits("gpt-4o=500,gpt-4o-mini=a:b,gpt-35-turbo,,o1=10:2000") == {"o1": (10, 2000)}
@@ -0,0 +1,135 @@
+import re
+
+import pytest
+from langchain.prompts import ChatPromptTemplate
+
+from llm_core.utils import llm_utils
+from llm_core.utils.llm_utils import (
+    OMITTED,
+    TRUNCATED_MARKER,
+    check_prompt_length_and_omit_features_if_necessary,
+    plan_prompt_budget,
+)
+
+
+class WordEncoding:
+    """Every word and every whitespace character is a token, so the token counts are additive and known offline."""
+
+    @staticmethod
+    def encode(text: str):
+        return re.findall(r"\S+|\s", text)
+
+    @staticmethod
+    def decode(tokens) -> str:
+        return "".join(tokens)
+
+
+chat_prompt = ChatPromptTemplate.from_messages([
+    ("system", "Assess the submission."),
+    ("human", "{problem_statement}\n{diff}"),
+])
+prompt_input = {
+    "problem_statement": "Implement the sorting algorithm.",
+    "diff": " ".join(f"+line{i}" for i in range(50)),
+}
+omittable_features = ["diff", "problem_statement"]
+truncatable_features = ["diff"]
+
+
+def count_tokens(value: str) -> int:
+    return len(WordEncoding.encode(value))
+
+
+@pytest.fixture(name="full_passes")
+def fixture_full_passes(monkeypatch):
+    """Counts the full passes over the prompt, and adds the returned penalty to the counts of truncated prompts
+    (tokenization is not exactly additive at the boundaries of the truncated features)."""
+    monkeypatch.setattr(llm_utils, "get_encoding", WordEncoding)
+    passes = {"count": 0, "truncation_penalty": 0}
+    num_tokens_from_prompt = llm_utils.num_tokens_from_prompt
+
+    def counting_num_tokens_from_prompt(prompt, values):
+        passes["count"] += 1
+        num_tokens = num_tokens_from_prompt(prompt, values)
+        if any(str(value).endswith(TRUNCATED_MARKER) for value in values.values()):
+            num_tokens += passes["truncation_penalty"]
+        return num_tokens
+
+    monkeypatch.setattr(llm_utils, "num_tokens_from_prompt", counting_num_tokens_from_prompt)
+    return passes
+
+
+def test_excess_fixed_by_single_truncation(full_passes):
+    full_tokens = llm_utils.num_tokens_from_prompt(chat_prompt, prompt_input)
+    full_passes["count"] = 0
+
+    planned_input, actions, num_tokens = plan_prompt_budget(
+        chat_prompt, prompt_input, full_tokens - 20, omittable_features, truncatable_features
+    )
+
+    assert actions == {"diff": "truncated"}
+    assert num_tokens == full_tokens - 20
+    assert full_passes["count"] == 2  # the initial count and the verification
+    assert planned_input["diff"].startswith("+line0 +line1")
+    assert planned_input["diff"].endswith(TRUNCATED_MARKER)
+    assert planned_input["problem_statement"] == prompt_input["problem_statement"]
+    assert not prompt_input["diff"].endswith(TRUNCATED_MARKER)  # the given input is not modified
+
+
+def test_overshoot_truncates_further(full_passes):
+    full_tokens = llm_utils.num_tokens_from_prompt(chat_prompt, prompt_input)
+    full_passes["truncation_penalty"] = 5
+    full_passes["count"] = 0
+
+    planned_input, actions, num_tokens = plan_prompt_budget(
+        chat_prompt, prompt_input, full_tokens - 20, omittable_features, truncatable_features
+    )
+
+    assert actions == {"diff": "truncated"}
+    assert num_tokens <= full_tokens - 20
+    assert full_passes["count"] == 3  # the verification failed once
+    # 20 tokens of excess, the 4 tokens of the marker and the 5 tokens of the overshoot are cut
+    assert count_tokens(planned_input["diff"]) == count_tokens(prompt_input["diff"]) - 20 - 5
+    assert planned_input["problem_statement"] == prompt_input["problem_statement"]
+
+
+def test_truncated_feature_cut_to_nothing_is_omitted(full_passes):
+    full_tokens = llm_utils.num_tokens_from_prompt(chat_prompt, prompt_input)
+    full_passes["truncation_penalty"] = 1000
+
+    planned_input, actions, num_tokens = plan_prompt_budget(
+        chat_prompt, prompt_input, full_tokens - 20, omittable_features, truncatable_features
+    )
+
+    assert actions == {"diff": "omitted"}
+    assert planned_input["diff"] == OMITTED
+    assert num_tokens <= full_tokens - 20
+    assert planned_input["problem_statement"] == prompt_input["problem_statement"]
+
+
+def test_truncatable_feature_omitted_if_excess_exceeds_it(full_passes):
+    full_tokens = llm_utils.num_tokens_from_prompt(chat_prompt, prompt_input)
+
+    planned_input, actions, num_tokens = plan_prompt_budget(
+        chat_prompt, prompt_input, full_tokens - count_tokens(prompt_input["diff"]) + 2, omittable_features,
+        truncatable_features
+    )
+
+    assert actions == {"diff": "omitted"}
+    assert planned_input["diff"] == OMITTED
+    assert num_tokens <= full_tokens - count_tokens(prompt_input["diff"]) + 2
+
+
+def test_no_feasible_plan(full_passes):
+    planned_input, actions, num_tokens = plan_prompt_budget(
+        chat_prompt, prompt_input, 5, omittable_features, truncatable_features
+    )
+
+    assert actions == {"diff": "omitted", "problem_statement": "omitted"}
+    assert planned_input == {"diff": OMITTED, "problem_statement": OMITTED}
+    assert num_tokens > 5
+
+    _, should_run = check_prompt_length_and_omit_features_if_necessary(
+        chat_prompt, prompt_input, 5, omittable_features, debug=False, truncatable_features=truncatable_features
+    )
+    assert should_run is False
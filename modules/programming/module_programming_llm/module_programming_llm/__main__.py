@@ -12,6 +12,7 @@ from athena import (
 from athena.programming import Exercise, Submission, Feedback
 from athena.logger import logger
 from module_programming_llm.config import Configuration
+from module_programming_llm.precompute_exercise_artifacts import precompute_exercise_artifacts
 
 from module_programming_llm.generate_graded_suggestions_by_file import (
     generate_suggestions_by_file as generate_graded_suggestions_by_file,
@@ -22,8 +23,10 @@ from module_programming_llm.generate_non_graded_suggestions_by_file import (
 
 
 @submissions_consumer
-def receive_submissions(exercise: Exercise, submissions: List[Submission]):
+async def receive_submissions(exercise: Exercise, submissions: List[Submission], module_config: Configuration):
     logger.info("receive_submissions: Received %d submissions for exercise %d", len(submissions), exercise.id)
+    # Precompute everything that only depends on the exercise, so feedback requests can reuse it
+    await precompute_exercise_artifacts(exercise, module_config)
 
 
 @submission_selector
@@ -57,7 +57,7 @@ class SplitProblemStatementsWithoutSolutionByFilePrompt(
 
 class SplitGradingInstructionsByFilePrompt(BaseModel):
     """\
-Features available: **{grading_instructions}**, **{changed_files_from_template_to_solution}**, **{changed_files_from_template_to_submission}**\
+Features available: **{grading_instructions}**, **{changed_files_from_template_to_solution}**\
 """
     system_message: str = Field(default=split_grading_instructions_by_file_message,
                                 description="Message for priming AI behavior and instructing it what to do.")
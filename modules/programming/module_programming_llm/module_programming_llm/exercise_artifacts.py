@@ -0,0 +1,197 @@
+"""
+Exercise-level artifacts that only depend on the exercise (and the module config), not on a single submission.
+
+They are computed once per exercise, either when the submissions are received or lazily on the first feedback request,
+and are persisted in their own rows (see athena.storage.store_exercise_artifact), not in `exercise.meta`, which is
+rewritten on every request. Every feedback request for the exercise reuses them afterwards. Every LLM split result is
+stored in a row of its own, so that concurrent requests never overwrite each other's results.
+Whenever the problem statement, the grading instructions/criteria or the repository URIs change, they are recomputed.
+"""
+import asyncio
+import hashlib
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Type, TypeVar
+
+from pydantic import BaseModel, Field
+
+from athena import env
+from athena.logger import logger
+from athena.programming import Exercise
+from athena.storage import (
+    aget_stored_exercise_artifact,
+    astore_exercise_artifact,
+    get_stored_exercise_artifact,
+    store_exercise_artifact,
+)
+from llm_core.utils.llm_utils import num_tokens_from_string
+
+from module_programming_llm.helpers.utils import (
+    format_grading_instructions,
+    get_changed_files,
+    get_diff,
+    aload_repository_trees,
+    RepositoryTree,
+)
+
+T = TypeVar("T", bound=BaseModel)
+
+ARTIFACTS_NAME = "precomputed_artifacts"
+SPLIT_RESULT_NAME_PREFIX = "split_result:"
+
+# Locks per exercise (and split), so that concurrent requests compute the artifacts only once.
+# They are dropped once nobody holds or waits for them, so that they do not pile up for every exercise ever seen.
+_locks: Dict[Hashable, List[Any]] = {}  # key -> [lock, number of users]
+
+
+@asynccontextmanager
+async def _lock(key: Hashable) -> AsyncIterator[None]:
+    entry = _locks.setdefault(key, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _locks[key]
+
+
+class ExerciseArtifacts(BaseModel):
+    fingerprint: str = Field(description="Hash of the exercise fields the artifacts were computed from")
+    problem_statement_tokens: int
+    grading_instructions_tokens: Optional[int] = Field(description="None if there are no grading instructions")
+    formatted_grading_instructions_tokens: Optional[int] = Field(
+        description="Tokens of the grading instructions including the grading criteria, None if there are neither")
+    template_to_solution_diffs: Dict[str, str] = Field(description="Diffs from template to solution by file path")
+
+
+def get_exercise_fingerprint(exercise: Exercise) -> str:
+    """Hash of all exercise fields that the artifacts depend on."""
+    fields = {
+        "problem_statement": exercise.problem_statement,
+        "grading_instructions": exercise.grading_instructions,
+        "grading_criteria": [criterion.dict() for criterion in exercise.grading_criteria or []],
+        "solution_repository_uri": exercise.solution_repository_uri,
+        "template_repository_uri": exercise.template_repository_uri,
+        "tests_repository_uri": exercise.tests_repository_uri,
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def get_config_hash(*configs: BaseModel) -> str:
+    """Hash of the given configs, used to key artifacts that depend on the module config (e.g. prompts and model)."""
+    return hashlib.sha256("".join(config.json() for config in configs).encode("utf-8")).hexdigest()[:16]
+
+
+async def _load(exercise: Exercise, name: str) -> Optional[dict]:
+    if env.USE_ASYNC_DATABASE:
+        return await aget_stored_exercise_artifact(exercise.id, name)
+    return get_stored_exercise_artifact(exercise.id, name)
+
+
+async def _store(exercise: Exercise, name: str, data: dict):
+    if env.USE_ASYNC_DATABASE:
+        await astore_exercise_artifact(exercise.id, name, data)
+    else:
+        store_exercise_artifact(exercise.id, name, data)
+
+
+async def _load_artifacts(exercise: Exercise) -> Optional[ExerciseArtifacts]:
+    stored_artifacts = await _load(exercise, ARTIFACTS_NAME)
+    if stored_artifacts is None:
+        return None
+    artifacts = ExerciseArtifacts.parse_obj(stored_artifacts)
+    if artifacts.fingerprint != get_exercise_fingerprint(exercise):
+        logger.info("Exercise %d changed, invalidating precomputed artifacts", exercise.id)
+        return None
+    return artifacts
+
+
+def _get_template_to_solution_diffs(template_tree: RepositoryTree, solution_tree: RepositoryTree) -> Dict[str, str]:
+    return {
+        file_path: get_diff(
+            src_tree=template_tree,
+            dst_tree=solution_tree,
+            src_prefix="template",
+            dst_prefix="solution",
+            file_path=file_path,
+        )
+        for file_path in get_changed_files(template_tree, solution_tree)
+        if file_path in template_tree.files
+    }
+
+
+async def _compute_artifacts(exercise: Exercise) -> ExerciseArtifacts:
+    template_tree, solution_tree = await aload_repository_trees(
+        exercise.aget_template_zip(),
+        exercise.aget_solution_zip(),
+    )
+    formatted_grading_instructions = format_grading_instructions(exercise.grading_instructions, exercise.grading_criteria)
+    return ExerciseArtifacts(
+        fingerprint=get_exercise_fingerprint(exercise),
+        problem_statement_tokens=num_tokens_from_string(exercise.problem_statement or ""),
+        grading_instructions_tokens=(
+            num_tokens_from_string(exercise.grading_instructions)
+            if exercise.grading_instructions is not None
+            else None
+        ),
+        formatted_grading_instructions_tokens=(
+            num_tokens_from_string(formatted_grading_instructions)
+            if formatted_grading_instructions is not None
+            else None
+        ),
+        # Diffed in a thread, so that it does not block the event loop
+        template_to_solution_diffs=await asyncio.to_thread(
+            _get_template_to_solution_diffs, template_tree, solution_tree
+        ),
+    )
+
+
+async def get_exercise_artifacts(exercise: Exercise) -> ExerciseArtifacts:
+    """Get the artifacts of the exercise, computing and storing them if they are missing or outdated.
+
+    Args:
+        exercise (Exercise): Exercise to get the artifacts for
+
+    Returns:
+        ExerciseArtifacts: Artifacts that only depend on the exercise
+    """
+    async with _lock(("exercise", exercise.id)):
+        artifacts = await _load_artifacts(exercise)
+        if artifacts is None:
+            logger.info("Precomputing artifacts for exercise %d", exercise.id)
+            artifacts = await _compute_artifacts(exercise)
+            await _store(exercise, ARTIFACTS_NAME, artifacts.dict())
+        return artifacts
+
+
+async def get_or_compute_split(
+        exercise: Exercise,
+        key: str,
+        pydantic_object: Type[T],
+        compute: Callable[[], Awaitable[Optional[T]]],
+    ) -> Optional[T]:
+    """Get an exercise-level LLM result from the artifacts or compute and store it.
+
+    Note: Only successful (not None) results are stored, so failed computations are retried on the next request.
+
+    Args:
+        exercise (Exercise): Exercise the result belongs to
+        key (str): Key of the result, should include the hash of the config it depends on
+        pydantic_object (Type[T]): Model to parse the stored result
+        compute (Callable[[], Awaitable[Optional[T]]]): Computes the result if it is not stored yet
+
+    Returns:
+        Optional[T]: The stored or computed result
+    """
+    fingerprint = get_exercise_fingerprint(exercise)
+    async with _lock(("split", exercise.id, key)):
+        stored_result = await _load(exercise, SPLIT_RESULT_NAME_PREFIX + key)
+        if stored_result is not None and stored_result["fingerprint"] == fingerprint:
+            return pydantic_object.parse_obj(stored_result["result"])
+
+        result = await compute()
+        if result is not None:
+            await _store(exercise, SPLIT_RESULT_NAME_PREFIX + key, {"fingerprint": fingerprint, "result": result.dict()})
+        return result
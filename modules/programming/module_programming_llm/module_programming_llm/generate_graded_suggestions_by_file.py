@@ -1,5 +1,4 @@
 from typing import List, Optional, Sequence
-import os
 import asyncio
 from pydantic import BaseModel, Field
 
@@ -7,6 +6,7 @@ from athena import emit_meta
 from athena.programming import Exercise, Submission, Feedback
 
 from module_programming_llm.config import GradedBasicApproachConfig
+from module_programming_llm.exercise_artifacts import get_exercise_artifacts
 from module_programming_llm.split_grading_instructions_by_file import (
     split_grading_instructions_by_file,
 )
@@ -16,13 +16,13 @@ from module_programming_llm.split_problem_statement_by_file import (
 from llm_core.utils.llm_utils import (
     check_prompt_length_and_omit_features_if_necessary,
     get_chat_prompt_with_formatting_instructions,
-    num_tokens_from_string,
 )
 from llm_core.utils.predict_and_parse import predict_and_parse
 
 from module_programming_llm.helpers.utils import (
-    get_diff,
-    load_files_from_repo,
+    aget_diff,
+    get_changed_files,
+    aload_repository_trees,
     add_line_numbers,
     get_programming_language_file_extension,
 )
@@ -77,23 +77,23 @@ async def generate_suggestions_by_file(
     split_problem_statement, split_grading_instructions = await asyncio.gather(
         split_problem_statement_by_file(
             exercise=exercise,
-            submission=submission,
             prompt=chat_prompt,
             config=config,
             debug=debug,
         ),
         split_grading_instructions_by_file(
             exercise=exercise,
-            submission=submission,
             prompt=chat_prompt,
             config=config,
             debug=debug,
         ),
     )
 
-    problem_statement_tokens = num_tokens_from_string(exercise.problem_statement or "")
+    # Exercise-level artifacts are precomputed once per exercise
+    artifacts = await get_exercise_artifacts(exercise)
+
     is_short_problem_statement = (
-        problem_statement_tokens
+        artifacts.problem_statement_tokens
         <= config.split_problem_statement_by_file_prompt.tokens_before_split
     )
     file_problem_statements = (
@@ -106,9 +106,9 @@ async def generate_suggestions_by_file(
     )
 
     is_short_grading_instructions = (
-        num_tokens_from_string(exercise.grading_instructions)
+        artifacts.grading_instructions_tokens
         <= config.split_grading_instructions_by_file_prompt.tokens_before_split
-        if exercise.grading_instructions is not None
+        if artifacts.grading_instructions_tokens is not None
         else True
     )
     file_grading_instructions = (
@@ -123,24 +123,18 @@ async def generate_suggestions_by_file(
     prompt_inputs: List[dict] = []
 
     # Feature extraction
-    solution_repo = exercise.get_solution_repository()
-    template_repo = exercise.get_template_repository()
-    submission_repo = submission.get_repository()
-
-    changed_files_from_template_to_submission = get_diff(
-        src_repo=template_repo, dst_repo=submission_repo, file_path=None, name_only=True
-    ).split("\n")
-    changed_files_from_template_to_submission = [
-        os.path.join(str(submission_repo.working_tree_dir or ""), file_path)
-        for file_path in changed_files_from_template_to_submission
-    ]
+    solution_tree, template_tree, submission_tree = await aload_repository_trees(
+        exercise.aget_solution_zip(),
+        exercise.aget_template_zip(),
+        submission.aget_zip(),
+    )
 
     # Changed text files
-    changed_files = load_files_from_repo(
-        submission_repo,
-        file_filter=lambda file_path: file_path
-        in changed_files_from_template_to_submission,
-    )
+    changed_files = {
+        file_path: submission_tree.files[file_path]
+        for file_path in get_changed_files(template_tree, submission_tree)
+        if file_path in submission_tree.files
+    }
 
     # Gather prompt inputs for each changed file (independently)
     for file_path, file_content in changed_files.items():
@@ -171,27 +165,29 @@ async def generate_suggestions_by_file(
         )
 
         file_content = add_line_numbers(file_content)
-        solution_to_submission_diff = get_diff(
-            src_repo=solution_repo,
-            dst_repo=submission_repo,
+        solution_to_submission_diff = await aget_diff(
+            src_tree=solution_tree,
+            dst_tree=submission_tree,
             src_prefix="solution",
             dst_prefix="submission",
             file_path=file_path,
         )
-        template_to_submission_diff = get_diff(
-            src_repo=template_repo,
-            dst_repo=submission_repo,
+        template_to_submission_diff = await aget_diff(
+            src_tree=template_tree,
+            dst_tree=submission_tree,
             src_prefix="template",
             dst_prefix="submission",
             file_path=file_path,
         )
-        template_to_solution_diff = get_diff(
-            src_repo=template_repo,
-            dst_repo=solution_repo,
-            src_prefix="template",
-            dst_prefix="solution",
-            file_path=file_path,
-        )
+        template_to_solution_diff = artifacts.template_to_solution_diffs.get(file_path)
+        if template_to_solution_diff is None:
+            template_to_solution_diff = await aget_diff(
+                src_tree=template_tree,
+                dst_tree=solution_tree,
+                src_prefix="template",
+                dst_prefix="solution",
+                file_path=file_path,
+            )
 
         prompt_inputs.append(
             {
@@ -222,6 +218,12 @@ async def generate_suggestions_by_file(
         "template_to_submission_diff",  # In the future we might indicate the changed lines in the submission_file additionally
     ]
 
+    # Long diffs are cut off at the end instead of being omitted completely
+    truncatable_features = [
+        "solution_to_submission_diff",
+        "template_to_submission_diff",
+    ]
+
     prompt_inputs = [
         omitted_prompt_input
         for omitted_prompt_input, should_run in [
@@ -231,6 +233,7 @@ async def generate_suggestions_by_file(
                 max_input_tokens=config.max_input_tokens,
                 omittable_features=omittable_features,
                 debug=debug,
+                truncatable_features=truncatable_features,
             )
             for prompt_input in prompt_inputs
         ]
@@ -1,5 +1,4 @@
 from typing import List, Optional, Sequence
-import os
 import asyncio
 from pydantic import BaseModel, Field
 
@@ -7,6 +6,7 @@ from athena import emit_meta
 from athena.programming import Exercise, Submission, Feedback
 
 from module_programming_llm.config import NonGradedBasicApproachConfig
+from module_programming_llm.exercise_artifacts import get_exercise_artifacts
 from module_programming_llm.generate_summary_by_file import generate_summary_by_file
 from module_programming_llm.split_problem_statement_by_file import (
     split_problem_statement_by_file,
@@ -14,13 +14,13 @@ from module_programming_llm.split_problem_statement_by_file import (
 from llm_core.utils.llm_utils import (
     check_prompt_length_and_omit_features_if_necessary,
     get_chat_prompt_with_formatting_instructions,
-    num_tokens_from_string,
 )
 from llm_core.utils.predict_and_parse import predict_and_parse
 
 from module_programming_llm.helpers.utils import (
-    get_diff,
-    load_files_from_repo,
+    aget_diff,
+    get_changed_files,
+    aload_repository_trees,
     add_line_numbers,
     get_programming_language_file_extension,
 )
@@ -70,23 +70,17 @@ async def generate_suggestions_by_file(
     prompt_inputs: List[dict] = []
 
     # Feature extraction
-    template_repo = exercise.get_template_repository()
-    submission_repo = submission.get_repository()
-
-    changed_files_from_template_to_submission = get_diff(
-        src_repo=template_repo, dst_repo=submission_repo, file_path=None, name_only=True
-    ).split("\n")
-    changed_files_from_template_to_submission = [
-        os.path.join(str(submission_repo.working_tree_dir or ""), file_path)
-        for file_path in changed_files_from_template_to_submission
-    ]
+    template_tree, submission_tree = await aload_repository_trees(
+        exercise.aget_template_zip(),
+        submission.aget_zip(),
+    )
 
     # Changed text files
-    changed_files = load_files_from_repo(
-        submission_repo,
-        file_filter=lambda file_path: file_path
-        in changed_files_from_template_to_submission,
-    )
+    changed_files = {
+        file_path: submission_tree.files[file_path]
+        for file_path in get_changed_files(template_tree, submission_tree)
+        if file_path in submission_tree.files
+    }
 
     # Get solution summary by file (if necessary)
     solution_summary = await generate_summary_by_file(
@@ -102,15 +96,16 @@ async def generate_suggestions_by_file(
     # Get split problem statement by file (if necessary)
     split_problem_statement = await split_problem_statement_by_file(
         exercise=exercise,
-        submission=submission,
         prompt=chat_prompt,
         config=config,
         debug=debug,
     )
 
-    problem_statement_tokens = num_tokens_from_string(exercise.problem_statement or "")
+    # Exercise-level artifacts are precomputed once per exercise
+    artifacts = await get_exercise_artifacts(exercise)
+
     is_short_problem_statement = (
-        problem_statement_tokens
+        artifacts.problem_statement_tokens
         <= config.split_problem_statement_by_file_prompt.tokens_before_split
     )
     file_problem_statements = (
@@ -138,9 +133,9 @@ async def generate_suggestions_by_file(
         )
 
         file_content = add_line_numbers(file_content)
-        diff_lines = get_diff(
-            src_repo=template_repo,
-            dst_repo=submission_repo,
+        diff_lines = await aget_diff(
+            src_tree=template_tree,
+            dst_tree=submission_tree,
             src_prefix="template",
             dst_prefix="submission",
             file_path=file_path,
@@ -173,6 +168,11 @@ async def generate_suggestions_by_file(
         # In the future we might indicate the changed lines in the submission_file additionally
     ]
 
+    # Long diffs are cut off at the end instead of being omitted completely
+    truncatable_features = [
+        "template_to_submission_diff",
+    ]
+
     prompt_inputs = [
         omitted_prompt_input
         for omitted_prompt_input, should_run in [
@@ -182,6 +182,7 @@ async def generate_suggestions_by_file(
                 max_input_tokens=config.max_input_tokens,
                 omittable_features=omittable_features,
                 debug=debug,
+                truncatable_features=truncatable_features,
             )
             for prompt_input in prompt_inputs
         ]
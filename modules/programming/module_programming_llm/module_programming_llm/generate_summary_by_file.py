@@ -1,5 +1,4 @@
 import asyncio
-import os
 from typing import Optional, List, Dict
 
 from pydantic import BaseModel, Field
@@ -16,8 +15,8 @@ from llm_core.utils.llm_utils import (
 from llm_core.utils.predict_and_parse import predict_and_parse
 
 from module_programming_llm.helpers.utils import (
-    get_diff,
-    load_files_from_repo,
+    get_changed_files,
+    aload_repository_trees,
     add_line_numbers
 )
 
@@ -72,22 +71,17 @@ async def generate_summary_by_file(
 
     model = config.model.get_model()  # type: ignore[attr-defined]
 
-    template_repo = exercise.get_template_repository()
-    submission_repo = submission.get_repository()
-
-    changed_files_from_template_to_submission = get_diff(
-        src_repo=template_repo, dst_repo=submission_repo, file_path=None, name_only=True
-    ).split("\n")
-    changed_files_from_template_to_submission = [
-        os.path.join(str(submission_repo.working_tree_dir or ""), file_path)
-        for file_path in changed_files_from_template_to_submission
-    ]
+    template_tree, submission_tree = await aload_repository_trees(
+        exercise.aget_template_zip(),
+        submission.aget_zip(),
+    )
 
     # Changed text files
-    changed_files = load_files_from_repo(
-        submission_repo,
-        file_filter=lambda file_path: file_path in changed_files_from_template_to_submission,
-    )
+    changed_files = {
+        file_path: submission_tree.files[file_path]
+        for file_path in get_changed_files(template_tree, submission_tree)
+        if file_path in submission_tree.files
+    }
     chat_prompt = get_chat_prompt_with_formatting_instructions(
         model=model,
         system_message=config.generate_file_summary_prompt.system_message,
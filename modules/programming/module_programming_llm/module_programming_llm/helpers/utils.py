@@ -1,28 +1,98 @@
-import os
+import asyncio
+import difflib
+import fnmatch
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Awaitable, List, Dict, Optional, Tuple
+from zipfile import ZipFile
 
-from contextlib import contextmanager
-from collections.abc import Iterator
-from typing import List, Dict, Optional, Callable, Tuple
+from athena import GradingCriterion
 
-from git import Remote
-from git.repo import Repo
-from langchain.document_loaders import GitLoader
 
-from athena import GradingCriterion
+class RepositoryTree:
+    """In-memory snapshot of the text files in a repository, identified by a hash of their content."""
 
-def load_files_from_repo(repo: Repo, file_filter: Optional[Callable[[str], bool]] = None) -> Dict[str, str]:
-    return {
-        doc.metadata['file_path']: doc.page_content
-        for doc in GitLoader(repo_path=str(repo.working_tree_dir), file_filter=file_filter).load()
-    }
+    def __init__(self, files: Dict[str, str]):
+        self.files = files
+        content_hash = hashlib.sha256()
+        for file_path in sorted(files):
+            content_hash.update(file_path.encode("utf-8") + b"\0" + files[file_path].encode("utf-8") + b"\0")
+        self.hash = content_hash.hexdigest()
+
+
+class LRUCache(OrderedDict):
+    """Minimal dict-based LRU cache that drops the least recently used entries above max_size."""
+
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+        # the trees and diffs are computed in threads (see aload_repository_tree and aget_diff)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self:
+                return default
+            self.move_to_end(key)
+            return self[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self[key] = value
+            self.move_to_end(key)
+            while len(self) > self.max_size:
+                self.popitem(last=False)
 
 
-def merge_repos_by_filepath(*repos: Repo, file_filter: Optional[Callable[[str], bool]] = None) -> Iterator[Tuple[str, List[Optional[str]]]]:
-    docs = [load_files_from_repo(repo, file_filter) for repo in repos]
-    files = {file for doc in docs for file in doc}
+# Trees are cached by the path of the zip, which is stable because the repository cache is content-addressed
+_tree_cache: LRUCache = LRUCache(max_size=64)
+# Diffs are cached by (source tree hash, destination tree hash, file path, prefixes)
+_diff_cache: LRUCache = LRUCache(max_size=4096)
 
-    for file in files:
-        yield (file, [doc.get(file) for doc in docs])
+
+def load_repository_tree(repo_zip: ZipFile) -> RepositoryTree:
+    """Load all text files of a repository zip into memory (binary files and the .git directory are skipped).
+
+    Args:
+        repo_zip (ZipFile): Repository zip, i.e. from `exercise.get_template_zip()` or `submission.get_zip()`
+
+    Returns:
+        RepositoryTree: The files of the repository by path
+    """
+    # zips that were not opened from a file (e.g. from memory) have no stable key
+    cache_key = str(repo_zip.filename) if repo_zip.filename is not None else None
+    tree = _tree_cache.get(cache_key) if cache_key is not None else None
+    if tree is not None:
+        return tree
+
+    files = {}
+    for info in repo_zip.infolist():
+        if info.is_dir() or info.filename.startswith(".git/"):
+            continue
+        try:
+            files[info.filename] = repo_zip.read(info).decode("utf-8")
+        except UnicodeDecodeError:
+            continue  # binary file
+    tree = RepositoryTree(files)
+    if cache_key is not None:
+        _tree_cache.put(cache_key, tree)
+    return tree
+
+
+async def aload_repository_tree(repo_zip: ZipFile) -> RepositoryTree:
+    """Like load_repository_tree, but reads the zip in a thread, so that it does not block the event loop."""
+    return await asyncio.to_thread(load_repository_tree, repo_zip)
+
+
+async def aload_repository_trees(*repo_zips: Awaitable[ZipFile]) -> List[RepositoryTree]:
+    """Get the repository zips concurrently (e.g. `exercise.aget_template_zip()`) and load their trees in threads.
+
+    Returns:
+        List[RepositoryTree]: The trees in the order of the given zips
+    """
+    loaded_zips = await asyncio.gather(*repo_zips)
+    return list(await asyncio.gather(*[aload_repository_tree(repo_zip) for repo_zip in loaded_zips]))
 
 
 def format_grading_instructions(grading_instructions: Optional[str], grading_criteria: Optional[List[GradingCriterion]]) -> Optional[str]:
@@ -85,56 +155,77 @@ def get_programming_language_file_extension(programming_language: str) -> str |
     return file_extensions.get(programming_language.upper())
 
 
-@contextmanager
-def temporary_remote(remote_name: str, repo: Repo, remote_url: str) -> Iterator[Optional[Remote]]:
-    """Context manager for temporarily adding a remote to a Git repository.
-    
-    Args:
-        remote_name (str): The name of the remote
-        repo (Repo): The repository to add the remote to
-        remote_url (str): The URL of the remote
-    """
-    try:
-        remote = repo.remote(remote_name)
-        yield remote
-    except ValueError:
-        remote = repo.create_remote(remote_name, remote_url)
-        remote.fetch()
-        yield remote
-        repo.delete_remote(remote)
-
-
-def get_diff(src_repo: Repo, 
-             dst_repo: Repo, 
+def get_changed_files(src_tree: RepositoryTree, dst_tree: RepositoryTree) -> List[str]:
+    """Get the (sorted) paths of all files that differ between two repository trees, including added and deleted ones."""
+    return sorted(
+        file_path
+        for file_path in src_tree.files.keys() | dst_tree.files.keys()
+        if src_tree.files.get(file_path) != dst_tree.files.get(file_path)
+    )
+
+
+def _get_file_diff(src_tree: RepositoryTree, dst_tree: RepositoryTree, file_path: str, src_prefix: str, dst_prefix: str) -> str:
+    cache_key: Tuple[str, ...] = (src_tree.hash, dst_tree.hash, file_path, src_prefix, dst_prefix)
+    diff = _diff_cache.get(cache_key)
+    if diff is not None:
+        return diff
+
+    src_content = src_tree.files.get(file_path)
+    dst_content = dst_tree.files.get(file_path)
+    diff_lines = difflib.unified_diff(
+        (src_content or "").splitlines(),
+        (dst_content or "").splitlines(),
+        fromfile=f"{src_prefix}/{file_path}" if src_content is not None else "/dev/null",
+        tofile=f"{dst_prefix}/{file_path}" if dst_content is not None else "/dev/null",
+        lineterm="",
+    )
+    diff = "\n".join([f"diff --git {src_prefix}/{file_path} {dst_prefix}/{file_path}", *diff_lines])
+    _diff_cache.put(cache_key, diff)
+    return diff
+
+
+def get_diff(src_tree: RepositoryTree,
+             dst_tree: RepositoryTree,
              src_prefix: str = "a",
              dst_prefix: str = "b",
              file_path: Optional[str] = None,
-             name_only: bool = False,
-             branch: str = "main", 
-             remote_name: str = "diff_target") -> str:
-    """Get the diff between two branches of two Git repositories.
+             name_only: bool = False) -> str:
+    """Get the unified diff between two repository trees, computed in-process and cached per file.
 
     Args:
-        src_repo (Repo): Repository to diff from
-        dst_repo (Repo): Repository to diff to
+        src_tree (RepositoryTree): Repository tree to diff from
+        dst_tree (RepositoryTree): Repository tree to diff to
         src_prefix (str, optional): Prefix for the source files. Defaults to "a".
         dst_prefix (str, optional): Prefix for the destination files. Defaults to "b".
         file_path (Optional[str], optional): Path to the file(s), supports glob patterns. Defaults to None.
         name_only (bool, optional): Only show names of changed files. Defaults to False.
-        branch (str, optional): Branch to diff. Defaults to "main".
-        remote_name (str, optional): Name of the remote to use. Defaults to "diff_target".
 
     Returns:
-        str: The diff between the two branches
+        str: The diff between the two trees
     """
 
     # Check if we are diffing a specific file
-    if file_path is not None and "*" not in file_path:
-        specific_file_path = os.path.join(str(src_repo.working_tree_dir), file_path)
-        if not os.path.exists(specific_file_path):
-            # Change error from 'No such file or directory' to something more meaningful (non-standard diff output)
-            return f"- {src_prefix}/{file_path} does not exist.\n+ {dst_prefix}/{file_path} has been added."
-
-    with temporary_remote(remote_name, src_repo, str(dst_repo.working_tree_dir)):
-        diff = src_repo.git.diff(branch, f"{remote_name}/{branch}", f"--src-prefix={src_prefix}/", f"--dst-prefix={dst_prefix}/", file_path, name_only=name_only)
-    return diff
\ No newline at end of file
+    if file_path is not None and "*" not in file_path and file_path not in src_tree.files:
+        # Non-standard diff output that is more meaningful than an empty diff
+        return f"- {src_prefix}/{file_path} does not exist.\n+ {dst_prefix}/{file_path} has been added."
+
+    changed_files = get_changed_files(src_tree, dst_tree)
+    if file_path is not None:
+        changed_files = [changed_file for changed_file in changed_files if fnmatch.fnmatch(changed_file, file_path)]
+
+    if name_only:
+        return "\n".join(changed_files)
+    return "\n".join(
+        _get_file_diff(src_tree, dst_tree, changed_file, src_prefix, dst_prefix)
+        for changed_file in changed_files
+    )
+
+
+async def aget_diff(src_tree: RepositoryTree,
+                    dst_tree: RepositoryTree,
+                    src_prefix: str = "a",
+                    dst_prefix: str = "b",
+                    file_path: Optional[str] = None,
+                    name_only: bool = False) -> str:
+    """Like get_diff, but computes the diff in a thread, so that it does not block the event loop."""
+    return await asyncio.to_thread(get_diff, src_tree, dst_tree, src_prefix, dst_prefix, file_path, name_only)
@@ -0,0 +1,44 @@
+import asyncio
+
+from athena.programming import Exercise
+from llm_core.utils.llm_utils import get_chat_prompt_with_formatting_instructions
+
+from module_programming_llm.config import Configuration
+from module_programming_llm.exercise_artifacts import get_exercise_artifacts
+from module_programming_llm.generate_graded_suggestions_by_file import AssessmentModel
+from module_programming_llm.generate_non_graded_suggestions_by_file import ImprovementModel
+from module_programming_llm.split_grading_instructions_by_file import split_grading_instructions_by_file
+from module_programming_llm.split_problem_statement_by_file import split_problem_statement_by_file
+
+
+async def precompute_exercise_artifacts(exercise: Exercise, module_config: Configuration):
+    """Compute and store all exercise-level artifacts for the graded and the non-graded approach.
+
+    Args:
+        exercise (Exercise): Exercise to precompute the artifacts for
+        module_config (Configuration): Module configuration, the LLM splits depend on the prompts and the model
+    """
+    await get_exercise_artifacts(exercise)
+
+    graded_config = module_config.graded_approach
+    graded_prompt = get_chat_prompt_with_formatting_instructions(
+        model=graded_config.model.get_model(),  # type: ignore[attr-defined]
+        system_message=graded_config.generate_suggestions_by_file_prompt.system_message,
+        human_message=graded_config.generate_suggestions_by_file_prompt.human_message,
+        pydantic_object=AssessmentModel,
+    )
+
+    non_graded_config = module_config.non_graded_approach
+    non_graded_prompt = get_chat_prompt_with_formatting_instructions(
+        model=non_graded_config.model.get_model(),  # type: ignore[attr-defined]
+        system_message=non_graded_config.generate_suggestions_by_file_prompt.system_message,
+        human_message=non_graded_config.generate_suggestions_by_file_prompt.human_message,
+        pydantic_object=ImprovementModel,
+    )
+
+    await asyncio.gather(
+        split_problem_statement_by_file(exercise=exercise, prompt=graded_prompt, config=graded_config, debug=False),
+        split_grading_instructions_by_file(exercise=exercise, prompt=graded_prompt, config=graded_config, debug=False),
+        split_problem_statement_by_file(exercise=exercise, prompt=non_graded_prompt, config=non_graded_config,
+                                        debug=False),
+    )
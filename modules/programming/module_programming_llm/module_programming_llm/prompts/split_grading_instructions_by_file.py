@@ -2,7 +2,7 @@ system_message = """\
 You are an AI tutor for programming assessment at a prestigious university.
 
 # Task
-Restructure the grading instructions by student changed file to show relevant information for each file to the tutor. \
+Restructure the grading instructions by the files that students change to show relevant information for each file to the tutor. \
 Make it as easy as possible for the tutor to grade the assignment when looking at the changed file. \
 Some instructions may be relevant for multiple files.
 """
@@ -11,11 +11,8 @@ human_message = """\
 Grading instructions:
 {grading_instructions}
 
-Changed files from template to sample solution:
+Changed files from template to sample solution, the students work on these files (Pick from this list, very important!):
 {changed_files_from_template_to_solution}
 
-Changed files from template to student submission (Pick from this list, very important!):
-{changed_files_from_template_to_submission}
-
 Grading instructions by file:
 """
@@ -2,7 +2,7 @@ system_message = """\
 You are an AI tutor for programming assessment at a prestigious university.
 
 # Task
-Restructure the problem statement by student changed files to gather work items for each file. \
+Restructure the problem statement by the files that students change to gather work items for each file. \
 Some parts of the problem statement may be relevant for multiple files.
 Comments in the template solution can be relevant for some files, some might be not.
 Include only those work items based on comments that make sense.
@@ -13,8 +13,8 @@ human_message = """\
 Problem statement:
 {problem_statement}
 
-Changed files from template to student submission (Pick from this list, very important!):
-{changed_files_from_template_to_submission}
+Changed files from template to sample solution, the students work on these files (Pick from this list, very important!):
+{changed_files_from_template_to_solution}
 
 Problem statement by file:
 """
@@ -5,17 +5,17 @@ from pydantic import BaseModel, Field
 from langchain.prompts import ChatPromptTemplate
 
 from athena import emit_meta
-from athena.programming import Exercise, Submission
+from athena.programming import Exercise
 
 from module_programming_llm.config import GradedBasicApproachConfig
 from llm_core.utils.llm_utils import (
     get_chat_prompt_with_formatting_instructions,
-    num_tokens_from_string,
     num_tokens_from_prompt,
 )
 from llm_core.utils.predict_and_parse import predict_and_parse
 
-from module_programming_llm.helpers.utils import format_grading_instructions, get_diff
+from module_programming_llm.exercise_artifacts import get_config_hash, get_exercise_artifacts, get_or_compute_split
+from module_programming_llm.helpers.utils import format_grading_instructions, get_changed_files, aload_repository_trees
 
 
 class FileGradingInstruction(BaseModel):
@@ -28,19 +28,19 @@ class SplitGradingInstructions(BaseModel):
     items: Sequence[FileGradingInstruction] = Field(description="File grading instructions")
 
 
-# pylint: disable=too-many-locals
 async def split_grading_instructions_by_file(
         exercise: Exercise,
-        submission: Submission,
         prompt: ChatPromptTemplate,
         config: GradedBasicApproachConfig,
         debug: bool
     ) -> Optional[SplitGradingInstructions]:
     """Split the general grading instructions by file
 
+    Note: The split only depends on the exercise and the config, so it is computed once per exercise and stored
+    in the exercise artifacts (see `module_programming_llm.exercise_artifacts`).
+
     Args:
         exercise (Exercise): Exercise to split the grading instructions for (respecting the changed files)
-        submission (Submission): Submission to split the grading instructions for (respecting the changed files)
         prompt (ChatPromptTemplate): Prompt template to check for grading_instructions
         config (GradedBasicApproachConfig): Configuration
 
@@ -48,31 +48,42 @@ async def split_grading_instructions_by_file(
         Optional[SplitGradingInstructions]: Split grading instructions, None if it is too short or too long
     """
 
-    grading_instructions = format_grading_instructions(exercise.grading_instructions, exercise.grading_criteria)
+    artifacts = await get_exercise_artifacts(exercise)
 
     # Return None if the grading instructions are too short
-    if (grading_instructions is None
-            or num_tokens_from_string(
-                grading_instructions) <= config.split_grading_instructions_by_file_prompt.tokens_before_split):
+    if (artifacts.formatted_grading_instructions_tokens is None
+            or artifacts.formatted_grading_instructions_tokens <= config.split_grading_instructions_by_file_prompt.tokens_before_split):
         return None
 
     # Return None if the grading instructions are not in the prompt
     if "grading_instructions" not in prompt.input_variables:
         return None
 
-    model = config.model.get_model()  # type: ignore[attr-defined]
+    return await get_or_compute_split(
+        exercise=exercise,
+        key="split_grading_instructions-" + get_config_hash(config.split_grading_instructions_by_file_prompt, config.model),
+        pydantic_object=SplitGradingInstructions,
+        compute=lambda: _split_grading_instructions_by_file(exercise, config, debug),
+    )
+
+
+# pylint: disable=too-many-locals
+async def _split_grading_instructions_by_file(
+        exercise: Exercise,
+        config: GradedBasicApproachConfig,
+        debug: bool
+    ) -> Optional[SplitGradingInstructions]:
+    grading_instructions = format_grading_instructions(exercise.grading_instructions, exercise.grading_criteria)
 
-    template_repo = exercise.get_template_repository()
-    solution_repo = exercise.get_solution_repository()
-    submission_repo = submission.get_repository()
+    model = config.model.get_model()  # type: ignore[attr-defined]
 
-    changed_files_from_template_to_solution = get_diff(
-        src_repo=template_repo, dst_repo=solution_repo, file_path=None, name_only=True
-    ).split("\n")
+    template_tree, solution_tree = await aload_repository_trees(
+        exercise.aget_template_zip(),
+        exercise.aget_solution_zip(),
+    )
 
-    changed_files_from_template_to_submission = get_diff(
-        src_repo=template_repo, dst_repo=submission_repo, file_path=None, name_only=True
-    ).split("\n")
+    # The solution is the reference submission, so that the split can be shared by all submissions of the exercise
+    changed_files_from_template_to_solution = get_changed_files(template_tree, solution_tree)
 
     chat_prompt = get_chat_prompt_with_formatting_instructions(
         model=model,
@@ -86,11 +97,14 @@ async def split_grading_instructions_by_file(
         "changed_files_from_template_to_solution": ", ".join(
             changed_files_from_template_to_solution
         ),
-        "changed_files_from_template_to_submission": ", ".join(
-            changed_files_from_template_to_submission
-        ),
     }
 
+    if "changed_files_from_template_to_submission" in chat_prompt.input_variables:
+        # Custom prompts from before the split was shared by the submissions, the solution stands in for them
+        prompt_input["changed_files_from_template_to_submission"] = ", ".join(
+            changed_files_from_template_to_solution
+        )
+
     # Return None if the prompt is too long
     if num_tokens_from_prompt(chat_prompt, prompt_input) > config.max_input_tokens:
         return None
@@ -102,7 +116,6 @@ async def split_grading_instructions_by_file(
         pydantic_object=SplitGradingInstructions,
         tags=[
             f"exercise-{exercise.id}",
-            f"submission-{submission.id}",
             "split-grading-instructions-by-file",
         ],
     )
@@ -5,17 +5,17 @@ from pydantic import BaseModel, Field
 from langchain.prompts import ChatPromptTemplate
 
 from athena import emit_meta
-from athena.programming import Exercise, Submission
+from athena.programming import Exercise
 
 from module_programming_llm.config import GradedBasicApproachConfig, BasicApproachConfig
 from llm_core.utils.llm_utils import (
     get_chat_prompt_with_formatting_instructions,
-    num_tokens_from_string,
     num_tokens_from_prompt,
 )
 from llm_core.utils.predict_and_parse import predict_and_parse
 
-from module_programming_llm.helpers.utils import get_diff
+from module_programming_llm.exercise_artifacts import get_config_hash, get_exercise_artifacts, get_or_compute_split
+from module_programming_llm.helpers.utils import get_changed_files, aload_repository_trees
 
 
 class FileProblemStatement(BaseModel):
@@ -29,19 +29,19 @@ class SplitProblemStatement(BaseModel):
     items: Sequence[FileProblemStatement] = Field(description="File problem statements")
 
 
-# pylint: disable=too-many-locals
 async def split_problem_statement_by_file(
         exercise: Exercise,
-        submission: Submission,
         prompt: ChatPromptTemplate,
         config: BasicApproachConfig,
         debug: bool
     ) -> Optional[SplitProblemStatement]:
     """Split the general problem statement by file
 
+    Note: The split only depends on the exercise and the config, so it is computed once per exercise and stored
+    in the exercise artifacts (see `module_programming_llm.exercise_artifacts`).
+
     Args:
         exercise (Exercise): Exercise to split the problem statement for (respecting the changed files)
-        submission (Submission): Submission to split the problem statement for (respecting the changed files)
         prompt (ChatPromptTemplate): Prompt template to check for problem_statement
         config (GradedBasicApproachConfig): Configuration
 
@@ -49,25 +49,39 @@ async def split_problem_statement_by_file(
         Optional[SplitProblemStatement]: Split problem statement, None if it is too short or too long
     """
 
+    artifacts = await get_exercise_artifacts(exercise)
+
     # Return None if the problem statement is too short
-    if num_tokens_from_string(exercise.problem_statement or "") <= config.split_problem_statement_by_file_prompt.tokens_before_split:
+    if artifacts.problem_statement_tokens <= config.split_problem_statement_by_file_prompt.tokens_before_split:
         return None
 
     # Return None if the problem statement not in the prompt
     if "problem_statement" not in prompt.input_variables:
         return None
 
+    return await get_or_compute_split(
+        exercise=exercise,
+        key="split_problem_statement-" + get_config_hash(config.split_problem_statement_by_file_prompt, config.model),
+        pydantic_object=SplitProblemStatement,
+        compute=lambda: _split_problem_statement_by_file(exercise, config, debug),
+    )
+
+
+# pylint: disable=too-many-locals
+async def _split_problem_statement_by_file(
+        exercise: Exercise,
+        config: BasicApproachConfig,
+        debug: bool
+    ) -> Optional[SplitProblemStatement]:
     model = config.model.get_model()  # type: ignore[attr-defined]
 
-    template_repo = exercise.get_template_repository()
-    submission_repo = submission.get_repository()
+    template_tree, solution_tree = await aload_repository_trees(
+        exercise.aget_template_zip(),
+        exercise.aget_solution_zip(),
+    )
 
-    changed_files_from_template_to_submission = get_diff(
-        src_repo=template_repo,
-        dst_repo=submission_repo,
-        file_path=None,
-        name_only=True
-    ).split("\n")
+    # The solution is the reference submission, so that the split can be shared by all submissions of the exercise
+    changed_files_from_template_to_solution = get_changed_files(template_tree, solution_tree)
 
     chat_prompt = get_chat_prompt_with_formatting_instructions(
         model=model,
@@ -78,18 +92,12 @@ async def split_problem_statement_by_file(
 
     prompt_input = {
         "problem_statement": exercise.problem_statement or "No problem statement.",
-        "changed_files_from_template_to_submission": ", ".join(changed_files_from_template_to_submission)
+        "changed_files_from_template_to_solution": ", ".join(changed_files_from_template_to_solution)
     }
 
-    if "changed_files_from_template_to_solution" in chat_prompt.input_variables:
-        solution_repo = exercise.get_solution_repository()
-        changed_files_from_template_to_solution = get_diff(
-            src_repo=template_repo,
-            dst_repo=solution_repo,
-            file_path=None,
-            name_only=True,
-        ).split("\n")
-        prompt_input["changed_files_from_template_to_solution"] = ", ".join(
+    if "changed_files_from_template_to_submission" in chat_prompt.input_variables:
+        # Custom prompts from before the split was shared by the submissions, the solution stands in for them
+        prompt_input["changed_files_from_template_to_submission"] = ", ".join(
             changed_files_from_template_to_solution
         )
 
@@ -104,7 +112,6 @@ async def split_problem_statement_by_file(
         pydantic_object=SplitProblemStatement,
         tags=[
             f"exercise-{exercise.id}",
-            f"submission-{submission.id}",
             "split-problem-statement-by-file"
         ]
     )
@@ -0,0 +1,127 @@
+"""
+Benchmark of the repository diffs: the previous approach (extract the zips, commit them as git repositories and diff
+through a temporary git remote) against the in-process diff of `helpers.utils`.
+
+Both approaches diff every changed file of a synthetic template and submission repository, like the feedback
+generation does. Run from the module directory:
+
+    poetry run python scripts/benchmark_diff.py --files 50 --lines 200 --changed 10
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+from zipfile import ZipFile
+
+from git.repo import Repo
+
+from module_programming_llm.helpers import utils
+from module_programming_llm.helpers.utils import get_changed_files, get_diff, load_repository_tree
+
+
+def _write_zip(path: Path, files: Dict[str, str]) -> ZipFile:
+    with ZipFile(path, "w") as repo_zip:
+        for file_path, content in files.items():
+            repo_zip.writestr(file_path, content)
+    return ZipFile(path)
+
+
+def _make_repositories(directory: Path, num_files: int, num_lines: int, num_changed: int) -> List[ZipFile]:
+    rng = random.Random(42)
+    template = {
+        f"src/de/tum/Class{index}.java": "\n".join(
+            f"    int value{line} = {rng.randint(0, 1000)};" for line in range(num_lines)
+        )
+        for index in range(num_files)
+    }
+    submission = dict(template)
+    for file_path in rng.sample(sorted(template), num_changed):
+        lines = submission[file_path].splitlines()
+        for line in rng.sample(range(num_lines), max(1, num_lines // 10)):
+            lines[line] = f"    int changed{line} = {rng.randint(0, 1000)};"
+        submission[file_path] = "\n".join(lines)
+    return [_write_zip(directory / "template.zip", template), _write_zip(directory / "submission.zip", submission)]
+
+
+def _to_git_repository(repo_zip: ZipFile, directory: Path) -> Repo:
+    """Like the previous `get_repository` of athena: extract the zip and commit it."""
+    repo_zip.extractall(directory)
+    repo = Repo.init(directory, initial_branch="main")
+    repo.config_writer().set_value("user", "name", "athena").release()
+    repo.config_writer().set_value("user", "email", "doesnotexist.athena@cit.tum.de").release()
+    repo.git.add(all=True, force=True)
+    repo.git.commit("-m", "Initial commit")
+    return repo
+
+
+@contextmanager
+def _temporary_remote(remote_name: str, repo: Repo, remote_url: str) -> Iterator[None]:
+    remote = repo.create_remote(remote_name, remote_url)
+    remote.fetch()
+    try:
+        yield
+    finally:
+        repo.delete_remote(remote)
+
+
+def _git_diff(src_repo: Repo, dst_repo: Repo, file_path: Optional[str] = None, name_only: bool = False) -> str:
+    """The previous `get_diff`: diff through a temporary remote of the destination repository."""
+    if file_path is not None and not os.path.exists(os.path.join(str(src_repo.working_tree_dir), file_path)):
+        return f"- template/{file_path} does not exist.\n+ submission/{file_path} has been added."
+    with _temporary_remote("diff_target", src_repo, str(dst_repo.working_tree_dir)):
+        return src_repo.git.diff("main", "diff_target/main", "--src-prefix=template/", "--dst-prefix=submission/",
+                                 file_path, name_only=name_only)
+
+
+def _measure(name: str, run: Callable[[], None], repeat: int):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+    print(f"{name:<40} min {min(durations) * 1000:9.1f} ms   mean {sum(durations) / repeat * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50, help="Number of files per repository")
+    parser.add_argument("--lines", type=int, default=200, help="Number of lines per file")
+    parser.add_argument("--changed", type=int, default=10, help="Number of files changed in the submission")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        template_zip, submission_zip = _make_repositories(directory, args.files, args.lines, args.changed)
+        run_index = iter(range(1_000_000))
+
+        def git_remote_diff():
+            run_directory = directory / f"git-{next(run_index)}"
+            template_repo = _to_git_repository(template_zip, run_directory / "template")
+            submission_repo = _to_git_repository(submission_zip, run_directory / "submission")
+            for file_path in _git_diff(template_repo, submission_repo, name_only=True).splitlines():
+                _git_diff(template_repo, submission_repo, file_path)
+
+        def in_process_diff():
+            template_tree = load_repository_tree(template_zip)
+            submission_tree = load_repository_tree(submission_zip)
+            for file_path in get_changed_files(template_tree, submission_tree):
+                get_diff(template_tree, submission_tree, "template", "submission", file_path=file_path)
+
+        def cold_in_process_diff():
+            utils._tree_cache.clear()  # pylint: disable=protected-access
+            utils._diff_cache.clear()  # pylint: disable=protected-access
+            in_process_diff()
+
+        print(f"{args.files} files with {args.lines} lines, {args.changed} changed, {args.repeat} runs")
+        _measure("git remote diff (extract, commit, fetch)", git_remote_diff, args.repeat)
+        _measure("in-process diff (cold caches)", cold_in_process_diff, args.repeat)
+        _measure("in-process diff (warm caches)", in_process_diff, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
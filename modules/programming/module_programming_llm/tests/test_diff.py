@@ -0,0 +1,101 @@
+from pathlib import Path
+from typing import Dict
+from zipfile import ZipFile
+
+from module_programming_llm.helpers.utils import get_changed_files, get_diff, load_repository_tree
+
+
+def make_tree(path: Path, files: Dict[str, str]):
+    with ZipFile(path, "w") as repo_zip:
+        for file_path, content in files.items():
+            repo_zip.writestr(file_path, content)
+    with ZipFile(path) as repo_zip:
+        return load_repository_tree(repo_zip)
+
+
+def make_trees(tmp_path: Path):
+    template_tree = make_tree(tmp_path / "template.zip", {
+        "src/Main.java": "class Main {\n    int a = 1;\n}\n",
+        "src/Removed.java": "class Removed {}\n",
+        "src/Unchanged.java": "class Unchanged {}\n",
+        ".git/config": "[core]\n",
+    })
+    submission_tree = make_tree(tmp_path / "submission.zip", {
+        "src/Main.java": "class Main {\n    int a = 2;\n}\n",
+        "src/Added.java": "class Added {}\n",
+        "src/Unchanged.java": "class Unchanged {}\n",
+        "README.md": "# Submission\n",
+        ".git/config": "[core]\n    bare = false\n",
+    })
+    return template_tree, submission_tree
+
+
+def test_changed_files_skip_the_git_directory(tmp_path):
+    template_tree, submission_tree = make_trees(tmp_path)
+
+    assert ".git/config" not in template_tree.files
+    assert get_changed_files(template_tree, submission_tree) == [
+        "README.md", "src/Added.java", "src/Main.java", "src/Removed.java"
+    ]
+
+
+def test_diff_of_a_changed_file(tmp_path):
+    template_tree, submission_tree = make_trees(tmp_path)
+
+    diff = get_diff(template_tree, submission_tree, "template", "submission", file_path="src/Main.java")
+
+    assert diff.splitlines() == [
+        "diff --git template/src/Main.java submission/src/Main.java",
+        "--- template/src/Main.java",
+        "+++ submission/src/Main.java",
+        "@@ -1,3 +1,3 @@",
+        " class Main {",
+        "-    int a = 1;",
+        "+    int a = 2;",
+        " }",
+    ]
+
+
+def test_diff_of_an_added_file(tmp_path):
+    template_tree, submission_tree = make_trees(tmp_path)
+
+    diff = get_diff(template_tree, submission_tree, "template", "submission", file_path="src/Added.java")
+
+    assert diff == "- template/src/Added.java does not exist.\n+ submission/src/Added.java has been added."
+
+
+def test_diff_of_a_deleted_file(tmp_path):
+    template_tree, submission_tree = make_trees(tmp_path)
+
+    diff = get_diff(template_tree, submission_tree, "template", "submission", file_path="src/Removed.java")
+
+    assert diff.splitlines()[1:4] == ["--- template/src/Removed.java", "+++ /dev/null", "@@ -1 +0,0 @@"]
+
+
+def test_diff_with_a_glob(tmp_path):
+    template_tree, submission_tree = make_trees(tmp_path)
+
+    assert get_diff(template_tree, submission_tree, file_path="src/*.java", name_only=True).splitlines() == [
+        "src/Added.java", "src/Main.java", "src/Removed.java"
+    ]
+    diff = get_diff(template_tree, submission_tree, file_path="src/*.java")
+    assert "diff --git a/src/Main.java b/src/Main.java" in diff
+    assert "diff --git a/src/Removed.java b/src/Removed.java" in diff
+    assert "README.md" not in diff
+
+
+def test_diffs_are_cached_by_tree_content(tmp_path):
+    template_tree, submission_tree = make_trees(tmp_path)
+    first_diff = get_diff(template_tree, submission_tree, file_path="src/Main.java")
+
+    # same content in another zip: same tree hash and diff
+    same_tree = make_tree(tmp_path / "same.zip", submission_tree.files)
+    assert same_tree.hash == submission_tree.hash
+    assert get_diff(template_tree, same_tree, file_path="src/Main.java") == first_diff
+
+    # other content with the same file path: not the cached diff
+    other_tree = make_tree(tmp_path / "other.zip", {**submission_tree.files, "src/Main.java": "class Main {}\n"})
+    assert other_tree.hash != submission_tree.hash
+    other_diff = get_diff(template_tree, other_tree, file_path="src/Main.java")
+    assert other_diff != first_diff
+    assert "+class Main {}" in other_diff.splitlines()
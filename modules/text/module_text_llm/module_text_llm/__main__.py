@@ -1,17 +1,18 @@
 import json
 import os
-from typing import List, Any
+from typing import AsyncIterator, List, Any
 
 import nltk
 import tiktoken
 
 from athena import app, submission_selector, submissions_consumer, feedback_consumer, feedback_provider, evaluation_provider
+from athena.contextvars import get_is_streaming
 from athena.text import Exercise, Submission, Feedback
 from athena.logger import logger
 
 from module_text_llm.config import Configuration
 from module_text_llm.evaluation import get_feedback_statistics, get_llm_statistics
-from module_text_llm.generate_suggestions import generate_suggestions
+from module_text_llm.generate_suggestions import generate_suggestions, stream_suggestions
 from module_text_llm.generate_evaluation import generate_evaluation
 
 
@@ -32,10 +33,17 @@ def process_incoming_feedback(exercise: Exercise, submission: Submission, feedba
 
 
 @feedback_provider
-async def suggest_feedback(exercise: Exercise, submission: Submission, is_graded: bool, module_config: Configuration) -> List[Feedback]:
+async def suggest_feedback(exercise: Exercise, submission: Submission, is_graded: bool, module_config: Configuration) -> AsyncIterator[Feedback]:
     logger.info("suggest_feedback: %s suggestions for submission %d of exercise %d were requested",
                 "Graded" if is_graded else "Non-graded", submission.id, exercise.id)
-    return await generate_suggestions(exercise, submission, module_config.approach, module_config.debug)
+    if get_is_streaming():
+        # Yields every suggestion as soon as it is generated (streamed by POST /feedback_suggestions/stream)
+        async for feedback in stream_suggestions(exercise, submission, module_config.approach, module_config.debug):
+            yield feedback
+        return
+
+    for feedback in await generate_suggestions(exercise, submission, module_config.approach, module_config.debug):
+        yield feedback
 
 
 @evaluation_provider
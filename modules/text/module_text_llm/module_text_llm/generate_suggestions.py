@@ -1,4 +1,6 @@
-from typing import List, Optional, Sequence
+from typing import AsyncIterator, List, Optional, Sequence, Set, Tuple
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 
 from athena import emit_meta
@@ -11,7 +13,7 @@ from llm_core.utils.llm_utils import (
     check_prompt_length_and_omit_features_if_necessary, 
     num_tokens_from_prompt,
 )
-from llm_core.utils.predict_and_parse import predict_and_parse
+from llm_core.utils.predict_and_parse import predict_and_parse, stream_and_parse
 
 from module_text_llm.helpers.utils import add_sentence_numbers, get_index_range_from_line_range, format_grading_instructions
 
@@ -38,7 +40,9 @@ class AssessmentModel(BaseModel):
         title = "Assessment"
 
 
-async def generate_suggestions(exercise: Exercise, submission: Submission, config: BasicApproachConfig, debug: bool) -> List[Feedback]:
+def _prepare_prompt(exercise: Exercise, submission: Submission, config: BasicApproachConfig,
+                    debug: bool) -> Optional[Tuple[BaseLanguageModel, ChatPromptTemplate, dict]]:
+    """Returns the model, the prompt and its input, or None if the input is too long."""
     model = config.model.get_model()  # type: ignore[attr-defined]
 
     prompt_input = {
@@ -73,7 +77,48 @@ async def generate_suggestions(exercise: Exercise, submission: Submission, confi
         if debug:
             emit_meta("prompt", chat_prompt.format(**prompt_input))
             emit_meta("error", f"Input too long {num_tokens_from_prompt(chat_prompt, prompt_input)} > {config.max_input_tokens}")
+        return None
+
+    return model, chat_prompt, prompt_input
+
+
+def _get_grading_instruction_ids(exercise: Exercise) -> Set[int]:
+    return set(
+        grading_instruction.id 
+        for criterion in exercise.grading_criteria or [] 
+        for grading_instruction in criterion.structured_grading_instructions
+    )
+
+
+def _to_feedback(exercise: Exercise, submission: Submission, feedback: FeedbackModel,
+                 grading_instruction_ids: Set[int]) -> Feedback:
+    index_start, index_end = get_index_range_from_line_range(feedback.line_start, feedback.line_end, submission.text)
+    grading_instruction_id = feedback.grading_instruction_id if feedback.grading_instruction_id in grading_instruction_ids else None
+    return Feedback(
+        exercise_id=exercise.id,
+        submission_id=submission.id,
+        title=feedback.title,
+        description=feedback.description,
+        index_start=index_start,
+        index_end=index_end,
+        credits=feedback.credits,
+        structured_grading_instruction_id=grading_instruction_id,
+        meta={}
+    )
+
+
+def _emit_debug_meta(chat_prompt: ChatPromptTemplate, prompt_input: dict, result: Optional[AssessmentModel]):
+    emit_meta("generate_suggestions", {
+        "prompt": chat_prompt.format(**prompt_input),
+        "result": result.dict() if result is not None else None
+    })
+
+
+async def generate_suggestions(exercise: Exercise, submission: Submission, config: BasicApproachConfig, debug: bool) -> List[Feedback]:
+    prepared = _prepare_prompt(exercise, submission, config, debug)
+    if prepared is None:
         return []
+    model, chat_prompt, prompt_input = prepared
 
     result = await predict_and_parse(
         model=model, 
@@ -87,34 +132,38 @@ async def generate_suggestions(exercise: Exercise, submission: Submission, confi
     )
 
     if debug:
-        emit_meta("generate_suggestions", {
-            "prompt": chat_prompt.format(**prompt_input),
-            "result": result.dict() if result is not None else None
-        })
+        _emit_debug_meta(chat_prompt, prompt_input, result)
 
     if result is None:
         return []
 
-    grading_instruction_ids = set(
-        grading_instruction.id 
-        for criterion in exercise.grading_criteria or [] 
-        for grading_instruction in criterion.structured_grading_instructions
-    )
+    grading_instruction_ids = _get_grading_instruction_ids(exercise)
+    return [_to_feedback(exercise, submission, feedback, grading_instruction_ids) for feedback in result.feedbacks]
+
+
+async def stream_suggestions(exercise: Exercise, submission: Submission, config: BasicApproachConfig,
+                             debug: bool) -> AsyncIterator[Feedback]:
+    """Like generate_suggestions, but yields every feedback as soon as the model has written it."""
+    prepared = _prepare_prompt(exercise, submission, config, debug)
+    if prepared is None:
+        return
+    model, chat_prompt, prompt_input = prepared
 
+    grading_instruction_ids = _get_grading_instruction_ids(exercise)
     feedbacks = []
-    for feedback in result.feedbacks:
-        index_start, index_end = get_index_range_from_line_range(feedback.line_start, feedback.line_end, submission.text)
-        grading_instruction_id = feedback.grading_instruction_id if feedback.grading_instruction_id in grading_instruction_ids else None
-        feedbacks.append(Feedback(
-            exercise_id=exercise.id,
-            submission_id=submission.id,
-            title=feedback.title,
-            description=feedback.description,
-            index_start=index_start,
-            index_end=index_end,
-            credits=feedback.credits,
-            structured_grading_instruction_id=grading_instruction_id,
-            meta={}
-        ))
-
-    return feedbacks
\ No newline at end of file
+    async for feedback in stream_and_parse(
+        model=model,
+        chat_prompt=chat_prompt,
+        prompt_input=prompt_input,
+        pydantic_object=AssessmentModel,
+        items_field="feedbacks",
+        tags=[
+            f"exercise-{exercise.id}",
+            f"submission-{submission.id}",
+        ]
+    ):
+        feedbacks.append(feedback)
+        yield _to_feedback(exercise, submission, feedback, grading_instruction_ids)  # type: ignore[arg-type]
+
+    if debug:
+        _emit_debug_meta(chat_prompt, prompt_input, AssessmentModel(feedbacks=feedbacks))
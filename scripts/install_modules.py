@@ -7,6 +7,7 @@ def main():
     modules = [
         "assessment_module_manager",
         "athena",
+        "llm_core",
         "log_viewer",
         "modules/programming/module_example",
         "modules/programming/module_programming_llm",
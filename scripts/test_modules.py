@@ -9,6 +9,7 @@ def main():
         "log_viewer",
         "assessment_module_manager",
         "athena",  # the version in this commit only, can differ for modules
+        "llm_core",
         "modules/programming/module_example",
         "modules/programming/module_programming_llm",
         "modules/text/module_text_llm",
@@ -19,6 +20,21 @@ def main():
     ]
 
     success = True
+    path_env = os.environ["PATH"]
+
+    for module in modules:
+        test_dirs = [test_dir for test_dir in ("tests", "test") if os.path.isdir(os.path.join(module, test_dir))]
+        if not test_dirs:
+            continue
+
+        path = os.path.join(os.getcwd(), module, ".venv")
+        os.environ["VIRTUAL_ENV"] = path
+        os.environ["PATH"] = os.path.join(path, "bin") + os.pathsep + path_env
+
+        result = subprocess.run(["poetry", "run", "pytest", *test_dirs], cwd=module)
+        # exit code 5: no tests were collected
+        if result.returncode not in (0, 5):
+            success = False
 
     if success:
         sys.exit(0)